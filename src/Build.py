@@ -0,0 +1,296 @@
+#!/usr/bin/python
+'''
+Build steps for the Flight Controls Demonstrator, run when the SD card image is prepared
+    atlas: pre-render the rotated and scaled sprites into memory-mappable atlases
+    zipapp: package the application as a single zip of optimized bytecode
+    imports: report the import times of the application using -X importtime
+    fonts: index the font files used so the system fonts are not scanned at run time
+    glyphs: pre-render the Chinese and Russian characters used by the translations
+    probe: time the drawing primitives on the rig so the quality and frame rates are chosen without timing them at boot
+'''
+__author__ = 'Rod Thomas <rod.thomas@talktalk.net>'
+__date__ = '19 Oct 2026'
+__version__ = '0.1.0'
+
+import argparse
+import gettext
+import importlib.util
+import json
+import marshal
+import os
+import subprocess
+import sys
+import time
+import zipfile
+from multiprocessing import Pool
+from pathlib import Path
+
+import pygame
+
+import defs
+from atlas import INDEX
+from fonts import FontIndex, configured_fonts, load_font
+import glyphs
+import probe
+
+# Sprites to pre-render (kind, image path, step, first value, number of frames, period)
+# Rotations cover the angles the widgets use, scales the landing pad and landscape sizes with altitude
+SPRITES = (
+    ('rotated', "images/Bell47Helicopter.png", 2.0, 0.0, 180, 360.0),
+    ('rotated', "images/Rotor2.png", 2.0, 0.0, 90, 180.0),
+    ('rotated', "images/Meter Needle.png", 1.0, -120.0, 251, 360.0),
+    ('rotated', "images/Altimeter_Needle.png", 1.0, 0.0, 360, 360.0),
+    ('rotated', "images/Direction.png", 2.0, 0.0, 180, 360.0),
+    ('rotated', "images/AerofoilCircle.png", 2.0, 0.0, 180, 360.0),
+    ('rotated', "images/ArtificialHorizonRing.png", 1.0, -defs.ROLL_MAX, int(defs.ROLL_MAX * 2) + 1, 360.0),
+    ('scaled', "images/Pad.png", 0.01, 0.2, 81, None),
+    ('scaled', "images/Landscape/Tree.png", 0.01, 0.2, 81, None),
+    ('scaled', "images/Landscape/Palm.png", 0.01, 0.2, 81, None),
+    ('scaled', "images/Landscape/Plant.png", 0.01, 0.2, 81, None),
+    ('scaled', "images/Landscape/Rock.png", 0.01, 0.2, 81, None),
+    ('scaled', "images/Landscape/Boulder.png", 0.01, 0.2, 81, None),
+    )
+FORMAT = 'BGRA'
+CHUNK = 16
+
+# Utilities that are not part of the application
+TOOLS = ("Build.py", "Calibrate.py", "TelemetryReport.py")
+ZIPAPP_MAIN = '''import splash
+splash.show()
+import FCD
+FCD.start()
+'''
+
+_sources = {}
+
+def render(task: tuple) -> list:
+    """Render a chunk of frames of a sprite in a worker process, in the same way as graphics.py does at run time
+
+    task: the kind, image path and the values to render
+    return: the size and pixels of each frame
+    """
+    kind, path, values = task
+    if path not in _sources:
+        _sources[path] = pygame.image.load(path)
+    source = _sources[path]
+    frames = []
+    for value in values:
+        if kind == 'rotated':
+            surface = pygame.transform.rotozoom(source, -value, 1.0)
+        else:
+            width = int(source.get_width() * value)
+            surface = pygame.transform.scale(source, (width, width))
+        frames.append((surface.get_size(), pygame.image.tobytes(surface, FORMAT)))
+    return frames
+
+def build_atlas(args):
+    """Render every sprite sequence using a process pool and write the atlas files and index
+    """
+    start = time.perf_counter()
+    directory = Path(args.output)
+    directory.mkdir(parents = True, exist_ok = True)
+    tasks = []
+    for kind, path, step, first, count, _ in SPRITES:
+        values = [round(first + i * step, 2) for i in range(count)]
+        tasks += [(kind, path, values[i:i + CHUNK]) for i in range(0, count, CHUNK)]
+    index = {'format': FORMAT, 'sequences': {}}
+    with Pool(args.jobs or os.cpu_count()) as pool:
+        results = iter(pool.imap(render, tasks))
+        for kind, path, step, first, count, period in SPRITES:
+            name = "%s-%s.%s" % (kind, Path(path).stem.replace(" ", "_"), FORMAT.lower())
+            frames = []
+            offset = 0
+            tmp = directory / (name + ".tmp")
+            with open(tmp, 'wb') as f:
+                while len(frames) < count:
+                    for (width, height), pixels in next(results):
+                        f.write(pixels)
+                        frames.append([offset, width, height])
+                        offset += len(pixels)
+            tmp.replace(directory / name)
+            index['sequences']["%s:%s" % (kind, path)] = {
+                'kind': kind, 'source': path, 'source_mtime': Path(path).stat().st_mtime,
+                'file': name, 'step': step, 'first': first, 'period': period, 'frames': frames}
+            print("%-40s %4d frames %8.1f kB" % (name, count, offset / 1024))
+    with open(directory / (INDEX + ".tmp"), 'w') as f:
+        json.dump(index, f)
+    (directory / (INDEX + ".tmp")).replace(directory / INDEX)
+    print("Built %d sprite sequences in %.1f s" % (len(SPRITES), time.perf_counter() - start))
+
+def compile_module(source: str, name: str, optimize: int) -> bytes:
+    """Compile a module to .pyc data that is not checked against its source
+
+    source: the module source
+    name: the file name reported in tracebacks
+    optimize: the optimization level, 1 removes asserts and __debug__ blocks as -O does
+    """
+    code = compile(source, name, 'exec', optimize = optimize, dont_inherit = True)
+    source_hash = importlib.util.source_hash(source.encode())
+    # Hash based pyc with the check_source flag clear (PEP 552)
+    return importlib.util.MAGIC_NUMBER + (1).to_bytes(4, 'little') + source_hash + marshal.dumps(code)
+
+def build_zipapp(args):
+    """Write the application modules as precompiled bytecode to a zipapp.
+    The images, sounds, locale and FCD.ini are still read from the current directory
+    """
+    start = time.perf_counter()
+    output = Path(args.output)
+    output.parent.mkdir(parents = True, exist_ok = True)
+    tmp = output.with_suffix(".tmp")
+    modules = sorted(p for p in Path(".").glob("*.py") if p.name not in TOOLS)
+    with open(tmp, 'wb') as f:
+        f.write(b"#!/usr/bin/env python3\n")
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED) as zf:
+            # Stored rather than compressed so that imports do not need to inflate
+            for module in modules:
+                zf.writestr(module.stem + ".pyc", compile_module(module.read_text(), module.name, args.optimize))
+            zf.writestr("__main__.pyc", compile_module(ZIPAPP_MAIN, "__main__.py", args.optimize))
+    tmp.chmod(0o755)
+    tmp.replace(output)
+    print("Built %s with %d modules for Python %d.%d in %.1f s" % (
+        output, len(modules), sys.version_info[0], sys.version_info[1], time.perf_counter() - start))
+
+def import_times(path: str = None) -> list:
+    """Import FCD in a new interpreter with -X importtime
+
+    path: the zipapp to import from, the source in the current directory when None
+    return: (cumulative us, self us, module) for each module imported
+    """
+    statement = "import FCD" if path is None else "import sys; sys.path.insert(0, %r); import FCD" % (path)
+    result = subprocess.run([sys.executable, "-O", "-X", "importtime", "-c", statement],
+                            capture_output = True, text = True)
+    times = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "self" not in line:
+            own, cumulative, name = line[len("import time:"):].split("|")
+            times.append((int(cumulative), int(own), name.rstrip()))
+    return times
+
+def report_imports(args):
+    """Print the slowest imports of the application from source and, if built, from the zipapp
+    """
+    project = [p.stem for p in Path(".").glob("*.py")]
+    targets = [("source", None)]
+    if Path(args.zipapp).exists():
+        targets.append((args.zipapp, args.zipapp))
+    for title, path in targets:
+        times = import_times(path)
+        total = max(times)[0] if times else 0
+        print("Import of FCD from %s: %.1f ms, %d modules" % (title, total / 1000, len(times)))
+        print("%10s %10s  %s" % ("cumul ms", "self ms", "module"))
+        for cumulative, own, name in sorted(times, reverse = True)[:args.top]:
+            print("%10.1f %10.1f  %s" % (cumulative / 1000, own / 1000, name))
+        own = [(t[1], t[2].strip()) for t in times if t[2].strip() in project]
+        print("Application modules: %.1f ms self time in %s" % (
+            sum(t for t, _ in own) / 1000, ", ".join(name for _, name in sorted(own, reverse = True))))
+        print()
+
+def build_fonts(args):
+    """Scan the system fonts and write the font index
+    """
+    start = time.perf_counter()
+    index = FontIndex(args.output)
+    fonts = sorted(set(configured_fonts()))
+    index.build(fonts)
+    for family, bold, italic in fonts:
+        path, set_bold, set_italic = index.lookup(family, bold, italic)
+        print("%-16s %-5s %-5s %s%s" % (family.strip(), bold, italic, path or "default font",
+                                         " (synthetic style)" if path and (set_bold or set_italic) else ""))
+    print("Indexed %d fonts in %.1f s" % (len(fonts), time.perf_counter() - start))
+
+def language_characters(language: str) -> list:
+    """Get the characters used by the texts and message catalog of a language
+    """
+    chars = set()
+    for path in Path("locale", language).glob("*.txt"):
+        chars |= set(path.read_text())
+    try:
+        catalog = gettext.translation('FCD', localedir = 'locale', languages = [language])
+        for message in catalog._catalog.values():
+            chars |= set(message)
+    except OSError:
+        pass
+    return sorted(ch for ch in chars if ch.isprintable() and not ch.isspace())
+
+def build_glyphs(args):
+    """Render the characters of each language in each of its fonts, except the welcome font whose
+    few large glyphs are only rendered on the welcome screen
+    """
+    start = time.perf_counter()
+    pygame.font.init()
+    directory = Path(args.output)
+    directory.mkdir(parents = True, exist_ok = True)
+    index = {'format': 'BGRA', 'fonts': {}}
+    for language in glyphs.LANGUAGES:
+        chars = language_characters(language)
+        for name in dir(defs):
+            if not (name.startswith('FONT_') and name.endswith('_' + language)) or name.startswith('FONT_WELCOME'):
+                continue
+            font_def = [d.strip() for d in getattr(defs, name)]
+            font_name = name[len('FONT_'):].lower()
+            # The style flags are read as mmi.str2bool reads them, so the glyphs match the fonts used at run time
+            bold, italic = [flag.lower() in ("yes", "true", "t", "1") for flag in getattr(defs, name)[2:4]]
+            font = load_font(font_def[0], int(font_def[1]), bold, italic)
+            file = "glyphs-%s.bgra" % (font_name)
+            entries = {}
+            offset = 0
+            with open(directory / (file + ".tmp"), 'wb') as f:
+                for ch in chars:
+                    surface = font.render(ch, True, defs.WHITE)
+                    pixels = pygame.image.tobytes(surface, 'BGRA')
+                    f.write(pixels)
+                    entries[ch] = [offset, surface.get_width(), surface.get_height()]
+                    offset += len(pixels)
+            (directory / (file + ".tmp")).replace(directory / file)
+            index['fonts'][font_name] = {'font': font_def, 'file': file, 'glyphs': entries}
+            print("%-24s %4d glyphs %8.1f kB" % (file, len(chars), offset / 1024))
+    with open(directory / (glyphs.INDEX + ".tmp"), 'w', encoding = 'utf-8') as f:
+        json.dump(index, f, ensure_ascii = False)
+    (directory / (glyphs.INDEX + ".tmp")).replace(directory / glyphs.INDEX)
+    print("Built glyph atlases in %.1f s" % (time.perf_counter() - start))
+
+def build_probe(args):
+    """Time the drawing primitives in the rig's display mode and save the results
+    """
+    pygame.init()
+    screen = pygame.display.set_mode((defs.SCREEN_WIDTH, defs.SCREEN_HEIGHT))
+    key = probe.hardware_key(screen)
+    results = probe.benchmark(screen)
+    for name, t in results.items():
+        print("%-10s %8.0f us" % (name, t))
+    preset, frame_ms = probe.choose(results)
+    path = probe.save(key, results)
+    print("%s: simulator frame about %.1f ms, %s preset, saved in %s" % (key, frame_ms, preset.name, path))
+    pygame.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description = "Build steps for the Flight Controls Demonstrator")
+    subparsers = parser.add_subparsers(dest = 'command', required = True)
+    atlas = subparsers.add_parser('atlas', help = "pre-render the rotated and scaled sprites")
+    atlas.add_argument('-o', '--output', default = defs.ATLAS_DIR, help = "the atlas directory, %(default)s by default")
+    atlas.add_argument('-j', '--jobs', type = int, default = 0, help = "the number of worker processes, one per CPU core by default")
+    atlas.set_defaults(func = build_atlas)
+    zipapp = subparsers.add_parser('zipapp', help = "package the application as precompiled bytecode")
+    zipapp.add_argument('-o', '--output', default = "FCD.pyz", help = "the zipapp file, %(default)s by default")
+    zipapp.add_argument('-O', '--optimize', type = int, choices = (0, 1, 2), default = 1,
+                        help = "the bytecode optimization level, %(default)s by default")
+    zipapp.set_defaults(func = build_zipapp)
+    imports = subparsers.add_parser('imports', help = "report the import times using -X importtime")
+    imports.add_argument('-z', '--zipapp', default = "FCD.pyz", help = "the zipapp to compare, %(default)s by default")
+    imports.add_argument('-n', '--top', type = int, default = 20, help = "the number of modules listed")
+    imports.set_defaults(func = report_imports)
+    fonts = subparsers.add_parser('fonts', help = "index the font files")
+    fonts.add_argument('-o', '--output', default = defs.FONTS_INDEX, help = "the font index file, %(default)s by default")
+    fonts.set_defaults(func = build_fonts)
+    glyph = subparsers.add_parser('glyphs', help = "pre-render the Chinese and Russian glyphs")
+    glyph.add_argument('-o', '--output', default = defs.ATLAS_DIR, help = "the atlas directory, %(default)s by default")
+    glyph.set_defaults(func = build_glyphs)
+    bench = subparsers.add_parser('probe', help = "time the drawing primitives and save the results")
+    bench.set_defaults(func = build_probe)
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
+
+#End
@@ -9,10 +9,12 @@ __version__ = '0.1.0'
 
 import pygame
 import defs
-from mmi import InputManager
+from mmi import InputManager, update_display
 import graphics
 import device
 
+CALIBRATE_WAIT = 500  # Longest wait for input in ms
+
 def main():
     pygame.init()
     pygame.fastevent.init()
@@ -52,11 +54,16 @@ def calibrate(screen : pygame.surface) -> defs.ProgramState:
     value = 0.5
     finished = False
     results = False
+    if not has_gpio:
+        device.write(screen, "No interface board detected - calibration not has_gpio", "", 1, bgd, fgd)
+        device.write(screen, "Coordinates will be randomly generated", "", 2, bgd, fgd)
     while not finished :
-        if not has_gpio:
-            device.write(screen, "No interface board detected - calibration not has_gpio", "", 1, bgd, fgd)
-            device.write(screen, "Coordinates will be randomly generated", "", 2, bgd, fgd)
-        for event in pygame.event.get():
+        # Sleep until there is input, the first wait times out so the first instruction is shown
+        event = pygame.event.wait(CALIBRATE_WAIT)
+        events = pygame.event.get()
+        if event.type != pygame.NOEVENT or start:
+            events.insert(0, event)
+        for event in events:
             if (event.type == pygame.QUIT or
                 (event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE)) :
                 finished = True
@@ -110,7 +117,8 @@ def calibrate(screen : pygame.surface) -> defs.ProgramState:
                 axis = index // 2
                 if event.axis == axis: # Only interested in one axis at a time
                     value = event.value
-        pygame.display.update()
+        if events:
+            update_display()
               
 if __name__ == "__main__":
     main()
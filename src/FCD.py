@@ -23,67 +23,109 @@ __version__ = '0.8.0'
 
 # Library imports
 import pygame
+import argparse
 import math
 from datetime import datetime
-#import logging
+import logging
+import time
 
-# Project imports
+# Show the last welcome screen while the rest of the application loads
 import defs
+import splash
+if __name__ == "__main__":
+    splash.show()
+
+# Project imports
 from defs import ProgramState, QuitException, ResetException
-from i18n import load_languages, select_language, scroll_text 
-from mmi import render_text_list, wrap_text, get_font, ask, InputManager, choose_cell, get_image
+import i18n
+from i18n import load_languages, select_language, scroll_text, flags
+from mmi import render_text_list, wrap_text, get_font, ask, InputManager, choose_cell, get_image, update_display
 from mmi import WELCOME_FONT, DESC_FONT, INFO_FONT, SMALL_FONT, MENU_FONT, WELCOME_IMAGE, LOGO_IMAGE
-from graphics import CollectiveMeter, PercentMeter, round_rect, rotate
-from simulator import simulator
+from telemetry import Telemetry
+from cache import SurfaceCache, load_image
+from assets import AssetManager, WELCOME_MANIFEST
+from scheduler import Scheduler
+from idle import IdleWork
+from atlas import Atlas
+from profiler import StateProfiler, PROFILE_MODES
+from watchdog import Watchdog
+from probe import probe
 
-#logging.basicConfig(filename="FCD.log", level=logging.DEBUG, filemode = "w")
+# The root filesystem is read-only so log to stderr rather than FCD.log
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+MAIN_FPS = 10   # Frame rate of the welcome and menu screens
 
 def main() :
     """Display a welcome page allowing language selection and then offer a menu of options
     """
+    splash.phase("imports")
     load_languages() # Needs to be done first to set up text translation
+    splash.phase("languages")
     pygame.init()
     if defs.use_fast_events: pygame.fastevent.init()
     pygame.mixer.init()
     pygame.display.set_caption(_("Flight Controls Demonstrator"))
-    screen = pygame.display.set_mode((defs.SCREEN_WIDTH, defs.SCREEN_HEIGHT))
+    # The display mode is normally set by the splash screen
+    screen = pygame.display.get_surface()
+    if screen is None:
+        screen = pygame.display.set_mode((defs.SCREEN_WIDTH, defs.SCREEN_HEIGHT))
     pygame.mouse.set_visible(False)
+    splash.phase("init")
+    # Choose the quality and frame rates for this machine, timing its drawing on first start
+    if defs.PROBE_ENABLED:
+        probe(screen)
+        splash.phase("probe")
+    # Load the images of the welcome screen now and the rest while it is shown
+    assets = AssetManager.get_instance()
+    assets.preload([(path.as_posix(), False, 'flags') for path in flags.values()], WELCOME_MANIFEST)
+    Scheduler.get_instance().start('warmup', defs.WARMUP_DELAY, assets.preload)
+    splash.phase("preload")
     im = InputManager.get_instance()
+    tm = Telemetry.get_instance()
+    profiler = StateProfiler.get_instance()
+    run = profiler.run
+    if defs.WATCHDOG_ENABLED:
+        Watchdog(defs.WATCHDOG_BUDGET).start()
+    if defs.METRICS_ENABLED:
+        from metrics import start_metrics_server
+        start_metrics_server()
     state = ProgramState.WELCOME
     menuReset()
 
+    idle = IdleWork.get_instance()
     clock = pygame.time.Clock()
+    frame_start = time.perf_counter()
     try:
         while True :
             try:
                 #repaint = True
+                prev_state = state
+                tm.set_state(state)
                 if state == ProgramState.WELCOME:
                     repaint = False
-                    state = welcome(screen)
+                    state = run(state, welcome, screen)
                 elif state == ProgramState.ABOUT:
-                    state = about(screen)
+                    state = run(state, about, screen)
                 elif state == ProgramState.INTRODUCTION:
-                    state = introduction(screen)
+                    state = run(state, introduction, screen)
                 elif state == ProgramState.MENU :
-                    state = menu(screen, 
-                                 [
-                                  [_("Introduction"), ProgramState.INTRODUCTION],
-                                  [_("How Do the Flight Controls Work on a Helicopter?"), ProgramState.DESCRIPTIONS],
-                                  [_("Try Out the Flight Controls and See How They Affect the Rotor Blades"), ProgramState.CONTROLS],
-                                  [_("Simple Flight Simulator"), ProgramState.BASIC_SIM],
-                                  # [_("Advanced Flight Simulator"), ProgramState.ADVANCED_SIM],
-                                  [_("About"), ProgramState.ABOUT]],
-                                 repaint)
+                    state = run(state, menu, screen, menu_items(), repaint)
                     if state != ProgramState.MENU:
                         repaint = True
                 elif state == ProgramState.DESCRIPTIONS :
-                    state = describe(screen)
+                    state = run(state, describe, screen)
                 elif state == ProgramState.CONTROLS :
-                    state = try_controls(screen)
+                    state = run(state, try_controls, screen)
                 elif state == ProgramState.BASIC_SIM :
-                    state = simulator(screen, True)
+                    from simulator import simulator
+                    state = run(state, simulator, screen, True)
                 elif state == ProgramState.ADVANCED_SIM :
-                    state = simulator(screen, False)
+                    from simulator import simulator
+                    state = run(state, simulator, screen, False)
+                if state != prev_state:
+                    tm.flush()
+                    profiler.write(prev_state)
             except ResetException:        
                 # If there is no-one present return to the welcome screen
                 # Make sure the motor is off
@@ -93,10 +135,16 @@ def main() :
                 # Stop any sounds
                 if pygame.mixer.get_init():
                     pygame.mixer.stop()
+                    pygame.mixer.music.stop()
                 im.reset()
                 menuReset()
                 state = ProgramState.WELCOME
-            clock.tick(10)
+                tm.flush()
+            # Prepare for the next screen in the time left over in the welcome and menu frames
+            if state in (ProgramState.WELCOME, ProgramState.MENU):
+                idle.run(frame_start + 1 / MAIN_FPS - time.perf_counter())
+            clock.tick(MAIN_FPS)
+            frame_start = time.perf_counter()
                 
     except QuitException as qe:
         import traceback
@@ -112,9 +160,44 @@ def main() :
         if pygame.mixer.get_init():
             pygame.mixer.quit()
         pygame.quit()
+        tm.flush()
+        profiler.write()
+
+def welcome_frame(screen : pygame.surface, language : str) -> ():
+    """Compose the parts of the welcome page that only change with the language, once per language
+    
+    screen: The surface the welcome page is displayed on
+    language: the language id
+    return: the composed page and the rects of its translated text
+    """
+    surfaces = SurfaceCache.get_instance()
+    key = ('welcome', language, screen.get_size())
+    frame = surfaces.get(key)
+    if frame is not None and language in welcome_frame.text_rects:
+        return frame, welcome_frame.text_rects[language]
+    frame = pygame.Surface(screen.get_size()).convert()
+    screen_rect = frame.get_rect()
+    frame.blit(welcome_image, welcome_image.get_rect(center = screen_rect.center))
+    frame.blit(get_image(LOGO_IMAGE, "images/blue_museum_logo.png"), logo_rect)
+    
+    font = get_font(WELCOME_FONT)
+    text_rects = []
+    for text, offset in ((_("Welcome to the"), -150), (_("Flight Controls"), 0), (_("Demonstrator"), 150)):
+        t = font.render(text, True, defs.WELCOME_TEXT_COLOUR)
+        text_rects.append(frame.blit(t, t.get_rect(center = screen_rect.center).move(0, offset)))
+    
+    t = get_font(SMALL_FONT).render("v %s" % (__version__), False, defs.WHITE)
+    frame.blit(t, t.get_rect(bottomleft = screen_rect.bottomleft).move(10, -10))
+    i18n.draw_flags(frame)
+    welcome_frame.text_rects[language] = text_rects
+    return surfaces.put(key, frame, 'welcome'), text_rects
+
+welcome_frame.text_rects = {}
 
 def welcome(screen : pygame.surface) -> ProgramState:
-    """Display a welcome page with language selection flags
+    """Display a welcome page with language selection flags.
+    The page is redrawn from the composed frame when first shown or the language changes, otherwise only the
+    clock and flag highlight are updated
     
     screen: The surface to display the welcome page on
     """
@@ -122,45 +205,60 @@ def welcome(screen : pygame.surface) -> ProgramState:
     
     screen_rect = screen.get_rect()
     welcome_image = get_image(WELCOME_IMAGE, "images/AgustaBell47.jpg", False)
-    img_rect = welcome_image.get_rect(center = screen_rect.center)
-    screen.blit(welcome_image, img_rect)
-    
     logo_image = get_image(LOGO_IMAGE, "images/blue_museum_logo.png")
     logo_rect = logo_image.get_rect(bottomright = screen_rect.bottomright).move(-20, -25)
-    screen.blit(logo_image, logo_rect)
-    
-    font = get_font(WELCOME_FONT)
-    t = font.render(_("Welcome to the"), True, defs.WELCOME_TEXT_COLOUR)
-    text_rect = t.get_rect(center=screen_rect.center).move(0, -150)
-    screen.blit(t, text_rect)
-    t = font.render(_("Flight Controls"), True, defs.WELCOME_TEXT_COLOUR)
-    text_rect = t.get_rect(center=screen_rect.center)
-    screen.blit(t, text_rect)
-    t = font.render(_("Demonstrator"), True, defs.WELCOME_TEXT_COLOUR)
-    text_rect = t.get_rect(center=screen_rect.center).move(0, 150)
-    screen.blit(t, text_rect)
+
+    language = i18n.current_language
+    frame, text_rects = welcome_frame(screen, language)
+    rects = []
+    if welcome.language != language:
+        screen.blit(frame, (0, 0))
+        # Only the translated text differs when the language changes
+        rects = None if welcome.language is None else welcome.text_rects + text_rects
+        welcome.clock = None
+        prepare_screens(screen)
     
-    small_font = get_font(SMALL_FONT)
     # Needs RTC
-    now = datetime.now()
-    t = small_font.render("%s" % (now.strftime("%d/%b/%Y %H:%M:%S")), False, defs.WHITE)
-    text_rect = t.get_rect(bottomleft = screen_rect.bottomright).move(-120, -10)
-    screen.blit(t, text_rect)
-    t = small_font.render("v %s" % (__version__), False, defs.WHITE)
-    text_rect = t.get_rect(bottomleft = screen_rect.bottomleft).move(10, -10)
-    screen.blit(t, text_rect)
-
-    if select_language(screen):
+    clock = datetime.now().strftime("%d/%b/%Y %H:%M:%S")
+    if clock != welcome.clock:
+        t = get_font(SMALL_FONT).render(clock, False, defs.WHITE)
+        text_rect = t.get_rect(bottomleft = screen_rect.bottomright).move(-120, -10)
+        if welcome.clock_rect is not None:
+            screen.blit(frame, welcome.clock_rect, welcome.clock_rect)
+        screen.blit(t, text_rect)
+        if rects is not None:
+            rects += [welcome.clock_rect, text_rect]
+        welcome.clock = clock
+        welcome.clock_rect = text_rect
+
+    selected, flag_rects = select_language(screen)
+    if selected:
+        welcome.language = None
         return ProgramState.MENU
     else:
-        pygame.display.update()
+        update_display(rects if rects is None else rects + flag_rects)
+        # Only remember the language shown once the frame is on the display, so that if a reset
+        # interrupts this pass the next one draws the whole frame again
+        welcome.language = language
+        welcome.text_rects = text_rects
+        splash.phase("welcome")
+        splash.report()
+        if i18n.current_language == language:
+            # Keep a snapshot to show at the next boot
+            splash.save(screen, language)
         return ProgramState.WELCOME
 
+welcome.language = None
+welcome.text_rects = []
+welcome.clock = None
+welcome.clock_rect = None
+
 def about(screen: pygame.surface):
     """ Display details of the program in a window
     
     screen: The surface to display the about details on
     """
+    from graphics import round_rect
     text = render_text_list(
         ["<c>" + _("Flight Controls Demonstrator") + " v " + __version__,
          "<c>" + _("Developed by Rod Thomas (volunteer)"),
@@ -174,27 +272,137 @@ def about(screen: pygame.surface):
     bgd_rect = rect.inflate(100, 100)
     round_rect(screen, bgd_rect, 40, defs.ABOUT_BACKGROUND_COLOUR)
     screen.blit(text, rect)
-    pygame.display.update(bgd_rect)
+    update_display(bgd_rect)
     im = InputManager.get_instance( )
     im.get_any_key()
     return ProgramState.MENU
 
-def introduction(screen : pygame.surface):
+def introduction_text(screen : pygame.surface) -> ():
+    """Get the files, font, colours and window of the introduction text
+    
+    screen: The surface the introduction is displayed on
+    """
     screen_rect = screen.get_rect()
-#     cyclic_image = get_image(CYCLIC_IMAGE, "images/CyclicGrip.png")
-#     cyclic_rect = cyclic_image.get_rect(midright = screen_rect.midright).move(-50, 0)
-#     screen.blit(cyclic_image, cyclic_rect)
-
-    scroll_text(screen, 
-        ['Intro.txt', 'Intro_Hardware.txt', 'Intro_Software.txt'], 
+    return (['Intro.txt', 'Intro_Hardware.txt', 'Intro_Software.txt'], 
         get_font(DESC_FONT), 
         defs.DESC_FOREGROUND_COLOUR, 
         defs.DESC_BACKGROUND_COLOUR, 
         pygame.Rect(50, 50 ,screen_rect.w - 100, screen_rect.h - 100))
+
+def introduction(screen : pygame.surface):
+#     screen_rect = screen.get_rect()
+#     cyclic_image = get_image(CYCLIC_IMAGE, "images/CyclicGrip.png")
+#     cyclic_rect = cyclic_image.get_rect(midright = screen_rect.midright).move(-50, 0)
+#     screen.blit(cyclic_image, cyclic_rect)
+
+    scroll_text(screen, *introduction_text(screen))
     return ProgramState.MENU
 
+def menu_cell(text : str, size : (), width : int, selected : bool, border_thickness : int, corner_rad : int) -> pygame.surface :
+    """Render a menu cell, once per language and style
+    
+    text: the item label
+    size: the cell width and height
+    width: the width to wrap the label to
+    selected: draw the cell in the selected style
+    border_thickness: the width of the cell border
+    corner_rad: the radius of the cell corners
+    """
+    surfaces = SurfaceCache.get_instance()
+    key = ('menu', i18n.current_language, text, size, width, selected)
+    cell = surfaces.get(key)
+    if cell is None:
+        from graphics import round_rect
+        cell = pygame.Surface(size, pygame.SRCALPHA)
+        cell_rect = cell.get_rect()
+        cw, ch = size
+        bt = border_thickness
+        round_rect(cell, cell_rect, corner_rad, defs.MENU_BACKGROUND_COLOUR)
+        border_rects = [
+            pygame.Rect(bt, bt, cw - 2 *bt, bt),
+            pygame.Rect(bt, ch - 2 * bt, cw - 2 * bt, bt),
+            pygame.Rect(bt, bt, bt, ch - 2 * bt),
+            pygame.Rect(cw - 2 * bt, bt, bt, ch - 2 * bt)
+            ]
+        colour = defs.MENU_SELECT_COLOUR if selected else defs.MENU_FOREGROUND_COLOUR
+        [cell.fill(colour, r) for r in border_rects]
+        font = get_font(MENU_FONT)
+        t = render_text_list(wrap_text(text, font, width), font, colour)
+        cell.blit(t, t.get_rect(center = cell_rect.center))
+        cell = surfaces.put(key, cell.convert_alpha(), 'menu')
+    return cell
+
+MENU_BORDER = 10
+MENU_SPACING = 100
+MENU_MARGIN = 100
+MENU_CORNER = 10
+
+def menu_items() -> list :
+    """Get the menu item labels, in the current language, and the states they select
+    """
+    return [
+        [_("Introduction"), ProgramState.INTRODUCTION],
+        [_("How Do the Flight Controls Work on a Helicopter?"), ProgramState.DESCRIPTIONS],
+        [_("Try Out the Flight Controls and See How They Affect the Rotor Blades"), ProgramState.CONTROLS],
+        [_("Simple Flight Simulator"), ProgramState.BASIC_SIM],
+        # [_("Advanced Flight Simulator"), ProgramState.ADVANCED_SIM],
+        [_("About"), ProgramState.ABOUT]]
+
+def menu_grid(screen : pygame.surface, n : int) -> () :
+    """Get the layout of the menu cells
+    
+    screen: the surface the menu is displayed on
+    n: the number of items
+    return: the number of cells per row, the number of rows and the cell width and height
+    """
+    cells_per_row = math.floor(math.sqrt(n))
+    no_rows = math.ceil(n / cells_per_row)
+    return cells_per_row, no_rows, screen.get_width() / cells_per_row, screen.get_height() / no_rows
+
+def prepare_menu(screen : pygame.surface, items : list):
+    """Render the menu cells of the current language before the menu is shown, one cell per step
+    
+    screen: the surface the menu will be displayed on
+    items: a list of item labels and states
+    """
+    cells_per_row, no_rows, cell_width, cell_height = menu_grid(screen, len(items))
+    for item in items:
+        for selected in (False, True):
+            menu_cell(item[0], (int(cell_width - MENU_SPACING), int(cell_height - MENU_SPACING)),
+                      cell_width - MENU_MARGIN * 2, selected, MENU_BORDER, MENU_CORNER)
+            yield
+
+# Sprites drawn by the flight controls and simulator screens, read from the atlas ahead of time
+CONTROLS_SPRITES = [('rotated', "images/AerofoilCircle.png"), ('rotated', "images/Meter Needle.png")]
+SIMULATOR_SPRITES = [('rotated', "images/Bell47Helicopter.png"), ('rotated', "images/Rotor2.png"),
+                     ('rotated', "images/Altimeter_Needle.png"), ('rotated', "images/Direction.png"),
+                     ('rotated', "images/ArtificialHorizonRing.png"), ('scaled', "images/Pad.png")] + \
+                    [('scaled', "images/Landscape/%s.png" % (name)) for name in ("Tree", "Palm", "Plant", "Rock", "Boulder")]
+
+def prepare_screens(screen : pygame.surface):
+    """Queue the idle work preparing the screens of the menu when the language has changed, and reading
+    the sprite atlas frames the first time
+    
+    screen: the surface the screens are displayed on
+    """
+    idle = IdleWork.get_instance()
+    if prepare_screens.language != i18n.current_language:
+        prepare_screens.language = i18n.current_language
+        idle.add('menu', ProgramState.MENU, prepare_menu(screen, menu_items()))
+        idle.add('introduction', ProgramState.INTRODUCTION, i18n.prefetch_text(*introduction_text(screen)))
+        idle.add('descriptions', ProgramState.DESCRIPTIONS, i18n.prefetch_text(*description_text(screen)))
+    if not prepare_screens.prefetched:
+        # The atlas frames stay mapped once read, so they only need reading once
+        prepare_screens.prefetched = True
+        idle.add('controls', ProgramState.CONTROLS, Atlas.get_instance().prefetch(CONTROLS_SPRITES))
+        idle.add('simulator', ProgramState.BASIC_SIM, Atlas.get_instance().prefetch(SIMULATOR_SPRITES))
+
+prepare_screens.language = None
+prepare_screens.prefetched = False
+
 def menu(screen : pygame.surface, items : list, repaint : bool = True) -> ProgramState :
-    """Display a set of menu options and return the selected state
+    """Display a set of menu options and return the selected state.
+    All the cells are drawn when the menu is first shown, after that only the cells whose selection has changed
     
     screen: the surface to display the menu on
     items: a list of item labels and states to select from
@@ -202,19 +410,13 @@ def menu(screen : pygame.surface, items : list, repaint : bool = True) -> Progra
     """
     global welcome_image, logo_rect
     
-    border_thickness = 10
-    spacing = 100
-    margin = 100
-    corner_rad = 10
-    gap = spacing + corner_rad
+    spacing = MENU_SPACING
+    gap = spacing + MENU_CORNER
 
     # Set up menu cells
-    cells_per_row = math.floor(math.sqrt(len(items)))
-    no_rows = math.ceil(len(items) / cells_per_row)
+    cells_per_row, no_rows, cell_width, cell_height = menu_grid(screen, len(items))
     w = screen.get_width()
     h = screen.get_height()
-    cell_width = w / cells_per_row
-    cell_height = h / no_rows
     cells = [[],[]]
     for i in range(cells_per_row):
         cells[0].append(cell_width * (i + 1))
@@ -227,8 +429,12 @@ def menu(screen : pygame.surface, items : list, repaint : bool = True) -> Progra
     menu.selected_column = result[1]
     selected = result[0]
     selected_item = menu.selected_row * cells_per_row + menu.selected_column
+    IdleWork.get_instance().prefer(items[selected_item][1])
+    selection = (menu.selected_row, menu.selected_column)
+    shown = [i18n.current_language] + [item[0] for item in items]
+    full = menu.shown != shown
 
-    if repaint:
+    if repaint and full:
         # Need to repaint background image after returning from selection
         repaint_rects = []
         # Rects of spaces between menu items
@@ -250,59 +456,50 @@ def menu(screen : pygame.surface, items : list, repaint : bool = True) -> Progra
             screen.blit(welcome_image, r, r)
      
     # Draw the menu cells        
-    font = get_font(MENU_FONT)
-    row = 0
-    column = 0
-    for item in items :
-        bt = border_thickness
-        cx = int(column * cell_width  + spacing / 2)
-        cy = int(row * cell_height + spacing / 2)
-        cw = int(cell_width - spacing)
-        ch = int(cell_height - spacing)
-        cell_rect = pygame.Rect(cx, cy, cw, ch)
-        round_rect(screen, cell_rect, corner_rad, defs.MENU_BACKGROUND_COLOUR)
-        border_rects = [
-            pygame.Rect(cx + bt, cy + bt, cw - 2 *bt, bt),
-            pygame.Rect(cx + bt, cy + ch - 2 * bt, cw - 2 * bt, bt),
-            pygame.Rect(cx + bt, cy + bt, bt, ch - 2 * bt),
-            pygame.Rect(cx + cw - 2 * bt, cy + bt, bt, ch - 2 * bt)
-            ]
-            
-        if row == menu.selected_row and column == menu.selected_column:
-            text_colour = colour = defs.MENU_SELECT_COLOUR
-        else:
-            text_colour = colour = defs.MENU_FOREGROUND_COLOUR
-        [screen.fill(colour, r) for r in border_rects]
-            
-        t = render_text_list(wrap_text(item[0], font, cell_width - margin * 2), font, text_colour)
-        t_rect = t.get_rect(center = cell_rect.center)
-        screen.blit(t, t_rect)
-        column += 1
-        if column >= cells_per_row :
-            column = 0
-            row += 1
+    rects = []
+    if full or selection != menu.selection:
+        for i, item in enumerate(items) :
+            row, column = divmod(i, cells_per_row)
+            if not full and (row, column) not in (selection, menu.selection):
+                continue
+            cx = int(column * cell_width  + spacing / 2)
+            cy = int(row * cell_height + spacing / 2)
+            cell = menu_cell(item[0], (int(cell_width - spacing), int(cell_height - spacing)),
+                             cell_width - MENU_MARGIN * 2, (row, column) == selection, MENU_BORDER, MENU_CORNER)
+            rects.append(screen.blit(cell, (cx, cy)))
+        menu.shown = shown
+        menu.selection = selection
         
     if selected :
+        menu.shown = None
         return items[selected_item][1]
     else :
-        pygame.display.update()
+        update_display(None if full else rects)
         return ProgramState.MENU
     
 def menuReset():
     menu.selected_row = 0
     menu.selected_column = 0
+    menu.selection = None
+    menu.shown = None
     
+def description_text(screen : pygame.surface) -> ():
+    """Get the files, font, colours and window of the description of the flight controls
+    
+    screen: The surface the descriptions are displayed on
+    """
+    return (['Inst_Overview.txt', 'Inst_Collective.txt', 'Inst_Cyclic.txt', 'Inst_AntiTorque.txt', 'Inst_Precession.txt'], 
+            get_font(DESC_FONT), 
+            defs.DESC_FOREGROUND_COLOUR, 
+            defs.DESC_BACKGROUND_COLOUR, 
+            pygame.Rect(100, 100 ,screen.get_width() - 200, screen.get_height() - 200))
+
 def describe(screen : pygame.surface) -> ProgramState :
     """Display pages of description about the flight controls
     
     screen: The surface to display the descriptions on
     """
-    scroll_text(screen, 
-                ['Inst_Overview.txt', 'Inst_Collective.txt', 'Inst_Cyclic.txt', 'Inst_AntiTorque.txt', 'Inst_Precession.txt'], 
-                get_font(DESC_FONT), 
-                defs.DESC_FOREGROUND_COLOUR, 
-                defs.DESC_BACKGROUND_COLOUR, 
-                pygame.Rect(100, 100 ,screen.get_width() - 200, screen.get_height() - 200))
+    scroll_text(screen, *description_text(screen))
     return ProgramState.MENU
 
 def try_controls(screen : pygame.surface) -> ProgramState :
@@ -311,6 +508,7 @@ def try_controls(screen : pygame.surface) -> ProgramState :
     
     screen: The surface to display the schematic and control meters on
     """
+    from graphics import CollectiveMeter, PercentMeter, round_rect, rotate_sprite
     im = InputManager.get_instance( )
     im.reset()
     rotor_on = False
@@ -331,15 +529,16 @@ def try_controls(screen : pygame.surface) -> ProgramState :
 
     # Draw helicopter and rotor
     area_rect = pygame.Rect(0, 0, screen.get_width() - 250, screen.get_height())
-    helicopter = pygame.transform.scale2x(pygame.image.load("images/Bell47Helicopter.png").convert_alpha())
+    assets = AssetManager.get_instance()
+    helicopter = assets.scale2x("images/Bell47Helicopter.png")
     heli_rect = helicopter.get_rect(center = area_rect.center)
-    rotor = pygame.transform.scale2x(pygame.image.load("images/Rotor2.png").convert_alpha())
+    rotor = assets.scale2x("images/Rotor2.png")
     rotor_rect = rotor.get_rect(center = area_rect.center).move(0, -128)
     screen.blit(helicopter, heli_rect)
     screen.blit(rotor, rotor_rect)
     
     # Set up aerofoil positions
-    aerofoil = pygame.image.load("images/AerofoilCircle.png").convert_alpha()
+    aerofoil = load_image("images/AerofoilCircle.png", 'try_controls')
     aerofoil_offset = 250
     port_aerofoil_rect = aerofoil.get_rect(center = rotor_rect.center).move(-aerofoil_offset, 0)
     stbd_aerofoil_rect = aerofoil.get_rect(center = rotor_rect.center).move(aerofoil_offset, 0)
@@ -365,7 +564,7 @@ def try_controls(screen : pygame.surface) -> ProgramState :
         (area_rect.left + 50, area_rect.bottom - 100))
     
     # Show the static items
-    pygame.display.update(rect)
+    update_display(rect)
     
     clock = pygame.time.Clock()
     finished = False
@@ -385,15 +584,15 @@ def try_controls(screen : pygame.surface) -> ProgramState :
                  
                 # Draw aerofoils      
                 rects = [port_aerofoil_rect, stbd_aerofoil_rect, fwd_aerofoil_rect, aft_aerofoil_rect, tail_aerofoil_rect]
-                i, r = rotate(aerofoil, port_aerofoil_angle, port_aerofoil_rect.center)
+                i, r = rotate_sprite("images/AerofoilCircle.png", aerofoil, port_aerofoil_angle, port_aerofoil_rect.center)
                 screen.blit(i, r)
-                i, r = rotate(aerofoil, stbd_aerofoil_angle, stbd_aerofoil_rect.center)
+                i, r = rotate_sprite("images/AerofoilCircle.png", aerofoil, stbd_aerofoil_angle, stbd_aerofoil_rect.center)
                 screen.blit(i, r)
-                i, r = rotate(aerofoil, fwd_aerofoil_angle, fwd_aerofoil_rect.center)
+                i, r = rotate_sprite("images/AerofoilCircle.png", aerofoil, fwd_aerofoil_angle, fwd_aerofoil_rect.center)
                 screen.blit(i, r)
-                i, r = rotate(aerofoil, aft_aerofoil_angle, aft_aerofoil_rect.center)
+                i, r = rotate_sprite("images/AerofoilCircle.png", aerofoil, aft_aerofoil_angle, aft_aerofoil_rect.center)
                 screen.blit(i, r)
-                i, r = rotate(aerofoil, tail_aerofoil_angle, tail_aerofoil_rect.center)
+                i, r = rotate_sprite("images/AerofoilCircle.png", aerofoil, tail_aerofoil_angle, tail_aerofoil_rect.center)
                 screen.blit(i, r)
                 
                 # Draw the position meters
@@ -402,8 +601,8 @@ def try_controls(screen : pygame.surface) -> ProgramState :
                 rects += cyclic_lat_meter.blit(screen, (im.x + 1.0) / 2.0 * 100.0, [-40, 520])
                 rects += rudder_pedal_meter.blit(screen, (im.r + 1.0) / 2.0 * 100.0, [-40, 760])
                 
-                pygame.display.update(rects)
-        clock.tick(60)
+                update_display(rects)
+        clock.tick(defs.CONTROLS_FPS)
         
     pygame.key.set_repeat()
     
@@ -411,7 +610,17 @@ def try_controls(screen : pygame.surface) -> ProgramState :
         im.motor(False)
     return ProgramState.MENU
 
-if __name__ == "__main__":
+def start():
+    """Parse the command line and run the demonstrator, used by both FCD.py and the zipapp
+    """
+    parser = argparse.ArgumentParser(description = "Flight Controls Demonstrator")
+    parser.add_argument('--profile', choices = PROFILE_MODES, help = "profile each program state, overriding FCD.ini")
+    args = parser.parse_args()
+    if args.profile is not None:
+        defs.PROFILE_MODE = args.profile
     main()
 
+if __name__ == "__main__":
+    start()
+
 #End  
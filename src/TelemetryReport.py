@@ -0,0 +1,50 @@
+#!/usr/bin/python
+'''
+Utility to summarise telemetry sessions recorded by the Flight Controls Demonstrator
+Prints the stage timings and percentile tables for each program state in the style of the stats/ files
+'''
+__author__ = 'Rod Thomas <rod.thomas@talktalk.net>'
+__date__ = '19 Oct 2026'
+__version__ = '0.1.0'
+
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import defs
+from defs import ProgramState
+import telemetry
+
+def main():
+    parser = argparse.ArgumentParser(description = "Summarise a telemetry session file")
+    parser.add_argument('session', nargs = '?', help = "the session file, the latest in the runtime directory by default")
+    parser.add_argument('-a', '--all', action = 'store_true', help = "summarise all frames together rather than by program state")
+    args = parser.parse_args()
+
+    path = args.session
+    if path is None:
+        sessions = sorted(Path(defs.RUNTIME_DIR).glob('session-*.fcdt'), key = lambda p: p.stat().st_mtime)
+        if not sessions:
+            print("No sessions found in %s" % (defs.RUNTIME_DIR))
+            return
+        path = sessions[-1]
+    session = telemetry.read_session(path)
+    columns = session['columns']
+    print("Session %s started %s, %d frames" % (
+        path, datetime.fromtimestamp(session['started']).strftime("%d/%b/%Y %H:%M:%S"), len(columns['frame'])))
+    print()
+    if args.all:
+        print(telemetry.summarise("All", session['stages'], columns))
+        return
+    for state in [None] + list(ProgramState):
+        value = -1 if state is None else state.value
+        frames = [i for i, s in enumerate(columns['state']) if s == value]
+        if frames:
+            selected = {name: [column[i] for i in frames] for name, column in columns.items()}
+            print(telemetry.summarise("Startup" if state is None else state.name.replace("_", " ").title(), session['stages'], selected))
+            print()
+
+if __name__ == "__main__":
+    main()
+
+#End
@@ -0,0 +1,140 @@
+'''
+Assets module for the Bell 47 demonstrator rig
+Preloads the images and sounds used by the screens and shares widgets between sessions
+'''
+import logging
+import os
+import pygame
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import defs
+from cache import SurfaceCache, load_image
+
+# Images used by the welcome, simulator and flight controls screens (path, alpha, owner)
+MANIFEST = (
+    ("images/AgustaBell47.jpg", False, 'images'),
+    ("images/blue_museum_logo.png", True, 'images'),
+    ("images/Meter Needle.png", True, 'Meter'),
+    ("images/CollectiveMeter.png", True, 'Meter'),
+    ("images/PercentMeter.png", True, 'Meter'),
+    ("images/Altimeter.png", True, 'Altimeter'),
+    ("images/Altimeter_Needle.png", True, 'Altimeter'),
+    ("images/ArtificialHorizonBezel.png", True, 'ArtificialHorizon'),
+    ("images/ArtificialHorizonRing.png", True, 'ArtificialHorizon'),
+    ("images/ArtificialHorizonBall.png", True, 'ArtificialHorizon'),
+    ("images/ArtificialHorizonMask.png", True, 'ArtificialHorizon'),
+    ("images/Bell47Helicopter.png", True, 'Helicopter'),
+    ("images/Rotor2.png", True, 'Helicopter'),
+    ("images/Direction.png", True, 'DirectionIndicator'),
+    ("images/Pad.png", True, 'LandingPad'),
+    ("images/Landscape/Tree.png", True, 'Landscape'),
+    ("images/Landscape/Palm.png", True, 'Landscape'),
+    ("images/Landscape/Plant.png", True, 'Landscape'),
+    ("images/Landscape/Rock.png", True, 'Landscape'),
+    ("images/Landscape/Boulder.png", True, 'Landscape'),
+    ("images/AerofoilCircle.png", True, 'try_controls'),
+    )
+
+# Images needed by the welcome screen, the others are loaded once it is shown
+WELCOME_MANIFEST = tuple(entry for entry in MANIFEST if entry[2] == 'images')
+
+# Images shown at double size by the flight controls screen
+SCALE2X = ("images/Bell47Helicopter.png", "images/Rotor2.png")
+
+class AssetManager(object):
+    """Decode the images once and share them, together with the widgets that use them.
+
+        Preloaded images are pinned in the surface cache so they are never re-decoded. Widgets are
+        reset rather than rebuilt each time a screen is entered
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton asset manager
+        """
+        if AssetManager.__instance == None:
+            AssetManager.__instance = AssetManager()
+        return AssetManager.__instance
+
+    def __init__(self):
+        self._widgets = {}
+        self._music = None
+        self.load_times = {}
+
+    def preload(self, extra: tuple = (), manifest: tuple = MANIFEST):
+        """Load every image in the manifest that is not already loaded. Needs the display mode to have been set.
+            The files are decoded in a thread pool, pygame releases the GIL while decoding, and
+            converted to the display format on the main thread as each one completes
+
+        extra: additional (path, alpha, owner) entries e.g. the language flags
+        manifest: the images to load, all of them by default
+        """
+        start = time.perf_counter()
+        manifest = list(manifest) + list(extra)
+        surfaces = SurfaceCache.get_instance()
+        manifest = [entry for entry in manifest if ('image', entry[0], entry[1]) not in surfaces]
+        workers = defs.DECODE_THREADS or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "Decode") as pool:
+            futures = [(entry, pool.submit(self._decode, entry[0])) for entry in manifest]
+            for (path, alpha, owner), future in futures:
+                try:
+                    surface, decode_time = future.result()
+                except (pygame.error, OSError) as e:
+                    logging.warning("Unable to preload %s: %s", path, e)
+                    continue
+                t = time.perf_counter()
+                surfaces.convert(path, surface, alpha, owner, pinned = True)
+                self.load_times[path] = (decode_time, time.perf_counter() - t)
+        for path in SCALE2X:
+            if any(entry[0] == path for entry in manifest):
+                self.scale2x(path)
+        for path, (decode_time, convert_time) in self.load_times.items():
+            logging.debug("Decoded %s in %.1f ms, converted in %.1f ms", path, decode_time * 1000, convert_time * 1000)
+        logging.info("Preloaded %d images with %d threads in %.0f ms (%.0f ms decoding)", len(manifest), workers,
+                     (time.perf_counter() - start) * 1000, sum(d for d, _ in self.load_times.values()) * 1000)
+
+    @staticmethod
+    def _decode(path: str):
+        """Decode an image file in a worker thread
+
+        return: the decoded surface and the time taken
+        """
+        t = time.perf_counter()
+        surface = pygame.image.load(path)
+        return surface, time.perf_counter() - t
+
+    def scale2x(self, path: str) -> pygame.Surface:
+        """Get a shared image at double size
+
+        path: the image file path
+        """
+        surfaces = SurfaceCache.get_instance()
+        key = ('scale2x', path)
+        image = surfaces.get(key)
+        if image is None:
+            image = surfaces.put(key, pygame.transform.scale2x(load_image(path, 'try_controls')), 'try_controls', True)
+        return image
+
+    def load_music(self, path: str):
+        """Load the music unless it is already loaded
+        """
+        if self._music != path:
+            pygame.mixer.music.load(path)
+            self._music = path
+
+    def widget(self, cls, *args):
+        """Get a shared widget, creating it on first use and resetting it when reused.
+        Widgets are shared by class and constructor arguments
+
+        cls: the widget class
+        args: the constructor arguments
+        """
+        key = (cls, repr(args))
+        widget = self._widgets.get(key)
+        if widget is None:
+            widget = cls(*args)
+            self._widgets[key] = widget
+        else:
+            widget.reset()
+        return widget
@@ -0,0 +1,140 @@
+'''
+Atlas module for the Bell 47 demonstrator rig
+Provides the rotated and scaled sprites pre-rendered by Build.py from memory-mapped atlas files
+'''
+import json
+import logging
+import mmap
+import pygame
+from pathlib import Path
+
+import defs
+from telemetry import cache_stats
+
+INDEX = "index.json"
+
+class Atlas(object):
+    """Memory-mapped sprite atlases.
+
+        Each sequence is a set of frames of one image rotated or scaled in equal steps, stored as raw
+        pixels in the display format. The files are mapped read-only so pages are only read from the
+        SD card when a frame is first drawn, and the surfaces share the mapped memory
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton atlas
+        """
+        if Atlas.__instance == None:
+            Atlas.__instance = Atlas(defs.ATLAS_DIR)
+        return Atlas.__instance
+
+    def __init__(self, directory: str):
+        self._directory = Path(directory)
+        self._sequences = {}
+        self._maps = {}
+        self._frames = {}
+        self._stats = cache_stats('atlas')
+        self._format = 'BGRA'
+        self.load_index()
+
+    def load_index(self):
+        """Read the atlas index, ignoring any sequence whose source image has changed since it was built
+        """
+        self._sequences = {}
+        path = self._directory / INDEX
+        if not path.exists():
+            logging.info("No sprite atlas in %s, sprites will be rendered at run time", self._directory)
+            return
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning("Unable to read sprite atlas index %s: %s", path, e)
+            return
+        self._format = index['format']
+        for name, sequence in index['sequences'].items():
+            source = Path(sequence['source'])
+            if not source.exists() or source.stat().st_mtime > sequence['source_mtime']:
+                logging.warning("Sprite atlas for %s is out of date, rebuild it with Build.py atlas", source)
+                continue
+            self._sequences[(sequence['kind'], sequence['source'])] = sequence
+
+    def has(self, kind: str, path: str) -> bool:
+        """Check whether the atlas holds a sequence
+
+        kind: 'rotated' or 'scaled'
+        path: the source image path
+        """
+        return (kind, path) in self._sequences
+
+    def rotated(self, path: str, angle: float):
+        """Get the pre-rendered frame nearest to the given rotation
+
+        path: the source image path
+        angle: the rotation angle in degrees, clockwise
+        return: the surface and the angle it was rendered at, or None if there is no such sequence or
+            the angle is out of its range
+        """
+        sequence = self._sequences.get(('rotated', path))
+        if sequence is None:
+            return None
+        step = sequence['step']
+        period = sequence['period']
+        i = int(round(((angle - sequence['first']) % period) / step))
+        if i * step >= period:
+            i = 0
+        if i >= len(sequence['frames']):
+            return None
+        return self._frame(sequence, i), sequence['first'] + i * step
+
+    def scaled(self, path: str, scale: float):
+        """Get the pre-rendered frame nearest to the given scale
+
+        path: the source image path
+        scale: the scale factor
+        return: the surface or None if there is no such sequence or the scale is out of its range
+        """
+        sequence = self._sequences.get(('scaled', path))
+        if sequence is None:
+            return None
+        i = int(round((scale - sequence['first']) / sequence['step']))
+        if i < 0 or i >= len(sequence['frames']):
+            return None
+        return self._frame(sequence, i)
+
+    def prefetch(self, sprites: list):
+        """Read the frames of sequences before they are drawn, one frame per step, so the first frames
+        drawn do not wait for the SD card
+
+        sprites: list of (kind, source image path)
+        """
+        for kind, path in sprites:
+            sequence = self._sequences.get((kind, path))
+            if sequence is None:
+                continue
+            for i, (offset, width, height) in enumerate(sequence['frames']):
+                self._frame(sequence, i)
+                # Touch a byte of each memory page of the frame
+                self._maps[sequence['file']][offset:offset + width * height * 4:mmap.PAGESIZE].tobytes()
+                yield
+
+    def _frame(self, sequence: dict, i: int) -> pygame.Surface:
+        """Wrap a frame of a sequence in a surface, mapping the atlas file on first use
+        """
+        key = (sequence['file'], i)
+        surface = self._frames.get(key)
+        if surface is not None:
+            self._stats.hits += 1
+            return surface
+        self._stats.misses += 1
+        if sequence['file'] not in self._maps:
+            with open(self._directory / sequence['file'], 'rb') as f:
+                self._maps[sequence['file']] = memoryview(mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ))
+            self._stats.bytes += len(self._maps[sequence['file']])
+        offset, width, height = sequence['frames'][i]
+        data = self._maps[sequence['file']][offset:offset + width * height * 4]
+        surface = pygame.image.frombuffer(data, (width, height), self._format)
+        self._frames[key] = surface
+        self._stats.entries = len(self._frames)
+        return surface
@@ -0,0 +1,180 @@
+'''
+Cache module for the Bell 47 demonstrator rig
+Holds decoded and transformed surfaces within a memory budget with LRU eviction
+'''
+import logging
+import pygame
+from collections import OrderedDict
+
+import defs
+from telemetry import Telemetry, cache_stats
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    """Get the memory used by the pixels of a surface
+    """
+    return surface.get_pitch() * surface.get_height()
+
+class SurfaceCache(object):
+    """Central cache of surfaces with a byte budget.
+
+        Each surface is held against an owner (e.g. the widget class that created it) and the ProgramState
+        that was current when it was added so the memory held can be reported by both.
+        Pinned surfaces are never evicted, the rest are evicted least recently used first when over budget
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton surface cache
+        """
+        if SurfaceCache.__instance == None:
+            SurfaceCache.__instance = SurfaceCache(defs.SURFACE_BUDGET)
+        return SurfaceCache.__instance
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.bytes = 0
+        self._entries = OrderedDict()  # key: [surface, owner, state, size, pinned]
+        self._owner_bytes = {}
+        self._state_bytes = {}
+        self._stats = cache_stats('surfaces')
+        self._over_budget = False
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key) -> pygame.Surface:
+        """Get a surface, marking it as recently used
+
+        key: the surface key
+        return: the surface or None if it is not cached
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats.misses += 1
+            return None
+        self._stats.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, surface: pygame.Surface, owner: str, pinned: bool = False) -> pygame.Surface:
+        """Add a surface to the cache, evicting others if the budget is exceeded
+
+        key: the surface key
+        surface: the surface to cache
+        owner: the name of the owner used for reporting
+        pinned: when True the surface is never evicted
+        return: the surface
+        """
+        if key in self._entries:
+            self.evict(key)
+        state = Telemetry.get_instance().state
+        state = state.name if state is not None else "STARTUP"
+        size = surface_bytes(surface)
+        self._entries[key] = [surface, owner, state, size, pinned]
+        self._account(owner, state, size)
+        self._trim()
+        return surface
+
+    def load(self, path: str, alpha: bool = True, owner: str = 'images', pinned: bool = False) -> pygame.Surface:
+        """Get an image, loading and converting it to the display format on first use.
+        The surface is shared so must not be drawn on, copy it first if it is to be modified
+
+        path: the image file path
+        alpha: when True image contains transparency
+        owner: the name of the owner used for reporting
+        pinned: when True the image is never evicted
+        """
+        key = ('image', path, alpha)
+        surface = self.get(key)
+        if surface is None:
+            surface = self.convert(path, pygame.image.load(path), alpha, owner, pinned)
+        elif pinned:
+            self._entries[key][4] = True
+        return surface
+
+    def convert(self, path: str, surface: pygame.Surface, alpha: bool = True, owner: str = 'images', pinned: bool = False) -> pygame.Surface:
+        """Convert a decoded image to the display format and add it to the cache.
+        Must be called on the main thread
+
+        path: the image file path the surface was decoded from
+        surface: the decoded image
+        alpha: when True image contains transparency
+        owner: the name of the owner used for reporting
+        pinned: when True the image is never evicted
+        """
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        return self.put(('image', path, alpha), surface, owner, pinned)
+
+    def pin(self, key, pinned: bool = True):
+        """Pin or unpin a cached surface
+        """
+        if key in self._entries:
+            self._entries[key][4] = pinned
+
+    def evict(self, key):
+        """Remove a surface from the cache
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._account(entry[1], entry[2], -entry[3])
+
+    def evict_owner(self, owner: str):
+        """Remove all the unpinned surfaces held by an owner
+        """
+        for key in [k for k, e in self._entries.items() if e[1] == owner and not e[4]]:
+            self.evict(key)
+
+    def owner_bytes(self, owner: str) -> int:
+        """Get the bytes held by an owner
+        """
+        return self._owner_bytes.get(owner, 0)
+
+    def trim_owner(self, owner: str, budget: int):
+        """Evict the least recently used unpinned surfaces of an owner until it is within its own budget
+
+        owner: the name of the owner
+        budget: the bytes the owner may hold
+        """
+        for key in [k for k, e in self._entries.items() if e[1] == owner and not e[4]]:
+            if self.owner_bytes(owner) <= budget:
+                return
+            self.evict(key)
+
+    def _account(self, owner: str, state: str, size: int):
+        self.bytes += size
+        self._owner_bytes[owner] = self._owner_bytes.get(owner, 0) + size
+        self._state_bytes[state] = self._state_bytes.get(state, 0) + size
+        self._stats.entries = len(self._entries)
+        self._stats.bytes = self.bytes
+
+    def _trim(self):
+        """Evict least recently used unpinned surfaces until within the budget
+        """
+        if self.bytes <= self.budget:
+            self._over_budget = False
+            return
+        for key in [k for k, e in self._entries.items() if not e[4]]:
+            self.evict(key)
+            if self.bytes <= self.budget:
+                return
+        if not self._over_budget:
+            self._over_budget = True
+            logging.warning("Pinned surfaces use %d bytes, more than the cache budget of %d", self.bytes, self.budget)
+
+    def report(self) -> dict:
+        """Get the bytes held by each owner and by each program state
+        """
+        return {
+            'owners': {k: v for k, v in dict(self._owner_bytes).items() if v},
+            'states': {k: v for k, v in dict(self._state_bytes).items() if v},
+            }
+
+def load_image(path: str, owner: str = 'images', alpha: bool = True, pinned: bool = False) -> pygame.Surface:
+    """Get a shared image from the surface cache, loading it on first use
+
+    path: the image file path
+    owner: the name of the owner used for reporting
+    alpha: when True image contains transparency
+    pinned: when True the image is never evicted
+    """
+    return SurfaceCache.get_instance().load(path, alpha, owner, pinned)
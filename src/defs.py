@@ -58,6 +58,10 @@ SCREEN_WIDTH = config['main'].getint('screen_width', fallback = 1280)
 SCREEN_HEIGHT = config['main'].getint('screen_height', fallback = 1024)
 FLAG_HIGHLIGHT_WIDTH = config['main'].getint('flag_highlight_width', fallback = 4)
 SCROLL_INCREMENT = config['main'].getint('scroll_increment', fallback = 10)
+SMOOTH_SCROLL = config['main'].getboolean('smooth_scroll', fallback = False)
+SCROLL_SPEED = config['main'].getint('scroll_speed', fallback = 1200)
+SCROLL_FPS = config['main'].getint('scroll_fps', fallback = 60)
+RUNTIME_DIR = config['main'].get('runtime_dir', fallback = '/dev/shm/FCD')
 
 #colour
 WHITE = '[255, 255, 255]'
@@ -89,6 +93,8 @@ SIM_BACKGROUND_COLOUR = json.loads(config['colours'].get('sim_background', fallb
 HIGHLIGHT_COLOUR = json.loads(config['colours'].get('highlight', fallback = VERY_LIGHT_GOLD))
 CALIBRATE_BACKGROUND_COLOUR = json.loads(config['colours'].get('calibrate_background', fallback = LIGHT_RED))
 CALIBRATE_FOREGROUND_COLOUR = json.loads(config['colours'].get('calibrate_foreground', fallback = BLACK))
+HUD_FOREGROUND_COLOUR = json.loads(config['colours'].get('hud_text', fallback = WHITE))
+HUD_BACKGROUND_COLOUR = json.loads(config['colours'].get('hud_background', fallback = BLACK))
 
 # fonts
 FONT_WELCOME = config['fonts'].get('welcome', fallback = 'Arial,64,False,False').split(',')
@@ -115,11 +121,14 @@ FONT_METER_zh = config['fonts'].get('meter_zh', fallback = 'NotoSansSC,12,True,F
 # control
 SEAT_TIMEOUT = config['control'].getfloat('seat_timeout', fallback = 60.0)
 INACTIVE_TIMEOUT = config['control'].getfloat('inactive_timeout', fallback = 300.0)
+LANDED_DELAY = config['control'].getfloat('landed_delay', fallback = 5.0)
+MOTOR_TIMEOUT = config['control'].getfloat('motor_timeout', fallback = 600.0)
 
 # device
 TOLERANCE = config['device'].getfloat('tolerance', fallback = 0.005)
 BTN_SELECT = config['device'].getint('select_button', fallback = BTN.BTN3.value)
 BTN_RESET = config['device'].getint('reset_button', fallback = BTN.BTN5.value)
+BTN_HUD = config['device'].getint('hud_button', fallback = BTN.BTN4.value)
 
 # calibration
 XPOT_MIN = config['calibration'].getfloat('cyclic_lat_min', fallback = 0.0)
@@ -151,10 +160,62 @@ WINDMILL_THRUST = config['simulator'].getfloat('windmill_thrust', fallback = 5.0
 BANKING_FACTOR = config['simulator'].getfloat('banking_factor', fallback = 1000.0)
 DASH_HEIGHT = config['simulator'].getint('dashboard_height', fallback = 240)
 HELI_ROTATION_PERCENT = config['simulator'].getfloat('helicopter_rotation_percent', fallback = 5.0)
+SIM_FPS = config['simulator'].getint('basic_fps', fallback = 40)
+SIM_ADVANCED_FPS = config['simulator'].getint('advanced_fps', fallback = 20)
+CONTROLS_FPS = config['simulator'].getint('controls_fps', fallback = 60)
 CRASH_LANDING_SPEED = config['main'].getfloat('crash_landing_speed', fallback = 250.0)
 HEANY_LANDING_SPEED = config['main'].getfloat('heavy_landing_speed', fallback = 100.0)
 LANDING_PAD_OFFSET = config['main'].getint('landing_pad_offset', fallback = 100)
 
+# telemetry
+TELEMETRY_ENABLED = config['telemetry'].getboolean('enabled', fallback = True)
+TELEMETRY_FRAMES = config['telemetry'].getint('frames', fallback = 4096)
+TELEMETRY_SESSIONS = config['telemetry'].getint('sessions', fallback = 4)
+TELEMETRY_SESSION_BYTES = int(config['telemetry'].getfloat('session_mb', fallback = 4.0) * 1024 * 1024)
+
+# hud
+HUD_VISIBLE = config['hud'].getboolean('visible', fallback = False)
+HUD_REFRESH = config['hud'].getfloat('refresh', fallback = 0.5)
+HUD_FRAMES = config['hud'].getint('frames', fallback = 120)
+
+# governor
+GOVERNOR_ENABLED = config['governor'].getboolean('enabled', fallback = True)
+GOVERNOR_WINDOW = config['governor'].getint('window', fallback = 30)
+GOVERNOR_DOWN = config['governor'].getint('down', fallback = 2)
+GOVERNOR_UP = config['governor'].getint('up', fallback = 5)
+QUALITY = config['governor'].get('quality', fallback = 'high')
+QUALITY_MAX = config['governor'].get('max_quality', fallback = 'high')
+
+# probe
+PROBE_ENABLED = config['probe'].getboolean('enabled', fallback = True)
+PROBE_FILE = config['probe'].get('file', fallback = 'probe.json')
+
+# profile
+PROFILE_MODE = config['profile'].get('mode', fallback = 'off')
+PROFILE_INTERVAL = config['profile'].getfloat('interval', fallback = 5.0) / 1000
+
+# watchdog
+WATCHDOG_ENABLED = config['watchdog'].getboolean('enabled', fallback = True)
+WATCHDOG_BUDGET = config['watchdog'].getfloat('frame_budget', fallback = 2.0)
+WATCHDOG_FRAMES = config['watchdog'].getint('frames', fallback = 20)
+WATCHDOG_LOG_BYTES = int(config['watchdog'].getfloat('log_kb', fallback = 256.0) * 1024)
+
+# metrics
+METRICS_ENABLED = config['metrics'].getboolean('enabled', fallback = False)
+METRICS_PORT = config['metrics'].getint('port', fallback = 9464)
+METRICS_SOCKET = config['metrics'].get('socket', fallback = '')
+METRICS_FRAMES = config['metrics'].getint('frames', fallback = 400)
+
+# cache
+SURFACE_BUDGET = int(config['cache'].getfloat('surface_budget_mb', fallback = 64.0) * 1024 * 1024)
+PARAGRAPH_BUDGET = int(config['cache'].getfloat('paragraph_budget_mb', fallback = 16.0) * 1024 * 1024)
+DECODE_THREADS = config['cache'].getint('decode_threads', fallback = 0)
+ATLAS_DIR = config['cache'].get('atlas_dir', fallback = 'atlas')
+SNAPSHOT_DIR = config['cache'].get('snapshot_dir', fallback = 'snapshots')
+PAGE_DIR = config['cache'].get('page_dir', fallback = '')
+WARMUP_DELAY = config['cache'].getfloat('warmup_delay', fallback = 1.0)
+FONTS_INDEX = config['cache'].get('font_index', fallback = 'fonts.json')
+
 def reset_calibration():
     global XPOT_MIN, YPOT_MIN, ZPOT_MIN, RPOT_MIN, XPOT_MAX, YPOT_MAX, ZPOT_MAX, RPOT_MAX
     XPOT_MIN = YPOT_MIN = ZPOT_MIN = RPOT_MIN = 0.0
@@ -27,6 +27,7 @@ class InterfaceBoard(threading.Thread):
         self.daemon = True
         self._event_module = event_module
         self._present = gpio_present
+        self.polls = 0
         if self._present:
             self._buttons = {
                 defs.GPIO.BTN1.value  : {"id" : defs.BTN.BTN1.value,  "name" : "Btn1"}, 
@@ -100,9 +101,9 @@ class InterfaceBoard(threading.Thread):
         if self._present:
             btn = self._buttons[button.pin.number]
             if btn["NC"]:
-                self._event_module.post(self._event_module.Event(JOYBUTTONUP, {'button':btn["id"], 'name':btn["name"]}))
+                self._event_module.post(self._event_module.Event(JOYBUTTONUP, {'button':btn["id"], 'name':btn["name"], 'read_ns':time.perf_counter_ns()}))
             else:
-                self._event_module.post(self._event_module.Event(JOYBUTTONDOWN, {'button':btn["id"], 'name':btn["name"]}))
+                self._event_module.post(self._event_module.Event(JOYBUTTONDOWN, {'button':btn["id"], 'name':btn["name"], 'read_ns':time.perf_counter_ns()}))
     
     def _button_released(self, button):
         """Callback function for when a button is released, generates a JOYBUTTON event
@@ -112,9 +113,9 @@ class InterfaceBoard(threading.Thread):
         if self._present:
             btn = self._buttons[button.pin.number]
             if btn["NC"]:
-                self._event_module.post(self._event_module.Event(JOYBUTTONDOWN, {'button':btn["id"], 'name':btn["name"]}))
+                self._event_module.post(self._event_module.Event(JOYBUTTONDOWN, {'button':btn["id"], 'name':btn["name"], 'read_ns':time.perf_counter_ns()}))
             else:
-                self._event_module.post(self._event_module.Event(JOYBUTTONUP, {'button':btn["id"], 'name':btn["name"]}))
+                self._event_module.post(self._event_module.Event(JOYBUTTONUP, {'button':btn["id"], 'name':btn["name"], 'read_ns':time.perf_counter_ns()}))
 
     def _button_held(self, button):
         self._button_pressed(button)
@@ -181,26 +182,29 @@ class InterfaceBoard(threading.Thread):
     def run(self):
         """Daemon process for the thread to monitor potentiometer movements.
         
-        Only movements greater than the specified TOLERANCE are used to generate JOYAXISMOTION events
+        Only movements greater than the specified TOLERANCE are used to generate JOYAXISMOTION events.
+        Events carry the time the controls were read so that the input latency can be measured
         """
         if self._present: 
             while self._run:
+                read_ns = time.perf_counter_ns()
+                self.polls += 1
                 if abs(self._xpot.value - self._x) > defs.TOLERANCE:
                     self._x = self._xpot.value
                     x = self.get_axis_value(0)
-                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0, 'axis':0, 'value':x}))
+                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0, 'axis':0, 'value':x, 'read_ns':read_ns}))
                 if abs(self._ypot.value - self._y) > defs.TOLERANCE:
                     self._y = self._ypot.value
                     y = self.get_axis_value(1)
-                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0, 'axis':1, 'value':y}))
+                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0, 'axis':1, 'value':y, 'read_ns':read_ns}))
                 if abs(self._zpot.value - self._z) > defs.TOLERANCE:
                     self._z = self._zpot.value
                     z = self.get_axis_value(2)
-                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0, 'axis':2, 'value':z}))
+                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0, 'axis':2, 'value':z, 'read_ns':read_ns}))
                 if abs(self._rpot.value - self._r) > defs.TOLERANCE:
                     self._r = self._rpot.value
                     r = self.get_axis_value(3)
-                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0,'axis':3, 'value':r}))
+                    self._event_module.post(self._event_module.Event(JOYAXISMOTION, {'joy':0,'axis':3, 'value':r, 'read_ns':read_ns}))
                 time.sleep(0.1)
     
     def stop(self):
@@ -0,0 +1,99 @@
+'''
+Fonts module for the Bell 47 demonstrator rig
+Resolves font families to files with a persistent index so the system fonts are only scanned when the index is built
+'''
+import json
+import logging
+from pathlib import Path
+
+import pygame
+
+import defs
+
+_fallbacks = set()
+
+def configured_fonts() -> list:
+    """Get the family, bold and italic of every font defined in FCD.ini, with the style flags read as mmi.str2bool reads them
+    """
+    return [(d[0], d[2].lower() in ("yes", "true", "t", "1"), d[3].lower() in ("yes", "true", "t", "1"))
+            for d in (getattr(defs, name) for name in dir(defs) if name.startswith('FONT_')) if isinstance(d, list)]
+
+def _key(family: str, bold: bool, italic: bool) -> str:
+    return "%s,%d,%d" % (family.strip().lower(), bold, italic)
+
+class FontIndex(object):
+    """Map font family and style to a font file, as pygame.font.SysFont would.
+
+        The index is saved as JSON so that later runs do not need fc-list. An entry records the file
+        and whether bold or italic have to be synthesised because the family has no such style
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton font index
+        """
+        if FontIndex.__instance == None:
+            FontIndex.__instance = FontIndex(defs.FONTS_INDEX)
+        return FontIndex.__instance
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+        self._entries = {}
+        try:
+            with open(self._path) as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning("Unable to read font index %s: %s", self._path, e)
+
+    def build(self, fonts: list):
+        """Scan the system fonts for each font and save the index
+
+        fonts: list of (family, bold, italic)
+        """
+        for family, bold, italic in fonts:
+            self._entries[_key(family, bold, italic)] = pygame.font.SysFont(
+                family.strip(), 0, bold, italic, constructor = lambda path, size, set_bold, set_italic: [path, set_bold, set_italic])
+        self.save()
+
+    def save(self):
+        """Save the index, if the file system is writable
+        """
+        try:
+            with open(self._path, 'w') as f:
+                json.dump(self._entries, f, indent = 1)
+        except OSError as e:
+            logging.info("Font index not saved: %s", e)
+
+    def lookup(self, family: str, bold: bool, italic: bool) -> list:
+        """Get the font file for a family and style, building the index if the font is not in it
+
+        return: [path or None for the default font, synthesise bold, synthesise italic]
+        """
+        key = _key(family, bold, italic)
+        entry = self._entries.get(key)
+        if entry is None or (entry[0] is not None and not Path(entry[0]).exists()):
+            logging.info("Font %s is not in the font index, scanning the system fonts", family.strip())
+            self.build(configured_fonts() + [(family, bold, italic)])
+            entry = self._entries[key]
+        return entry
+
+def load_font(family: str, size: int, bold: bool, italic: bool) -> pygame.font.Font:
+    """Load a font by file path using the font index
+
+    family: the font family, None or 'None' for the default font
+    size: the font size
+    bold: when True use the bold style, synthesised if the family has none
+    italic: when True use the italic style, synthesised if the family has none
+    """
+    path, set_bold, set_italic = None, bold, italic
+    if family is not None and family.strip() != 'None':
+        path, set_bold, set_italic = FontIndex.get_instance().lookup(family, bold, italic)
+        if path is None and family not in _fallbacks:
+            _fallbacks.add(family)
+            logging.warning("Font %s not found, using the default font", family.strip())
+    font = pygame.font.Font(path, size)
+    font.set_bold(set_bold)
+    font.set_italic(set_italic)
+    return font
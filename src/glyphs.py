@@ -0,0 +1,165 @@
+'''
+Glyphs module for the Bell 47 demonstrator rig
+Composes Chinese and Russian text from glyph atlases pre-rendered by Build.py rather than rasterising it with font.render
+'''
+import json
+import logging
+import mmap
+from pathlib import Path
+
+import pygame
+
+import defs
+from telemetry import cache_stats
+
+INDEX = "glyphs.json"
+LANGUAGES = ('zh', 'ru')
+
+_index = None
+_atlases = {}
+
+class GlyphAtlas(object):
+    """The glyphs of the characters used by one language in one font, rendered in white.
+
+        Lines are composed by blitting each glyph at the pen position, advanced by the font's advance
+        for each character, and then tinting them to the text colour. Lines are measured with the same
+        advances so they are wrapped to the width they are drawn at. Characters not in the atlas are
+        rendered with the font on first use
+    """
+    def __init__(self, font: pygame.font.Font, path: Path, entry: dict):
+        self._font = font
+        self._glyphs = entry['glyphs']
+        self._path = path
+        self._data = None
+        self._surfaces = {}
+        self._metrics = {}
+        self._stats = cache_stats('glyphs')
+
+    def _glyph(self, ch: str) -> pygame.Surface:
+        surface = self._surfaces.get(ch)
+        if surface is not None:
+            self._stats.hits += 1
+            return surface
+        self._stats.misses += 1
+        glyph = self._glyphs.get(ch)
+        if glyph is None:
+            surface = self._font.render(ch, True, defs.WHITE)
+        else:
+            if self._data is None:
+                with open(self._path, 'rb') as f:
+                    self._data = memoryview(mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ))
+            offset, width, height = glyph
+            surface = pygame.image.frombuffer(self._data[offset:offset + width * height * 4], (width, height), 'BGRA')
+        self._surfaces[ch] = surface
+        self._stats.entries += 1
+        return surface
+
+    def _metric(self, ch: str) -> (int, int, int):
+        """Get the offset of a character's glyph image from the pen position, the advance to the next
+        character and the right edge of the glyph from the pen position
+        """
+        metric = self._metrics.get(ch)
+        if metric is None:
+            m = self._font.metrics(ch)[0]
+            if m is None:
+                width = self._font.size(ch)[0]
+                metric = (0, width, width)
+            else:
+                metric = (min(0, m[0]), m[4], max(m[1], m[4]))
+            self._metrics[ch] = metric
+        return metric
+
+    def _positions(self, text: str) -> (list, int):
+        """Lay out a line of text
+
+        return: the x position of each character's glyph image and the width of the line
+        """
+        positions = []
+        pen = right = 0
+        for ch in text:
+            offset, advance, edge = self._metric(ch)
+            positions.append(pen + offset)
+            right = max(right, pen + edge)
+            pen += advance
+        left = -min(positions, default = 0)
+        return [x + left for x in positions], right + left
+
+    def size(self, text: str) -> int:
+        """Get the width of a line of text as composed by render()
+        """
+        return self._positions(text)[1]
+
+    def render(self, text: str, colour) -> pygame.Surface:
+        """Compose a line of text from the glyphs
+
+        text: the line of text
+        colour: the text colour
+        return: the text on a transparent surface
+        """
+        positions, width = self._positions(text)
+        surface = pygame.Surface((max(1, width), self._font.get_height()), pygame.SRCALPHA)
+        for ch, x in zip(text, positions):
+            surface.blit(self._glyph(ch), (x, 0))
+        surface.fill(pygame.Color(colour), special_flags = pygame.BLEND_RGBA_MULT)
+        return surface
+
+def _load_index() -> dict:
+    """Read the glyph atlas index
+    """
+    path = Path(defs.ATLAS_DIR) / INDEX
+    try:
+        with open(path, encoding = 'utf-8') as f:
+            return json.load(f)['fonts']
+    except FileNotFoundError:
+        logging.info("No glyph atlas in %s, text will be rendered with the fonts", defs.ATLAS_DIR)
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning("Unable to read glyph atlas index %s: %s", path, e)
+    return {}
+
+def attach(font: pygame.font.Font, name: str, font_def: list):
+    """Use the glyph atlas for a font if one has been built for it
+
+    font: the loaded font
+    name: the font name e.g. text_zh
+    font_def: the font definition from FCD.ini the font was loaded from
+    """
+    global _index
+    if name[-2:] not in LANGUAGES:
+        return
+    if _index is None:
+        _index = _load_index()
+    entry = _index.get(name)
+    if entry is None:
+        return
+    if entry['font'] != [d.strip() for d in font_def]:
+        logging.warning("Glyph atlas for %s was built for a different font, rebuild it with Build.py glyphs", name)
+        return
+    _atlases[font] = GlyphAtlas(font, Path(defs.ATLAS_DIR) / entry['file'], entry)
+
+def detach(font: pygame.font.Font):
+    """Stop using the glyph atlas of a font that is being released
+    """
+    _atlases.pop(font, None)
+
+def width(font: pygame.font.Font, text: str) -> int:
+    """Get the width of a line of text as rendered by render()
+
+    font: the font
+    text: the line of text
+    """
+    atlas = _atlases.get(font)
+    if atlas is None:
+        return font.size(text)[0]
+    return atlas.size(text)
+
+def render(font: pygame.font.Font, text: str, colour) -> pygame.Surface:
+    """Render a line of antialiased text, from the font's glyph atlas if it has one
+
+    font: the font
+    text: the line of text
+    colour: the text colour
+    """
+    atlas = _atlases.get(font)
+    if atlas is None:
+        return font.render(text, True, colour)
+    return atlas.render(text, colour)
@@ -0,0 +1,133 @@
+'''
+Governor module for the Bell 47 demonstrator rig
+Holds the simulator's frame rate by stepping the rendering quality down when frames take too long and back up when there is time to spare
+'''
+import logging
+
+import defs
+import graphics
+import telemetry
+from telemetry import Telemetry
+from hud import PerformanceHud
+
+class Quality(object):
+    """The settings of one quality level
+    """
+    def __init__(self, name: str, landscape: float, rotation_percent: float, smooth: bool, horizon: float,
+                 shadow: bool, hud_refresh: float):
+        """
+        name: the level name used in FCD.ini and the log
+        landscape: the fraction of the landscape items shown
+        rotation_percent: the quantum the helicopter heading is rounded to before it is rotated
+        smooth: rotate with smoothing rather than with the faster transform.rotate
+        horizon: the change in degrees needed to redraw the artificial horizon
+        shadow: show the helicopter's shadow
+        hud_refresh: seconds between re-rendering the performance HUD
+        """
+        self.name = name
+        self.landscape = landscape
+        self.rotation_percent = rotation_percent
+        self.smooth = smooth
+        self.horizon = horizon
+        self.shadow = shadow
+        self.hud_refresh = hud_refresh
+
+# Quality levels from best to worst
+LEVELS = (
+    Quality('ultra', 1.0, defs.HELI_ROTATION_PERCENT, True, 1.0, True, defs.HUD_REFRESH),
+    Quality('high', 1.0, defs.HELI_ROTATION_PERCENT, True, 1.0, False, defs.HUD_REFRESH),
+    Quality('medium', 0.5, 100.0, True, 2.0, False, max(1.0, defs.HUD_REFRESH)),
+    Quality('low', 0.25, 200.0, False, 4.0, False, max(2.0, defs.HUD_REFRESH)),
+    )
+NAMES = [level.name for level in LEVELS]
+
+def level_index(name: str) -> int:
+    """Get the index of a quality level, the default level if the name is unknown
+    """
+    if name in NAMES:
+        return NAMES.index(name)
+    logging.warning("Unknown quality level '%s', using 'high'", name)
+    return NAMES.index('high')
+
+class QualityGovernor(object):
+    """Watch the frame times of the simulator and change the quality level to hold its frame rate.
+
+        Every GOVERNOR_WINDOW frames the 90th percentile frame time is compared with the target. The
+        quality is stepped down after GOVERNOR_DOWN slow windows in a row, and stepped back up after
+        GOVERNOR_UP windows in a row in which the frames were drawn in well under the target time, so it
+        does not flip between levels. The frame time includes the wait for the next frame, so the time
+        spent drawing, the sum of the telemetry stages, is used to judge whether there is time to spare
+    """
+    SLOW = 1.1    # Fraction of the target frame time above which a window is slow
+    FAST = 0.6    # Fraction of the target frame time the drawing must be under for a window to be fast
+
+    def __init__(self, fps: int, helicopter, landscape, horizon = None):
+        """
+        fps: the target frame rate
+        helicopter: the Helicopter widget
+        landscape: the Landscape widget
+        horizon: the ArtificialHorizon widget, if shown
+        """
+        self._target = 1e6 / fps
+        self._helicopter = helicopter
+        self._landscape = landscape
+        self._horizon = horizon
+        self._best = level_index(defs.QUALITY_MAX)
+        self._level = max(self._best, level_index(defs.QUALITY))
+        self._frames = 0
+        self._slow = 0
+        self._fast = 0
+        self._apply()
+
+    def quality(self) -> Quality:
+        """Get the current quality level
+        """
+        return LEVELS[self._level]
+
+    def update(self):
+        """Count a frame, checking the frame times at the end of each window
+        """
+        self._frames += 1
+        if not defs.GOVERNOR_ENABLED or self._frames < defs.GOVERNOR_WINDOW:
+            return
+        self._frames = 0
+        frames = Telemetry.get_instance().frames(defs.GOVERNOR_WINDOW)
+        frame = telemetry.percentile(sorted(frames['frame']), 90)
+        busy = telemetry.percentile(sorted(sum(stages) for stages in frames['stages']), 90)
+        if frame > self._target * self.SLOW:
+            self._slow += 1
+            self._fast = 0
+        elif busy < self._target * self.FAST:
+            self._fast += 1
+            self._slow = 0
+        else:
+            self._slow = self._fast = 0
+        if self._slow >= defs.GOVERNOR_DOWN and self._level < len(LEVELS) - 1:
+            self._change(self._level + 1, frame, busy)
+        elif self._fast >= defs.GOVERNOR_UP and self._level > self._best:
+            self._change(self._level - 1, frame, busy)
+
+    def stop(self):
+        """Restore the settings shared with the other screens when the simulator finishes
+        """
+        graphics.smooth_rotation = True
+        PerformanceHud.get_instance().refresh = defs.HUD_REFRESH
+
+    def _change(self, level: int, frame: float, busy: float):
+        logging.info("Quality %s -> %s: p90 frame %.1f ms, drawing %.1f ms, target %.1f ms", LEVELS[self._level].name,
+                     LEVELS[level].name, frame / 1000, busy / 1000, self._target / 1000)
+        self._level = level
+        self._slow = self._fast = 0
+        self._apply()
+
+    def _apply(self):
+        """Set the widgets to the current quality level
+        """
+        quality = LEVELS[self._level]
+        self._landscape.set_density(quality.landscape)
+        self._helicopter.rotation_percent = quality.rotation_percent
+        self._helicopter.set_shadow(quality.shadow)
+        graphics.smooth_rotation = quality.smooth
+        if self._horizon is not None:
+            self._horizon.set_precision(quality.horizon)
+        PerformanceHud.get_instance().refresh = quality.hud_refresh
@@ -6,10 +6,26 @@ import pygame
 import math
 import random
 #import logging
+from collections import OrderedDict
 from enum import Enum
 
 import defs
 import mmi
+from cache import SurfaceCache, load_image
+from assets import AssetManager
+from atlas import Atlas
+import glyphs
+from telemetry import cache_stats
+
+# Rotate with smoothing, or with the faster transform.rotate when the quality governor needs the time
+smooth_rotation = True
+
+# Rotations are kept in a small ring of their own rather than the surface cache, as a turning sprite would
+# fill the cache and evict the screens it holds. The step matches the sprite atlas built by Build.py
+ROTATION_STEP = 2.0
+ROTATION_ENTRIES = 32
+_rotations = OrderedDict()
+_rotation_stats = cache_stats('rotations')
 
 def rotate(surface: pygame.surface, angle: float, pivot, offset: pygame.math.Vector2 = pygame.math.Vector2(0, 0), scale:float = 1.0):
     """Rotate the surface around the pivot point.
@@ -19,12 +35,84 @@ def rotate(surface: pygame.surface, angle: float, pivot, offset: pygame.math.Vec
     pivot (tuple, list, pygame.math.Vector2): The pivot point.
     offset (pygame.math.Vector2): This vector is added to the pivot.
     """
-    rotated_image = pygame.transform.rotozoom(surface, -angle, scale)  # Rotate the image.
+    if smooth_rotation or scale != 1.0:
+        rotated_image = pygame.transform.rotozoom(surface, -angle, scale)  # Rotate the image.
+    else:
+        rotated_image = pygame.transform.rotate(surface, -angle)
     rotated_offset = offset.rotate(angle)  # Rotate the offset vector.
     # Add the offset vector to the center/pivot point to shift the rect.
     rect = rotated_image.get_rect(center = pivot + rotated_offset)
     return rotated_image, rect  # Return the rotated image and shifted rect.
 
+def rotate_sprite(path: str, surface: pygame.surface, angle: float, pivot, offset: pygame.math.Vector2 = pygame.math.Vector2(0, 0)):
+    """Rotate the surface around the pivot point using the nearest pre-rendered frame from the sprite atlas
+    if there is one, otherwise rotating it now.
+
+    path: the image file path of the surface
+    surface: the surface that is to be rotated
+    angle: rotate by this angle
+    pivot: the pivot point
+    offset: this vector is added to the pivot
+    """
+    frame = Atlas.get_instance().rotated(path, angle)
+    if frame is None:
+        return rotate(surface, angle, pivot, offset)
+    rotated_image, angle = frame
+    return rotated_image, rotated_image.get_rect(center = pivot + offset.rotate(angle))
+
+def rotate_cached(key, surface: pygame.surface, angle: float, pivot, offset: pygame.math.Vector2):
+    """Rotate the surface around the pivot point, reusing the recently rotated images.
+    The angle is rounded to ROTATION_STEP degrees so that the rotated images can be reused.
+
+    key: the key identifying the unrotated surface e.g. its path
+    surface: the surface that is to be rotated
+    angle: rotate by this angle
+    pivot: the pivot point
+    offset: this vector is added to the pivot
+    """
+    if Atlas.get_instance().has('rotated', key):
+        return rotate_sprite(key, surface, angle, pivot, offset)
+    angle = round(angle / ROTATION_STEP) * ROTATION_STEP
+    cache_key = (key, angle, smooth_rotation)
+    rotated_image = _rotations.get(cache_key)
+    if rotated_image is None:
+        _rotation_stats.misses += 1
+        if smooth_rotation:
+            rotated_image = pygame.transform.rotozoom(surface, -angle, 1.0)
+        else:
+            rotated_image = pygame.transform.rotate(surface, -angle)
+        _rotations[cache_key] = rotated_image
+        _rotation_stats.bytes += rotated_image.get_bytesize() * rotated_image.get_width() * rotated_image.get_height()
+        if len(_rotations) > ROTATION_ENTRIES:
+            evicted = _rotations.popitem(last = False)[1]
+            _rotation_stats.bytes -= evicted.get_bytesize() * evicted.get_width() * evicted.get_height()
+        _rotation_stats.entries = len(_rotations)
+    else:
+        _rotation_stats.hits += 1
+        _rotations.move_to_end(cache_key)
+    rect = rotated_image.get_rect(center = pivot + offset.rotate(angle))
+    return rotated_image, rect
+
+def scale_cached(key, surface: pygame.surface, scale: float, owner: str):
+    """Scale a square surface, reusing the scaled image from the surface cache.
+    The scale should be quantized so that the cached images can be reused.
+
+    key: the key identifying the unscaled surface e.g. its path
+    surface: the surface that is to be scaled
+    scale: the scale factor
+    owner: the owner of the scaled image in the cache
+    """
+    scaled_image = Atlas.get_instance().scaled(key, scale)
+    if scaled_image is not None:
+        return scaled_image
+    surfaces = SurfaceCache.get_instance()
+    cache_key = ('scaled', key, scale)
+    scaled_image = surfaces.get(cache_key)
+    if scaled_image is None:
+        img_width = int(surface.get_width() * scale)
+        scaled_image = surfaces.put(cache_key, pygame.transform.scale(surface, (img_width, img_width)), owner)
+    return scaled_image
+
 def quantize(value: float, quantum: float):
     """Limit the return value to increments of quantum percent, rounded up
     e.g. for 5% a value of .98 would return 1.0, 0.53 would return 0.55
@@ -85,7 +173,7 @@ class Meter(Dial):
         self._needle_rect = None
         self._font = mmi.get_font(mmi.METER_FONT)
         self._label = label
-        self._needle = pygame.image.load("images/Meter Needle.png").convert_alpha()
+        self._needle = load_image("images/Meter Needle.png", 'Meter')
         self._needle_pivot_offset = [110, 110]
         self._needle_offset = pygame.math.Vector2(0, -self._needle.get_height() / 2 - 8)
         self._min_angle = -90.0
@@ -106,7 +194,7 @@ class Meter(Dial):
         initial = True
         if self._needle_rect is None :
             # Initially display the full face and apply the text
-            txt = self._font.render(self._label, True, (240, 240, 240))
+            txt = glyphs.render(self._font, self._label, (240, 240, 240))
             text_offset = [110 - txt.get_width() / 2, 160]
             self._face.blit(txt, text_offset)
             rect = super().blit()
@@ -120,7 +208,7 @@ class Meter(Dial):
         # Draw the needle in the new position
         needle_angle = self._min_angle + (value / 100.0) * (self._max_angle - self._min_angle)
         pivot = [x + y for x, y in zip(self._position, self._needle_pivot_offset)]
-        needle, self._needle_rect = rotate(self._needle, needle_angle, pivot, self._needle_offset)
+        needle, self._needle_rect = rotate_sprite("images/Meter Needle.png", self._needle, needle_angle, pivot, self._needle_offset)
         screen.blit(needle, self._needle_rect)
         
         if initial:
@@ -135,7 +223,8 @@ class CollectiveMeter(Meter):
         label: the label to display on the face of the meter
         """
         super().__init__(label)
-        self._face = pygame.image.load("images/CollectiveMeter.png").convert_alpha()
+        # The label is drawn on the face so it needs its own copy
+        self._face = load_image("images/CollectiveMeter.png", 'Meter').copy()
         self._min_angle = -105.0
         self._max_angle = 93.0
         self._needle_pivot_offset = [100, 110]
@@ -147,7 +236,7 @@ class PercentMeter(Meter):
         label: the label to display on the face of the meter
         """
         super().__init__(label)
-        self._face = pygame.image.load("images/PercentMeter.png").convert_alpha()
+        self._face = load_image("images/PercentMeter.png", 'Meter').copy()
         self._min_angle = -114.0
         self._max_angle = 126.0
         self._needle_pivot_offset = [105, 110]
@@ -157,14 +246,20 @@ class Altimeter(Dial):
         super().__init__()
         self._text_rect = None
         self._needle_rect = None
-        self._face =  pygame.image.load("images/Altimeter.png").convert_alpha()
+        self._face = load_image("images/Altimeter.png", 'Altimeter')
         self._text_offset = [72, 65]
         self._font = mmi.get_font(mmi.ALTIMETER_FONT)
      
-        self._needle = pygame.image.load("images/Altimeter_Needle.png").convert_alpha()
+        self._needle = load_image("images/Altimeter_Needle.png", 'Altimeter')
         self._needle_pivot_offset = [112, 117]
         self._needle_offset = pygame.math.Vector2(1, self._needle.get_height() / 2 + 4)
 
+    def reset(self):
+        """Reset the altimeter so that it is fully redrawn
+        """
+        self._text_rect = None
+        self._needle_rect = None
+
     def blit(self, 
              screen: pygame.Surface, 
              altitude: float, 
@@ -197,7 +292,7 @@ class Altimeter(Dial):
         needle_angle = altitude / 1000.0 * 360.0 + 180.0
         pivot = [x + y for x, y in zip(self._position, self._needle_pivot_offset)]
         
-        needle, self._needle_rect = rotate(self._needle, needle_angle, pivot, self._needle_offset)
+        needle, self._needle_rect = rotate_sprite("images/Altimeter_Needle.png", self._needle, needle_angle, pivot, self._needle_offset)
         screen.blit(needle, self._needle_rect)
         
         if initial:
@@ -207,21 +302,31 @@ class Altimeter(Dial):
         
 class ArtificialHorizon(Dial):
     def __init__(self):
-        self._face = pygame.image.load("images/ArtificialHorizonBezel.png").convert_alpha()
-        self._ring = pygame.image.load("images/ArtificialHorizonRing.png").convert_alpha()
-        self._ball = pygame.image.load("images/ArtificialHorizonBall.png").convert_alpha()
-        self._mask = pygame.image.load("images/ArtificialHorizonMask.png").convert_alpha()
+        self._face = load_image("images/ArtificialHorizonBezel.png", 'ArtificialHorizon')
+        self._ring = load_image("images/ArtificialHorizonRing.png", 'ArtificialHorizon')
+        self._ball = load_image("images/ArtificialHorizonBall.png", 'ArtificialHorizon')
+        self._mask = load_image("images/ArtificialHorizonMask.png", 'ArtificialHorizon')
+        self._precision = 1.0
+        self._pivot_offset = [109, 109]
+        self._ball_dia = 150.0
+        self.reset()
+
+    def set_precision(self, precision: float):
+        """Set the change in pitch or roll, in degrees, needed to redraw the horizon
+        """
+        self._precision = precision
+
+    def reset(self):
+        """Reset the artificial horizon to level so that it is fully redrawn
+        """
         self._pitch = 0.0
         self._roll = 0.0
         self._shift = 0.0
-        self._precision = 1.0
         self._ball_mask = None
         self._rotated_ball = None
         self._ball_rect = None
         self._rotated_ring = None
         self._ring_rect = None
-        self._pivot_offset = [109, 109]
-        self._ball_dia = 150.0
     
     def blit(self, 
              screen:pygame.surface, 
@@ -256,7 +361,7 @@ class ArtificialHorizon(Dial):
         
         # Blit the ring
         if (self._rotated_ring == None or pitch_changed or roll_changed) :
-            self._rotated_ring, self._ring_rect = rotate(self._ring, -roll, pivot, pygame.math.Vector2(0, 0))
+            self._rotated_ring, self._ring_rect = rotate_sprite("images/ArtificialHorizonRing.png", self._ring, -roll, pivot)
             screen.blit(self._rotated_ring, self._ring_rect)
 
         # Blit the main bezel
@@ -277,39 +382,49 @@ class HelicopterState(Enum):
 class Helicopter(object):
     def __init__(self, pivot):
         self._pivot = pivot
-        self._state = HelicopterState.STOPPED
         self.MAX_ROTOR_INC = 35.0
         self.ROTOR_STEP = 0.2
         self.HELI_OFFSET = 64
-        self.HELI_SHADOW = False
-        if self.HELI_SHADOW:
-            self._helicopter_shadow_image = pygame.image.load("images/Bell47HelicopterShadow.png").convert_alpha()
-            self._heli_shadow_offset = pygame.math.Vector2(0, self.HELI_OFFSET)
+        self._shadow = False
+        self._helicopter_shadow_image = None
+        self._heli_shadow_offset = pygame.math.Vector2(0, self.HELI_OFFSET)
+        self.rotation_percent = defs.HELI_ROTATION_PERCENT
         
-        self._helicopter_image = pygame.image.load("images/Bell47Helicopter.png").convert_alpha()
+        self._helicopter_image = load_image("images/Bell47Helicopter.png", 'Helicopter')
         self._heli_offset = pygame.math.Vector2(0, self.HELI_OFFSET)
     
-        self._rotor_image = pygame.image.load("images/Rotor2.png").convert_alpha()
+        self._rotor_image = load_image("images/Rotor2.png", 'Helicopter')
         self._rotor_offset = pygame.math.Vector2(0, 0)
+        self.reset()
         
+        AssetManager.get_instance().load_music("sounds/running.ogg")
+
+    def reset(self):
+        """Reset the helicopter to stopped with a heading of zero
+        """
+        self._state = HelicopterState.STOPPED
         self._rotor_angle = 0.0
         self._rotor_inc = 0.0
         
-        self._heli_rect = self._helicopter_image.get_rect(center = pivot + self._heli_offset)
-        if self.HELI_SHADOW:
-            self._heli_shadow_rect = None
+        self._heli_rect = self._helicopter_image.get_rect(center = self._pivot + self._heli_offset)
+        self._heli_shadow_rect = None
         self._rotor_rect = None
         self._prev_heading = None
         self._prev_img_heading = 0
         self._rotated_image = None
-        
-        pygame.mixer.music.load("sounds/running.ogg")
     
     def __del__(self) :
         # Ensure that the music is stopped when the helicopter is destroyed
         if pygame.mixer.get_init() and pygame.mixer.music.get_busy():
             pygame.mixer.music.stop()
     
+    def set_shadow(self, on: bool):
+        """Show or hide the shadow, which is rotated and scaled every frame
+        """
+        if on and self._helicopter_shadow_image is None:
+            self._helicopter_shadow_image = load_image("images/Bell47HelicopterShadow.png", 'Helicopter')
+        self._shadow = on
+
     def set_state(self, state: HelicopterState):
         self._state = state
         
@@ -318,18 +433,16 @@ class Helicopter(object):
     
     def clear(self, screen: pygame.surface, colour: (), heading: float):
         """Clear the previous helicopter position
-            The rotor is always cleared but the helicopter body is only cleared if the heading has changed
+            The rotor and shadow are always cleared but the helicopter body is only cleared if the heading has changed
             by more than a given percentage to improve performance
         """
         if self._rotor_rect != None:
             screen.fill(colour, self._rotor_rect)
-            img_heading = quantize(heading, defs.HELI_ROTATION_PERCENT)
+            img_heading = quantize(heading, self.rotation_percent)
             if img_heading != self._prev_img_heading:
-                if self.HELI_SHADOW:
-                    rect = self._heli_rect.union(self._heli_shadow_rect)
-                else:
-                    rect = self._heli_rect
-                screen.fill(colour, rect)
+                screen.fill(colour, self._heli_rect)
+            if self._heli_shadow_rect is not None:
+                screen.fill(colour, self._heli_shadow_rect)
             
     def blit(self, 
              screen:pygame.Surface, 
@@ -341,11 +454,11 @@ class Helicopter(object):
         heading: the helicopter direction
         altitude: the helicopter altitude used to scle the shadow image (if shown)
         """
-        img_heading = quantize(heading, defs.HELI_ROTATION_PERCENT)
+        img_heading = quantize(heading, self.rotation_percent)
         
         # Draw the shadow, rotating and scaling it if the heading or altitude have changed
-        if self.HELI_SHADOW:
-            prev_heli_shadow_rect = self._heli_shadow_rect
+        prev_heli_shadow_rect = self._heli_shadow_rect
+        if self._shadow:
             self._heli_shadow_offset.from_polar((100 * altitude / defs.ALTITUDE_MAX, - (heading - 45)))
             self._heli_shadow_offset.y += self.HELI_OFFSET
              
@@ -357,13 +470,16 @@ class Helicopter(object):
                 self._heli_shadow_offset,
                 scale)
             screen.blit(heli_shadow, self._heli_shadow_rect)
+        else:
+            self._heli_shadow_rect = None
 
         # Draw the helicopter body, rotating it if the heading has changed by more than 5% (perf improvement)
         prev_heli_rect = self._heli_rect
         if img_heading == 0:
             self._rotated_image = self._helicopter_image
         elif img_heading != self._prev_img_heading:
-            self._rotated_image, self._heli_rect = rotate(self._helicopter_image, img_heading, self._pivot, self._heli_offset)
+            self._rotated_image, self._heli_rect = rotate_cached(
+                "images/Bell47Helicopter.png", self._helicopter_image, img_heading, self._pivot, self._heli_offset)
         screen.blit(self._rotated_image, self._heli_rect)
         
         # Update the rotor state
@@ -389,24 +505,23 @@ class Helicopter(object):
 
         # Draw the rotor
         prev_rotor_rect = self._rotor_rect
-        rot, self._rotor_rect = rotate(self._rotor_image, self._rotor_angle, self._pivot, self._rotor_offset)
+        rot, self._rotor_rect = rotate_sprite("images/Rotor2.png", self._rotor_image, self._rotor_angle, self._pivot, self._rotor_offset)
         if prev_rotor_rect is None:
             rotor_rect = self._rotor_rect
         else:
             rotor_rect = self._rotor_rect.union(prev_rotor_rect)
         screen.blit(rot, self._rotor_rect)
 
-        # Work out the rects to be updated
+        # Work out the rects to be updated, the shadow moves with the altitude as well as the heading
         heli_rect = heli_shadow_rect = None
         if img_heading != self._prev_img_heading:
             if prev_heli_rect is None:
                 heli_rect = self._heli_rect
-                if self.HELI_SHADOW:
-                    heli_shadow_rect = self._heli_shadow_rect
             else:
                 heli_rect = self._heli_rect.union(prev_heli_rect)
-                if self.HELI_SHADOW:
-                    heli_shadow_rect = self._heli_shadow_rect.union(prev_heli_shadow_rect)
+        shadow_rects = [r for r in (self._heli_shadow_rect, prev_heli_shadow_rect) if r is not None]
+        if shadow_rects:
+            heli_shadow_rect = shadow_rects[0].unionall(shadow_rects[1:])
         self._prev_img_heading = img_heading
         return rotor_rect, heli_rect, heli_shadow_rect
 
@@ -414,8 +529,13 @@ class DirectionIndicator(object) :
     """Direction Indicator showing where the landing pad is
     """
     def __init__(self):
-        self._image = pygame.image.load("images/Direction.png").convert_alpha()
+        self._image = load_image("images/Direction.png", 'DirectionIndicator')
         self._offset = pygame.math.Vector2(0, 0)
+        self.reset()
+
+    def reset(self):
+        """Reset the indicator so that it is redrawn
+        """
         self._rect = None
         self._direction = None
     
@@ -440,7 +560,7 @@ class DirectionIndicator(object) :
         """
         direction = self.direction(pad_offset)
         if self._direction == None or self._direction != direction:
-            dir_img, self._rect = rotate(self._image, direction, pivot, self._offset)
+            dir_img, self._rect = rotate_sprite("images/Direction.png", self._image, direction, pivot, self._offset)
             screen.blit(dir_img, self._rect)
             direction = self._direction
             return self._rect
@@ -454,7 +574,12 @@ class LandingPad(object):
         pivot: the helicopter pivot point
         """
         self._pivot = pivot
-        self._image = pygame.image.load("images/Pad.png").convert_alpha()
+        self._image = load_image("images/Pad.png", 'LandingPad')
+        self.reset()
+
+    def reset(self):
+        """Reset the landing pad to full size
+        """
         self._pad_rect = None
         self._scaled_image = None
         self._prev_img_scale = 1
@@ -490,8 +615,7 @@ class LandingPad(object):
         elif img_scale == self._prev_img_scale:
             pad = self._scaled_image
         else:
-            img_width = int(self._image.get_width() * img_scale)
-            pad = pygame.transform.scale(self._image, (img_width, img_width))
+            pad = scale_cached("images/Pad.png", self._image, img_scale, 'LandingPad')
             self._scaled_image = pad
         rect = pad.get_rect(center = self._pivot + offset)
         self._pad_rect = screen.blit(pad, rect)
@@ -510,16 +634,23 @@ class Landscape(object):
         xmax: the area size in the x direction
         ymax: the area size in the y direction
         """
+        self._pivot = pivot
+        self._xmax = xmax
+        self._ymax = ymax
+        self._paths = ["images/Landscape/Tree.png", "images/Landscape/Palm.png", "images/Landscape/Plant.png",
+                       "images/Landscape/Rock.png", "images/Landscape/Boulder.png"]
+        self._images = [load_image(path, 'Landscape') for path in self._paths]
+        self._density = 1.0
+        self.reset()
+
+    def reset(self):
+        """Distribute a new set of landscape items
+        """
         DENSITY_PERCENT = 0.5
         XBLOCKS = 7 # odd number helps ensure some around the landing pad
         YBLOCKS = 7
-        self._pivot = pivot
-        self._images = []
-        self._images.append(pygame.image.load("images/Landscape/Tree.png").convert_alpha())        
-        self._images.append(pygame.image.load("images/Landscape/Palm.png").convert_alpha())        
-        self._images.append(pygame.image.load("images/Landscape/Plant.png").convert_alpha())        
-        self._images.append(pygame.image.load("images/Landscape/Rock.png").convert_alpha())        
-        self._images.append(pygame.image.load("images/Landscape/Boulder.png").convert_alpha())
+        xmax = self._xmax
+        ymax = self._ymax
         self._prev_img_scale = 1
         self._scaled_images = []
         
@@ -555,6 +686,15 @@ class Landscape(object):
             ]
         # Eliminate items that coincide with the landing pad
         self._items = [item for item in items if abs(item["x"]) > 150 and abs(item["y"]) > 150]
+        self.set_density(self._density)
+
+    def set_density(self, density: float):
+        """Show a fraction of the landscape items, spread evenly over the area
+        
+        density: the fraction of the items to show, 1 for all of them
+        """
+        self._density = density
+        self._shown = self._items[::max(1, round(1 / density))]
     
     def clear(self,
               screen: pygame.surface,
@@ -589,10 +729,9 @@ class Landscape(object):
         elif img_scale == self._prev_img_scale:
             imgs = self._scaled_images
         else:
-            img_width = int(self._images[0].get_width() * img_scale)
-            imgs = [pygame.transform.scale(img, (img_width, img_width)) for img in self._images]
+            imgs = [scale_cached(path, img, img_scale, 'Landscape') for path, img in zip(self._paths, self._images)]
             self._scaled_images = imgs
-        for item in self._items:
+        for item in self._shown:
             centre = (self._pivot[0] + item['x'] * img_scale, self._pivot[1] + item['y'] * img_scale) + offset
             img = imgs[item['image']]
             rect = img.get_rect(center = centre)
@@ -607,6 +746,16 @@ class Arrows(object):
         self._up_arrow =  mmi.get_image(mmi.UP_IMAGE, "images/UpArrow.png")
         self._down_arrow =  mmi.get_image(mmi.DOWN_IMAGE, "images/DownArrow.png")
     
+    def rects(self, rect) -> list:
+        """Get the rects of the left, right, up and down arrows
+        
+        rect: the rect the arrows are drawn within
+        """
+        return [pygame.Rect(rect.left + 1, rect.top + rect.height / 2 - 24, 48, 48),
+                pygame.Rect(rect.left + rect.width - 49, rect.top + rect.height / 2 - 24, 48, 48),
+                pygame.Rect(rect.left + rect.width / 2 - 24, rect.top + 1, 48, 48),
+                pygame.Rect(rect.left + rect.width / 2 - 24, rect.top + rect.height - 49, 48, 48)]
+
     def blit(self, screen, rect, show_left, show_right, show_up, show_down) -> ():
         """Draw direction arrows as required.
         
@@ -618,18 +767,10 @@ class Arrows(object):
         show_down: show the down arrow
         """
         rects = []
-        if show_left:
-            arrow_rect = pygame.Rect(rect.left + 1, rect.top + rect.height / 2 - 24, 48, 48)
-            rects.append(screen.blit(self._left_arrow, arrow_rect))
-        if show_right:
-            arrow_rect = pygame.Rect(rect.left + rect.width - 49, rect.top + rect.height / 2 - 24, 48, 48)
-            rects.append(screen.blit(self._right_arrow, arrow_rect))
-        if show_up:
-            arrow_rect = pygame.Rect(rect.left + rect.width / 2 - 24, rect.top + 1, 48, 48)
-            rects.append(screen.blit(self._up_arrow, arrow_rect))
-        if show_down:
-            arrow_rect = pygame.Rect(rect.left + rect.width / 2 - 24, rect.top + rect.height - 49, 48, 48)
-            rects.append(screen.blit(self._down_arrow, arrow_rect))
+        images = (self._left_arrow, self._right_arrow, self._up_arrow, self._down_arrow)
+        for image, arrow_rect, show in zip(images, self.rects(rect), (show_left, show_right, show_up, show_down)):
+            if show:
+                rects.append(screen.blit(image, arrow_rect))
         return rects
 
 def write(screen: pygame.surface, 
@@ -0,0 +1,135 @@
+'''
+Performance HUD module for the Bell 47 demonstrator rig
+Overlays frame time percentiles, stage timings, cache hit rates and memory use on any screen
+'''
+import pygame
+import time
+
+import defs
+import telemetry
+from telemetry import Telemetry
+from cache import SurfaceCache
+
+class PerformanceHud(object):
+    """On-screen performance display drawn from a cached surface.
+
+        The surface is only re-rendered every defs.HUD_REFRESH seconds, in between it is just blitted
+        over whatever the current screen has drawn when the display is updated. The screen beneath is
+        put back as soon as the display has been updated, so the screens never draw over the HUD and
+        hiding it shows whatever the current screen has drawn there
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton HUD object
+        """
+        if PerformanceHud.__instance == None:
+            PerformanceHud.__instance = PerformanceHud()
+        return PerformanceHud.__instance
+
+    # Stages shown as bars with their colours
+    BARS = [
+        [telemetry.EVENTS, (100, 180, 255)],
+        [telemetry.CALCS, (255, 200, 80)],
+        [telemetry.LANDSCAPE, (80, 200, 80)],
+        [telemetry.HELICOPTER, (255, 120, 80)],
+        [telemetry.UPDATE, (200, 120, 255)],
+        ]
+    WIDTH = 300
+    LINE = 18
+    BAR_WIDTH = 150
+
+    def __init__(self):
+        self.visible = defs.HUD_VISIBLE
+        self.refresh = defs.HUD_REFRESH
+        self._surface = None
+        self._background = None
+        self._drawn = False
+        self._rect = None
+        self._rendered = 0.0
+
+    def toggle(self):
+        """Show or hide the HUD, showing the screen beneath it when hidden
+        """
+        self.visible = not self.visible
+        if not self.visible and self._rect is not None:
+            pygame.display.update(self._rect)
+        self._surface = None
+
+    def draw(self, screen: pygame.surface) -> pygame.rect:
+        """Draw the HUD onto the screen, re-rendering it if it is out of date, keeping the screen beneath it
+        to be restored after the display is updated
+
+        screen: the surface to draw on
+        return: the rect to update, which also covers where a taller HUD was last drawn, or None if the HUD is hidden
+        """
+        if not self.visible:
+            return None
+        now = time.perf_counter()
+        if self._surface is None or now - self._rendered >= self.refresh:
+            self._render()
+            self._rendered = now
+        prev_rect = self._rect
+        self._rect = self._surface.get_rect(topright = screen.get_rect().topright).move(-10, 10)
+        if self._background is None or self._background.get_size() != self._surface.get_size():
+            self._background = pygame.Surface(self._surface.get_size()).convert()
+        self._background.blit(screen, (0, 0), self._rect)
+        self._drawn = True
+        rect = screen.blit(self._surface, self._rect)
+        if prev_rect is not None and prev_rect != self._rect:
+            # Show the screen again where the HUD was taller
+            rect = rect.union(prev_rect)
+        return rect
+
+    def restore(self, screen: pygame.surface):
+        """Put back the screen beneath the HUD once the display has been updated
+
+        screen: the surface the HUD was drawn on
+        """
+        if self._drawn:
+            screen.blit(self._background, self._rect)
+            self._drawn = False
+
+    def _render(self):
+        """Render the HUD surface from the most recent telemetry
+        """
+        # Imported here as mmi imports this module to draw the HUD on each display update
+        import mmi
+        font = mmi.get_font(mmi.SMALL_FONT)
+        tm = Telemetry.get_instance()
+        frames = tm.frames(defs.HUD_FRAMES)
+        times = sorted(frames['frame'])
+        count = len(times) or 1
+        lines = [
+            "%s" % (tm.state.name.replace("_", " ").title() if tm.state is not None else "Startup"),
+            "frame p50 %.1f ms  p99 %.1f ms" % (telemetry.percentile(times, 50) / 1000, telemetry.percentile(times, 99) / 1000),
+            "fps %.1f  cpu %.1f ms" % (count * 1e6 / (sum(times) or 1), sum(frames['cpu']) / count / 1000),
+            ]
+        if tm.state in tm.first_frame:
+            lines.append("first frame %.1f ms" % (tm.first_frame[tm.state] / 1e6))
+        caches = telemetry.cache_stats()
+        lines += ["%s %d%% of %d" % (name, stats.hit_rate() * 100, stats.lookups()) for name, stats in caches.items()]
+        lines.append("memory %.1f MB" % (telemetry.memory_usage() / 1024 / 1024))
+        owners = SurfaceCache.get_instance().report()['owners']
+        lines += ["  %s %.1f MB" % (owner, size / 1024 / 1024)
+                  for owner, size in sorted(owners.items(), key = lambda o: -o[1])[:4]]
+
+        height = (len(lines) + len(self.BARS)) * self.LINE + 10
+        if self._surface is None or self._surface.get_height() != height:
+            self._surface = pygame.Surface((self.WIDTH, height)).convert()
+        self._surface.fill(defs.HUD_BACKGROUND_COLOUR)
+        y = 5
+        for line in lines:
+            self._surface.blit(font.render(line, True, defs.HUD_FOREGROUND_COLOUR), (5, y))
+            y += self.LINE
+
+        # Show the mean of each stage as a bar scaled to the frame budget
+        budget = max(telemetry.percentile(times, 50), 1)
+        for stage, colour in self.BARS:
+            mean = sum(s[stage] for s in frames['stages']) / count
+            self._surface.blit(font.render(telemetry.STAGES[stage], True, defs.HUD_FOREGROUND_COLOUR), (5, y))
+            width = int(min(mean / budget, 1.0) * self.BAR_WIDTH)
+            self._surface.fill(colour, (100, y + 3, max(width, 1), self.LINE - 6))
+            t = font.render("%.2f" % (mean / 1000), True, defs.HUD_FOREGROUND_COLOUR)
+            self._surface.blit(t, (self.WIDTH - 5 - t.get_width(), y))
+            y += self.LINE
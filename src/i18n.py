@@ -2,63 +2,110 @@
 Internationalisation module for the Bell 47 demonstrator rig
 Performs language selection and all translations
 '''
+import builtins
 import gettext
 import pygame
 from pathlib import Path
 
 import mmi
-import graphics
-from defs import HIGHLIGHT_COLOUR, FLAG_HIGHLIGHT_WIDTH, SCROLL_INCREMENT, BTN_SELECT
+from cache import load_image
+from telemetry import cache_stats
+from defs import HIGHLIGHT_COLOUR, FLAG_HIGHLIGHT_WIDTH, SCROLL_INCREMENT, SMOOTH_SCROLL, SCROLL_SPEED, SCROLL_FPS, BTN_SELECT
 from pygame.time import delay
 from time import sleep
 
 languages = {}
 current_language = 'en'
 flags = {}
-images = {}
+
+class Translator(object):
+    """Translate message strings with a language's catalog, installed as _().
+
+        Each message is looked up in the catalog once and the translation remembered, so after that a
+        translation is a single dictionary lookup. Strings without a translation are returned unchanged
+    """
+    def __init__(self, translations: gettext.NullTranslations = None):
+        self._translations = translations if translations is not None else gettext.NullTranslations()
+        self._table = {}
+        self._stats = cache_stats('translations')
+
+    def __call__(self, message: str) -> str:
+        text = self._table.get(message)
+        if text is None:
+            text = self._translations.gettext(message)
+            self._table[message] = text
+            self._stats.entries += 1
+        if text is message:
+            self._stats.misses += 1
+        else:
+            self._stats.hits += 1
+        return text
+
+    def install(self):
+        """Make this the translation used by _()
+        """
+        builtins._ = self
+
+def load_catalog(lang: str) -> Translator:
+    """Load the message catalog of a language
+
+    lang: language id
+    """
+    path = gettext.find('FCD', localedir = 'locale', languages = [lang])
+    if path is None:
+        raise FileNotFoundError("No message catalog for language '%s'" % lang)
+    with open(path, 'rb') as f:
+        return Translator(gettext.GNUTranslations(f))
 
 def load_languages():
-    """Load language translations from directories that exist in the locale and have message strings.
+    """Find the language translations in directories that exist in the locale and have message strings.
+    The catalogs are loaded when the language is first selected
     """
-    languages['en'] = gettext.NullTranslations() 
+    languages['en'] = Translator() 
     locale = Path.cwd() / 'locale'
     for d in locale.iterdir() : 
         if d.is_dir():
             if (d / 'LC_MESSAGES').exists() :
-                languages[d.name] = gettext.translation('FCD', localedir='locale', languages=[d.name])
+                languages[d.name] = None
             if (d / 'flag.png').exists() :
                 flags[d.name] = d / 'flag.png'
     set_language('en')
 
 def set_language(lang : str) :
-    """Set the current language.
+    """Set the current language, loading its catalog the first time it is selected.
     
     lang: language id
     """
     global current_language
     try :
+        if languages[lang] is None:
+            languages[lang] = load_catalog(lang)
         languages[lang].install()
         current_language = lang
     except :
         languages['en'].install()
         current_language = 'en'
     mmi.current_language = current_language
+    mmi.release_fonts()
         
 def get_languages() -> {} :
     return languages
 
-def select_language(screen : pygame.surface) -> bool:
-    """Select language from display of country flags
-    
-    screen: the surface to display the flags on
+# Rate per second at which smooth scrolling closes the distance to the position scrolled to
+SCROLL_EASE = 10
+
+FLAG_WIDTH = 100
+FLAG_HEIGHT = 60
+FLAG_GAP = 50
+
+def flag_layout(screen : pygame.surface) -> list :
+    """Get the position of each language flag, with English in the middle so it's the default
+
+    screen: the surface the flags are displayed on
+    return: list of [language id, flag rect] in display order
     """
-    FLAG_WIDTH = 100
-    FLAG_HEIGHT = 60
-    FLAG_GAP = 50
     x = (screen.get_width() - len(flags) * FLAG_WIDTH - (len(flags) - 1) * FLAG_GAP) / 2
     y = 50
-    cells = [[], []]
-    flag_rects = []
     # Ensure English is in the middle so its the default
     f = list(flags.keys())
     fi = [i for i in range(len(f))]
@@ -70,27 +117,44 @@ def select_language(screen : pygame.surface) -> bool:
                 fi[mid] = i
                 fi[i] = temp
             break
-    sorted_flags = [f[i] for i in fi]
-    # Display the flag images, highlighting the selected language
-    for i, flag in enumerate(sorted_flags) :
-        if flag not in images:
-            images[flag] = pygame.image.load(flags[flag].as_posix()).convert()
-        f = images[flag]
-        rect = pygame.Rect(x, y, FLAG_WIDTH, FLAG_HEIGHT)
-        screen.blit(f, rect)
-        flag_rects.append(rect)
+    layout = []
+    for i in fi:
+        layout.append([f[i], pygame.Rect(x, y, FLAG_WIDTH, FLAG_HEIGHT)])
         x += FLAG_WIDTH + FLAG_GAP
-        cells[0].append(x - FLAG_GAP / 2)
-        if flag == current_language:
-            cellx = i
-            pygame.draw.rect(screen, HIGHLIGHT_COLOUR, flag_rects[cellx], FLAG_HIGHLIGHT_WIDTH)
+    return layout
+
+def draw_flags(surface : pygame.surface) :
+    """Draw the language flags without any highlight
+
+    surface: the surface to draw the flags on
+    """
+    for flag, rect in flag_layout(surface) :
+        surface.blit(load_image(flags[flag].as_posix(), 'flags', False, pinned = True), rect)
+
+def select_language(screen : pygame.surface) -> ():
+    """Select language from the country flags, which must already be displayed, highlighting the selected language
+    
+    screen: the surface the flags are displayed on
+    return: list containing:
+        selected (bool): user pressed the selection button
+        rects: the flag rects redrawn because the language changed
+    """
+    layout = flag_layout(screen)
+    order = [flag for flag, rect in layout]
+    cells = [[rect.right + FLAG_GAP / 2 for flag, rect in layout], []]
+    cellx = order.index(current_language)
+    rects = []
     # Let the user choose
-    result = mmi.choose_cell(cells, len(sorted_flags), cellx)
+    result = mmi.choose_cell(cells, len(layout), cellx)
     if result[1] != cellx:
-        cellx = result[1]
-        set_language(sorted_flags[cellx])
-        pygame.draw.rect(screen, HIGHLIGHT_COLOUR, flag_rects[cellx], FLAG_HIGHLIGHT_WIDTH)
-    return result[0]
+        rect = layout[cellx][1]
+        screen.blit(load_image(flags[current_language].as_posix(), 'flags', False, pinned = True), rect)
+        rects.append(rect)
+        set_language(order[result[1]])
+        cellx = order.index(current_language)
+        rects.append(layout[cellx][1])
+    pygame.draw.rect(screen, HIGHLIGHT_COLOUR, layout[cellx][1], FLAG_HIGHLIGHT_WIDTH)
+    return result[0], rects
 
 def read_file(name : str) -> str :
     """Read a language specific text file
@@ -99,12 +163,58 @@ def read_file(name : str) -> str :
     """
     path = Path.cwd() / 'locale' / current_language / name
     try :
-        f = open(str(path), 'r')
-        text = f.read()
+        with open(str(path), 'r', encoding = 'utf-8') as f:
+            text = f.read()
     except :
         text = _("Missing file") + " '" + name + "' " + _("for language") + " '" + current_language + "'"
     return text    
     
+def scroll_by(screen : pygame.surface, surf : pygame.surface, rect : pygame.rect, y_offset : int, dy : int, bgd : ()) -> pygame.rect:
+    """Scroll the text shown in a window by shifting it in place and drawing only the strip uncovered
+    
+    screen: the screen the text is shown on
+    surf: the rendered text
+    rect: the window the text is shown in
+    y_offset: the screen position of the top of the text after scrolling
+    dy: the distance scrolled, positive when the text moves down
+    bgd: the background colour
+    return: the rect changed
+    """
+    screen.set_clip(rect)
+    screen.scroll(0, dy)
+    if dy > 0:
+        exposed = pygame.Rect(rect.left, rect.top, rect.width, dy)
+    else:
+        exposed = pygame.Rect(rect.left, rect.bottom + dy, rect.width, -dy)
+    exposed = exposed.clip(rect)
+    if bgd != None:
+        screen.fill(bgd, exposed)
+    screen.blit(surf, exposed, exposed.move(-rect.left, -y_offset))
+    screen.set_clip()
+    return rect
+
+def text_window(rectmain : pygame.rect) -> pygame.rect:
+    """Get the window the text is wrapped to inside the area of a scrollable window, leaving room for the arrows
+
+    rectmain: the area of the scrollable window
+    """
+    return rectmain.inflate(-100, -100)
+
+def prefetch_text(filenames : [], font : pygame.font, fgd: (), bgd: (), rectmain : pygame.rect):
+    """Render the pages of text for a scrollable window before it is shown, one page per step
+
+    filenames: files containing the text to render
+    font: the font to use
+    fgd: the foreground colour
+    bgd: the background colour
+    rectmain: the window the text will be scrolled within
+    """
+    from pages import PageCache
+    pages = PageCache.get_instance()
+    pages.request(filenames, font, fgd, bgd, text_window(rectmain).width)
+    while pages.step():
+        yield
+
 def scroll_text(screen : pygame.surface,
                 filenames : [],
                 font : pygame.font, 
@@ -113,6 +223,8 @@ def scroll_text(screen : pygame.surface,
                 rectmain : pygame.rect,
                 label : bool = False):
     """Render text to the screen in a scrollable window.
+    The text is drawn in full when a page is shown, scrolling shifts it in place and draws only the uncovered strip.
+    With smooth scrolling the text glides to the position scrolled to at up to SCROLL_SPEED pixels a second
     
     screen: the screen to render to
     filenames: files containing the text to render
@@ -122,69 +234,89 @@ def scroll_text(screen : pygame.surface,
     rectmain: the window to scroll within
     label: text is static requiring no input
     """
+    from pages import PageCache
     im = mmi.InputManager.get_instance()
     rect = rectmain.copy()
-    prev_page = page = 0
+    page = 0
     if not label: 
         pygame.key.set_repeat(150, 100)
         im.set_scroll(True)
-        rect.inflate_ip(-100, -100)
-        arrows = graphics.Arrows()
-    rects = []
+        rect = text_window(rectmain)
+        from graphics import Arrows
+        arrows = Arrows()
+    pages = PageCache.get_instance()
+    pages.request(filenames, font, fgd, bgd, rect.width)
+    clock = pygame.time.Clock()
+    y_inc = SCROLL_INCREMENT
     finished = False
     while not finished :
-        # Get the page text and render it onto a surface, wrapped if necessary
-        text = read_file(filenames[page])
-        lines = mmi.wrap_text(text, font, rect.width)
-        surf = mmi.render_text_list(lines, font, fgd, bgd) 
+        # Get the page, wrapped if necessary and rendered onto a surface, and show it from the top
+        surf = pages.get(filenames[page], font, fgd, bgd, rect.width)
         maxy = rect.top
         if surf.get_height() > rect.height :
             miny = maxy - surf.get_height() + rect.height
         else :
             miny = maxy
-        y_offset = maxy
-        y_inc = SCROLL_INCREMENT
-        prev_y_offset = y_offset - 1
-        change_page = False
-        while not finished and (label or not change_page):
-            if bgd != None:
-                screen.fill(bgd, rectmain)
-            rects = [rectmain]
+        y_offset = target = maxy
+        if bgd != None:
+            screen.fill(bgd, rectmain)
+        screen.set_clip(rect)
+        screen.blit(surf, [rect.left, y_offset])
+        screen.set_clip()
+        rects = [rectmain]
+        shown_arrows = None
+        prev_page = page
+        idle = False
+        while True:
             if not label:
-                # Get input, changing page in the x direction and scrolling in the y direction
-                for event in im.get_events():
-                    if ((event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE) 
-                        or (event.type == pygame.JOYBUTTONDOWN and event.button == BTN_SELECT)):
-                        finished = True
-                    else :
-                        arrow = im.get_arrow(event)
-                        if arrow != None:
-                            if arrow == pygame.K_UP and y_offset < maxy:
-                                y_offset += y_inc
-                            elif arrow == pygame.K_DOWN and y_offset > miny:
-                                y_offset -= y_inc
-                            elif arrow == pygame.K_LEFT and page > 0:
-                                page -= 1
-                            elif arrow == pygame.K_RIGHT and page < len(filenames) - 1:
-                                page += 1
-                        change_page = page != prev_page
-                        if change_page or y_offset != prev_y_offset:
-                            break
-                if y_offset != prev_y_offset:
-                    # Display arrows if there is more to come in the x or y direction
-                    rects += arrows.blit(screen, rectmain, page > 0, page < len(filenames) - 1, y_offset < maxy, y_offset > miny)
-            # Show the scrolled text if it has moved
-            if y_offset != prev_y_offset:  
-                screen.set_clip(rect)
-                rects.append(screen.blit(surf, [rect.left, y_offset]))      
-                screen.set_clip()
-                pygame.display.update(rects)
+                # Display arrows if there is more to come in the x or y direction
+                show = (page > 0, page < len(filenames) - 1, y_offset < maxy, y_offset > miny)
+                if show != shown_arrows:
+                    if bgd != None:
+                        for r in arrows.rects(rectmain):
+                            screen.fill(bgd, r)
+                    rects += arrows.rects(rectmain)
+                    arrows.blit(screen, rectmain, *show)
+                    shown_arrows = show
+            if rects:
+                mmi.update_display(rects)
+                rects = []
             if label:
                 finished = True
-            prev_y_offset = y_offset
-            prev_page = page
+                break
+            # Get input, changing page in the x direction and scrolling in the y direction.
+            # Sleep until there is input once the text is still and the pages are rendered
+            for event in (im.wait_events() if idle else im.get_events()):
+                if ((event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE) 
+                    or (event.type == pygame.JOYBUTTONDOWN and event.button == BTN_SELECT)):
+                    finished = True
+                else :
+                    arrow = im.get_arrow(event)
+                    if arrow != None:
+                        if arrow == pygame.K_UP:
+                            target = min(target + y_inc, maxy)
+                        elif arrow == pygame.K_DOWN:
+                            target = max(target - y_inc, miny)
+                        elif arrow == pygame.K_LEFT and page > 0:
+                            page -= 1
+                        elif arrow == pygame.K_RIGHT and page < len(filenames) - 1:
+                            page += 1
+            if finished or page != prev_page:
+                break
+            if target != y_offset:
+                # Show the scrolled text
+                dy = target - y_offset
+                if SMOOTH_SCROLL:
+                    dt = clock.tick(SCROLL_FPS) / 1000
+                    step = max(1, min(abs(dy) * SCROLL_EASE * dt, SCROLL_SPEED * dt))
+                    dy = int(max(-step, min(step, dy)))
+                y_offset += dy
+                rects.append(scroll_by(screen, surf, rect, y_offset, dy, bgd))
+                idle = False
+            else:
+                clock.tick()
+                # Render the other pages while the text is still
+                idle = not pages.step()
     if not label: 
         pygame.key.set_repeat()
         im.set_scroll(False)
-        
-        
\ No newline at end of file
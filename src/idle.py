@@ -0,0 +1,77 @@
+'''
+Idle module for the Bell 47 demonstrator rig
+Prepares the screens the visitor is likely to choose next in the time left over in each frame of the welcome and menu screens
+'''
+import logging
+import time
+from collections import OrderedDict
+
+MARGIN = 0.01   # Time in seconds left at the end of a frame for updating the display
+
+class IdleWork(object):
+    """Background jobs run a small step at a time in the spare time of each frame.
+
+        A job is a generator that does one small piece of work, e.g. rendering one page, each time
+        it is resumed, so the work stops when the frame's time is used up and carries on in the next
+        frame. Each job prepares for a program state, the jobs for the highlighted menu item run first
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton idle work queue
+        """
+        if IdleWork.__instance == None:
+            IdleWork.__instance = IdleWork()
+        return IdleWork.__instance
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._preferred = None
+
+    def add(self, name: str, state, job):
+        """Queue a job, replacing any unfinished job of the same name
+
+        name: the job name e.g. menu
+        state: the ProgramState the job prepares for
+        job: the generator doing the work
+        """
+        self._jobs.pop(name, None)
+        self._jobs[name] = (state, job)
+
+    def prefer(self, state):
+        """Run the jobs preparing for a state before the others
+
+        state: the ProgramState e.g. of the highlighted menu item
+        """
+        self._preferred = state
+
+    def pending(self) -> bool:
+        """Check if there is work to do
+        """
+        return bool(self._jobs)
+
+    def run(self, budget: float) -> int:
+        """Run job steps until the time is used up or there is no more work
+
+        budget: the time available in seconds
+        return: the number of steps run
+        """
+        deadline = time.perf_counter() + budget - MARGIN
+        steps = 0
+        while self._jobs and time.perf_counter() < deadline:
+            name = self._next()
+            try:
+                next(self._jobs[name][1])
+                steps += 1
+            except StopIteration:
+                del self._jobs[name]
+                logging.debug("Idle job %s done", name)
+        return steps
+
+    def _next(self) -> str:
+        """Get the name of the job to run next, the first one preparing for the preferred state or else the oldest
+        """
+        for name, (state, job) in self._jobs.items():
+            if state == self._preferred:
+                return name
+        return next(iter(self._jobs))
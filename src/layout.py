@@ -0,0 +1,162 @@
+'''
+Layout module for the Bell 47 demonstrator rig
+Wraps text to a width using cached word widths, so lines are measured without rendering them
+'''
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+
+import pygame
+
+import glyphs
+from telemetry import cache_stats
+
+MAX_LAYOUTS = 256   # Number of wrapped texts remembered
+
+# Punctuation that must not start or end a line of Chinese text
+NO_START = set("，。、：；！？）》」』】〕〉・…—,.:;!?)]}%")
+NO_END = set("（《「『【〔〈([{")
+
+# Scripts written without spaces between words e.g. Chinese
+CJK = re.compile("[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+_metrics = {}
+_layouts = OrderedDict()
+
+def split_word(word: str) -> list:
+    """Split a word at the places a line may break without a space i.e. between Chinese characters
+
+    word: text without spaces
+    return: the parts of the word
+    """
+    if not CJK.search(word):
+        return [word]
+    parts = []
+    prev = None
+    for ch in word:
+        if (prev is not None and (CJK.match(ch) or CJK.match(prev))
+            and ch not in NO_START and prev not in NO_END):
+            parts.append(ch)
+        elif parts:
+            parts[-1] += ch
+        else:
+            parts.append(ch)
+        prev = ch
+    return parts
+
+class FontMetrics(object):
+    """Widths of the words and spaces of text in a font, measured once each.
+    Text is measured as it is rendered, from the glyph advances when the font has a glyph atlas
+    """
+    def __init__(self, font: pygame.font.Font):
+        self._font = font
+        self._widths = {}
+        self.space = glyphs.width(font, ' ')
+
+    def width(self, text: str) -> int:
+        """Get the width of a word
+        """
+        width = self._widths.get(text)
+        if width is None:
+            width = glyphs.width(self._font, text)
+            self._widths[text] = width
+        return width
+
+    def measure(self, text: str) -> int:
+        """Get the width of a line of text without remembering it
+        """
+        return glyphs.width(self._font, text)
+
+def metrics(font: pygame.font.Font) -> FontMetrics:
+    """Get the metrics of a font
+    """
+    m = _metrics.get(font)
+    if m is None:
+        m = _metrics[font] = FontMetrics(font)
+    return m
+
+def release(font: pygame.font.Font):
+    """Forget the metrics and wrapped text of a font that is being released
+    """
+    if _metrics.pop(font, None) is not None:
+        for key in [k for k in _layouts if k[1] is font]:
+            del _layouts[key]
+        cache_stats('layout').entries = len(_layouts)
+
+def wrap_line(line: str, m: FontMetrics, width: int) -> list:
+    """Wrap a line of text without newlines, breaking at spaces or between Chinese characters.
+    A line starts with at least one word even if that is too wide. Leading whitespace is kept
+
+    line: the line of text with trailing whitespace removed
+    m: the metrics of the font
+    width: the width to wrap to
+    """
+    indent = line[:len(line) - len(line.lstrip())]
+    # Each part is the text and the separator before it, ' ' or '' when it continues a word
+    words = line[len(indent):].split(' ')
+    if CJK.search(line):
+        parts = []
+        for i, word in enumerate(words):
+            for j, part in enumerate(split_word(word)):
+                parts.append([part, ' ' if i > 0 and j == 0 else ''])
+    else:
+        parts = [[word, ' '] for word in words]
+        parts[0][1] = ''
+    parts[0][0] = indent + parts[0][0]
+
+    # ends[i] is the width of the parts before i with their separators
+    ends = [0]
+    for part, sep in parts:
+        ends.append(ends[-1] + (m.space if sep else 0) + m.width(part))
+    def join(start, end):
+        # The separator before the first part of a line is dropped
+        return parts[start][0] + ''.join(sep + part for part, sep in parts[start + 1:end])
+
+    lines = []
+    start = 0
+    while start < len(parts):
+        # Estimate the break from the word widths then adjust it by measuring the line, as kerning and
+        # rounding make a line a little wider or narrower than the sum of its words
+        limit = width + ends[start] + (m.space if parts[start][1] else 0)
+        end = max(bisect_right(ends, limit) - 1, start + 1)
+        while end > start + 1 and m.measure(join(start, end)) > width:
+            end -= 1
+        while end < len(parts) and m.measure(join(start, end + 1)) <= width:
+            end += 1
+        lines.append(join(start, end))
+        start = end
+    return lines
+
+def wrap_text(text: str, font: pygame.font.Font, width: int) -> list:
+    """Wrap text to fit inside a given width when rendered, remembering the result
+
+    text: the text to be wrapped
+    font: the font the text will be rendered in
+    width: the width to wrap to, None or 0 to only split the lines
+    return: a new list of the wrapped lines
+    """
+    text_lines = text.replace('\t', '    ').split('\n')
+    if width is None or width == 0:
+        return text_lines
+
+    stats = cache_stats('layout')
+    key = (text, font, width)
+    lines = _layouts.get(key)
+    if lines is not None:
+        stats.hits += 1
+        _layouts.move_to_end(key)
+        return list(lines)
+    stats.misses += 1
+    m = metrics(font)
+    lines = []
+    for line in text_lines:
+        line = line.rstrip()
+        if line:
+            lines += wrap_line(line, m, width)
+        else:
+            lines.append(' ')
+    _layouts[key] = tuple(lines)
+    if len(_layouts) > MAX_LAYOUTS:
+        _layouts.popitem(last = False)
+    stats.entries = len(_layouts)
+    return lines
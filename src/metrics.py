@@ -0,0 +1,118 @@
+'''
+Metrics module for the Bell 47 demonstrator rig
+Serves rig health metrics in the Prometheus text format on localhost or a Unix socket
+'''
+import logging
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import defs
+from defs import ProgramState
+import telemetry
+from telemetry import Telemetry
+from cache import SurfaceCache
+from mmi import InputManager
+from scheduler import Scheduler
+
+def cpu_temperature() -> float:
+    """Get the CPU temperature in degrees Celsius, or None if it is unknown
+    """
+    try:
+        with open('/sys/class/thermal/thermal_zone0/temp') as f:
+            return int(f.read()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+def collect() -> str:
+    """Collect the current metrics in the Prometheus text exposition format.
+    Everything is calculated here, in the server thread, from copies of the telemetry
+    """
+    tm = Telemetry.get_instance()
+    im = InputManager.get_instance()
+    lines = []
+    def metric(name, kind, help_text, samples):
+        lines.append("# HELP fcd_%s %s" % (name, help_text))
+        lines.append("# TYPE fcd_%s %s" % (name, kind))
+        for labels, value in samples:
+            lines.append("fcd_%s%s %s" % (name, labels, repr(float(value))))
+
+    frames = tm.frames(defs.METRICS_FRAMES)
+    times = sorted(frames['frame'])
+    count = len(times)
+    metric('frames_total', 'counter', "Frames presented", [("", tm.head)])
+    metric('fps', 'gauge', "Frames per second over the recent frames",
+           [("", count * 1e6 / sum(times) if count and sum(times) else 0.0)])
+    quantiles = [("{quantile=\"%s\"}" % (q), telemetry.percentile(times, q * 100) / 1e6) for q in (0.5, 0.9, 0.99)]
+    metric('frame_time_seconds', 'summary', "Time between frames",
+           quantiles + [("_sum", sum(times) / 1e6), ("_count", count)])
+    latencies = sorted(tm.latencies())
+    metric('input_latency_seconds', 'summary', "Time from reading a control to processing its event",
+           [("{quantile=\"%s\"}" % (q), telemetry.percentile(latencies, q * 100) / 1e6) for q in (0.5, 0.99)]
+           + [("_count", tm.latency_head)])
+    metric('first_frame_seconds', 'gauge', "Time from entering a program state to its first frame",
+           [("{state=\"%s\"}" % (state.name), ns / 1e9) for state, ns in list(tm.first_frame.items())])
+    metric('device_polls_total', 'counter', "Polls of the flight control potentiometers", [("", im._fc.polls)])
+    caches = telemetry.cache_stats()
+    for name, kind, attribute in (('cache_hits_total', 'counter', 'hits'), ('cache_misses_total', 'counter', 'misses'),
+                                  ('cache_entries', 'gauge', 'entries'), ('cache_bytes', 'gauge', 'bytes')):
+        metric(name, kind, "Cache %s" % (attribute),
+               [("{cache=\"%s\"}" % (cache), getattr(stats, attribute)) for cache, stats in list(caches.items())])
+    report = SurfaceCache.get_instance().report()
+    metric('surface_owner_bytes', 'gauge', "Surface cache memory held by each owner",
+           [("{owner=\"%s\"}" % (owner), size) for owner, size in report['owners'].items()])
+    metric('surface_state_bytes', 'gauge', "Surface cache memory added in each program state",
+           [("{state=\"%s\"}" % (state), size) for state, size in report['states'].items()])
+    metric('memory_resident_bytes', 'gauge', "Resident memory of the process", [("", telemetry.memory_usage())])
+    temperature = cpu_temperature()
+    if temperature is not None:
+        metric('cpu_temperature_celsius', 'gauge', "CPU temperature", [("", temperature)])
+    metric('state', 'gauge', "Current program state",
+           [("{state=\"%s\"}" % (state.name), 1 if tm.state == state else 0) for state in ProgramState])
+    metric('seat_occupied', 'gauge', "Seat switch pressed", [("", im._seat_occupied)])
+    scheduler = Scheduler.get_instance()
+    seat_remaining = scheduler.remaining('seat')
+    inactive_remaining = scheduler.remaining('inactive')
+    metric('seat_timeout_remaining_seconds', 'gauge', "Time until reset after leaving the seat, -1 when not running",
+           [("", seat_remaining if seat_remaining is not None else -1)])
+    metric('inactive_timeout_remaining_seconds', 'gauge', "Time until reset when there is no input, -1 when not running",
+           [("", inactive_remaining if inactive_remaining is not None else -1)])
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Respond to any GET with the current metrics
+    """
+    def do_GET(self):
+        body = collect().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+def start_metrics_server():
+    """Start the metrics server in a daemon thread, on a Unix socket if one is configured, otherwise on localhost
+
+    return: the server or None if it could not be started
+    """
+    try:
+        if defs.METRICS_SOCKET:
+            if os.path.exists(defs.METRICS_SOCKET):
+                os.unlink(defs.METRICS_SOCKET)
+            server = UnixHTTPServer(defs.METRICS_SOCKET, MetricsHandler)
+        else:
+            server = HTTPServer(('127.0.0.1', defs.METRICS_PORT), MetricsHandler)
+    except OSError as e:
+        logging.warning("Unable to start metrics server: %s", e)
+        return None
+    threading.Thread(target = server.serve_forever, name = "Metrics", daemon = True).start()
+    return server
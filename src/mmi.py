@@ -1,14 +1,23 @@
 '''
 Man-Machine Interface module for the Bell 47 demonstrator rig
 '''
+import math
 import pygame
-#import logging
+import logging
 import time
 
 import defs
 from defs import event_module, QuitException, ResetException
 from device import InterfaceBoard
 from pygame import event
+from telemetry import Telemetry, cache_stats
+from cache import SurfaceCache, load_image
+from fonts import load_font
+import glyphs
+import layout
+from layout import wrap_text
+from hud import PerformanceHud
+from scheduler import Scheduler
 
 WELCOME_FONT = 'welcome'
 MENU_FONT = 'menu'
@@ -73,6 +82,7 @@ DOWN_IMAGE = 'down'
 fonts = {}
 images = {}
 current_language = 'en'
+SCREEN_PIXELS = defs.SCREEN_WIDTH * defs.SCREEN_HEIGHT
 
 def str2bool(v):
     return v.lower() in ("yes", "true", "t", "1")
@@ -82,37 +92,50 @@ def local_font_name(name):
         return name + '_' + current_language
     else:
         return name
+
+def release_fonts():
+    """Release the fonts loaded for languages other than the current one
+    """
+    for name in [n for n in fonts if n[-3:] in ('_zh', '_ru') and n[-2:] != current_language]:
+        font = fonts.pop(name)
+        glyphs.detach(font)
+        layout.release(font)
+    cache_stats('fonts').entries = len(fonts)
     
 def get_font(name: str) -> pygame.font:
-    """Get one of the predefined fonts by name, loading it on first use.
+    """Get one of the predefined fonts by name, loading it from its file on first use.
+    Only the fonts for the current language are loaded
     
     name (str): the font name
     """
     local_name = local_font_name(name)
     if local_name not in font_defs:
         local_name = name
-    if local_name not in fonts:
+    stats = cache_stats('fonts')
+    if local_name in fonts:
+        stats.hits += 1
+    else:
+        stats.misses += 1
         if name not in font_defs:
             local_name = TEXT_FONT
         font_def = font_defs[local_name]
 #        logging.debug("font %s is %s with size %s bold %s italic %s", name, font_def[0], font_def[1], font_def[2], font_def[3])
-#         fonts[name] = pygame.font.SysFont(font_def[0], font_def[1], font_def[2], font_def[3])
-        fonts[local_name] = pygame.font.SysFont(font_def[0], int(font_def[1]), str2bool(font_def[2]), str2bool(font_def[3]))
+        fonts[local_name] = load_font(font_def[0], int(font_def[1]), str2bool(font_def[2]), str2bool(font_def[3]))
+        glyphs.attach(fonts[local_name], local_name, font_def)
+        stats.entries = len(fonts)
     return fonts[local_name]
 
 def get_image(name: str, filepath: str = None, alpha: bool = True): 
-    """Get one of the predefined images by name, loading it on first use.
+    """Get one of the predefined images by name, loading it into the surface cache on first use.
     
     name: the image name
     filepath: the image file path
     alpha: when True image contains transparency
     """
     if name not in images:
-        if alpha:
-            images[name] = pygame.image.load(filepath).convert_alpha()
-        else:
-            images[name] = pygame.image.load(filepath).convert()
-    return images[name]
+        images[name] = (filepath, alpha)
+    filepath, alpha = images[name]
+    return load_image(filepath, 'images', alpha, pinned = True)
 
 class InputManager(object) :
     """Manage inputs supporting input from both keyboard and analogue controls
@@ -139,10 +162,9 @@ class InputManager(object) :
         self.x_inc = 0.05
         self.y_inc = 0.05
         self.z_inc = 0.05
-        self._seat_timer = None
         self._seat_timeout = defs.SEAT_TIMEOUT
-        self._inactive_timer = None
         self._inactive_timeout = defs.INACTIVE_TIMEOUT
+        self._scheduler = Scheduler.get_instance()
         
     def reset(self) :
         self.x = self.y = self.z = self.r = 0.0
@@ -160,30 +182,76 @@ class InputManager(object) :
         self.set_scroll(False)
     
     def reset_inactive_timer(self):
-        self._inactive_timer = time.time()
+        self._scheduler.start('inactive', self._inactive_timeout, self._timed_out)
+
+    def _timed_out(self):
+        """Return to the welcome screen when the seat has been left or there has been no input for too long
+        """
+        raise ResetException()
             
     def has_motor(self) -> bool:
         return self._has_motor
     
     def motor(self, on: bool):
+        """Turn the motor on or off, it is turned off after MOTOR_TIMEOUT if it is left on
+        """
         self._fc.motor(on)
+        if on:
+            self._scheduler.start('motor', defs.MOTOR_TIMEOUT, self._motor_off)
+        else:
+            self._scheduler.cancel('motor')
+
+    def _motor_off(self):
+        logging.warning("Motor on for %.0f s, turning it off", defs.MOTOR_TIMEOUT)
+        self._fc.motor(False)
     
     def get_events(self) -> event:
+        """Get the events waiting in the queue without blocking
+        """
+        return self._process(event_module.get())
+
+    def wait_events(self, timeout: float = None) -> event:
+        """Wait for events rather than polling for them, sleeping until an event arrives.
+        Returns with no events at the timeout, in time for the next scheduled deadline and often
+        enough to keep the watchdog heartbeat going
+
+        timeout: the longest time to wait in seconds, None to wait for an event or a timeout
+        """
+        limit = defs.WATCHDOG_BUDGET / 2
+        if timeout is not None:
+            limit = min(limit, timeout)
+        deadline = self._scheduler.next_deadline()
+        if deadline is not None:
+            limit = min(limit, deadline)
+        # Wake just after a deadline so it has passed when the timers are run
+        first = pygame.event.wait(math.ceil(limit * 1000) + 1)
         events = event_module.get()
-        for event in events:    
+        if first.type != pygame.NOEVENT:
+            events.insert(0, first)
+        return self._process(events)
+
+    def _process(self, events: list) -> event:
+        """Handle the quit, reset and HUD events common to all screens and run the timers that are due
+        """
+        tm = Telemetry.get_instance()
+        tm.heartbeat()
+        if events:
+            tm.add_events(len(events))
+        for event in events:
+            if hasattr(event, 'read_ns'):
+                tm.add_latency(time.perf_counter_ns() - event.read_ns)    
             if (event.type == pygame.QUIT or (event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE) or
                 (event.type == pygame.JOYBUTTONDOWN and event.button == defs.BTN_RESET and
                 self._fc.is_button_pressed(defs.BTN.BTN2))):
                 raise QuitException()
+            if ((event.type == pygame.KEYDOWN and event.key == pygame.K_F12) or
+                (event.type == pygame.JOYBUTTONDOWN and event.button == defs.BTN_HUD and
+                self._fc.is_button_pressed(defs.BTN.BTN2))):
+                PerformanceHud.get_instance().toggle()
             if ((event.type == pygame.JOYBUTTONDOWN and event.button == defs.BTN_RESET)
                 or (event.type == pygame.KEYDOWN and event.key == pygame.K_HOME)) :
                 raise ResetException()
-        if self._inactive_timer != None and (time.time() - self._inactive_timer) > self._inactive_timeout:
-            self._inactive_timer = None
-            raise ResetException()
-        elif self._seat_timer != None and time.time() - self._seat_timer >= self._seat_timeout:
-            self._seat_timer = None
-            raise ResetException()
+        self._scheduler.run()
         return events
 
     def get_any_key(self):
@@ -191,7 +259,7 @@ class InputManager(object) :
         """
         done = False
         while not done:   
-            for event in self.get_events():
+            for event in self.wait_events():
                 if event.type == pygame.KEYDOWN or event.type == pygame.JOYBUTTONDOWN:
                     done = True
     
@@ -283,7 +351,7 @@ class InputManager(object) :
                 self._button_pressed = True
                 got_input = True
             elif event.button == defs.BTN.SEAT.value:
-                self._seat_timer = None
+                self._scheduler.cancel('seat')
                 self._seat_occupied = True
                 got_input = True
         elif event.type == pygame.JOYBUTTONUP:
@@ -291,7 +359,7 @@ class InputManager(object) :
                 self._button_pressed = False
                 got_input = True
             elif event.button == defs.BTN.SEAT.value:
-                self._seat_timer = time.time()
+                self._scheduler.start('seat', self._seat_timeout, self._timed_out)
                 got_input = True
         elif event.type == pygame.JOYAXISMOTION:
             if event.axis == 0:
@@ -341,6 +409,28 @@ class InputManager(object) :
             self.reset_inactive_timer()
         return arrow
 
+def update_display(rects = None):
+    """Update the display and record the frame in the telemetry
+    
+    rects: a rect or list of rects to update (None entries are ignored), the whole display when None
+    """
+    t = time.perf_counter_ns()
+    screen = pygame.display.get_surface()
+    hud = PerformanceHud.get_instance()
+    hud_rect = hud.draw(screen)
+    if rects is None:
+        pygame.display.update()
+        pixels = SCREEN_PIXELS
+    else:
+        if isinstance(rects, pygame.Rect):
+            rects = (rects,)
+        if hud_rect is not None:
+            rects = list(rects) + [hud_rect]
+        pygame.display.update(rects)
+        pixels = sum(r[2] * r[3] for r in rects if r)
+    hud.restore(screen)
+    Telemetry.get_instance().present(pixels, time.perf_counter_ns() - t)
+
 def choose_cell(cells, ncells, cellx = 0, celly = 0) -> ():
     """Choose a cell position using keyboard or cyclic stick trim button.
     
@@ -389,7 +479,7 @@ def ask(screen: pygame.surface, question: str, fgd: () = defs.WHITE, bgd: () = d
     im = InputManager.get_instance()
     screen_rect = screen.get_rect()
     if font == None: font = get_font(TEXT_FONT)
-    t = font.render(question, True, fgd)
+    t = glyphs.render(font, question, fgd)
     text_rect = t.get_rect(center = screen_rect.center)
     t_yes = font.render(_("Yes"), False, fgd)
     t_yes_rect = t_yes.get_rect(center = screen_rect.center).move(-150, 100)
@@ -404,28 +494,32 @@ def ask(screen: pygame.surface, question: str, fgd: () = defs.WHITE, bgd: () = d
     screen.blit(t, text_rect)
     screen.blit(t_yes, t_yes_rect)
     screen.blit(t_no, t_no_rect)
-    pygame.display.update(rect)
+    update_display(rect)
     answer = True
+    shown = None
     done = False
     while not done:   
-        for event in im.get_events():
+        if answer != shown:
+            # Move the highlight only when the answer changes
+            if answer == True:
+                yes_colour = defs.HIGHLIGHT_COLOUR
+                no_colour = bgd
+            else:
+                yes_colour = bgd
+                no_colour = defs.HIGHLIGHT_COLOUR
+            pygame.draw.rect(screen, yes_colour, t_yes_box, 2)
+            pygame.draw.rect(screen, no_colour, t_no_box, 2)
+            update_display((t_yes_box, t_no_box))
+            shown = answer
+        for event in im.wait_events():
             im.reset()
             im.get_input(event)
             if im._button_pressed:
                 done = True
             else :
                 answer = im.x < 0
-        if answer == True:
-            yes_colour = defs.HIGHLIGHT_COLOUR
-            no_colour = bgd
-        else:
-            yes_colour = bgd
-            no_colour = defs.HIGHLIGHT_COLOUR
-        pygame.draw.rect(screen, yes_colour, t_yes_box, 2)
-        pygame.draw.rect(screen, no_colour, t_no_box, 2)
-        pygame.display.update((t_yes_box, t_no_box))
     screen.blit(restore, rect)
-    pygame.display.update(rect)
+    update_display(rect)
     return answer
 
 # def scroll_text(screen : pygame.surface,
@@ -519,66 +613,49 @@ def ask(screen: pygame.surface, question: str, fgd: () = defs.WHITE, bgd: () = d
 #         pygame.key.set_repeat()
 #         im.set_scroll(False)
     
-def wrap_text(text, font, width):
-    """Wrap text to fit inside a given width when rendered.
-    
-    text: The text to be wrapped.
-    font: The font the text will be rendered in.
-    width: The width to wrap to.
-    """
-    text_lines = text.replace('\t', '    ').split('\n')
-    if width is None or width == 0:
-        return text_lines
-
-    wrapped_lines = []
-    for line in text_lines:
-        line = line.rstrip() + ' '
-        if line == ' ':
-            wrapped_lines.append(line)
-            continue
-
-        # Get the leftmost space ignoring leading whitespace
-        start = len(line) - len(line.lstrip())
-        start = line.index(' ', start)
-        while start + 1 < len(line):
-            # Get the next potential splitting point
-            nxt = line.index(' ', start + 1)
-            if font.size(line[:nxt])[0] <= width:
-                start = nxt
-            else:
-                wrapped_lines.append(line[:start])
-                line = line[start+1:]
-                start = line.index(' ')
-        line = line[:-1]
-        if line:
-            wrapped_lines.append(line)
-    return wrapped_lines
-
-def render_text_list(lines, font, colour=(255, 255, 255), bgd=(0,0,0,0)):
-    """Draw multiline text to a surface with a transparent background and return the surface
-    lines: The lines of text to render.
+def render_lines(lines, font, colour=(255, 255, 255), bgd=(0,0,0,0)):
+    """Draw multiline text to a new surface
+    lines: The lines of text to render, lines starting with <c> are centred.
     font: The font to render in.
     colour: The colour to render the font in, default is white.
+    bgd: The background colour, default is transparent.
     """
-    centred = []
-    for i, line in enumerate(lines):
-        if line.startswith('<c>'):
-            lines[i] = line[3:]
-            centred.append(i)
-    rendered = [font.render(line, True, colour).convert_alpha() for line in lines]
+    centred = [line.startswith('<c>') for line in lines]
+    rendered = [glyphs.render(font, line[3:] if centre else line, colour).convert_alpha()
+                for line, centre in zip(lines, centred)]
     line_height = font.get_linesize()
     width = max(line.get_width() for line in rendered)
     tops = [int(round(i * line_height)) for i in range(len(rendered))]
     height = tops[-1] + font.get_height()
     surface = pygame.Surface((width, height)).convert_alpha()
     surface.fill(bgd)
-    i = 0
-    for y, line in zip(tops, rendered):
+    for y, line, centre in zip(tops, rendered, centred):
         x = 0
-        if i in centred:
+        if centre:
             x = (surface.get_width() - line.get_width()) / 2
         surface.blit(line, (x, y))
-        i += 1
+    return surface
+
+def render_text_list(lines, font, colour=(255, 255, 255), bgd=(0,0,0,0)):
+    """Draw multiline text to a surface with a transparent background and return the surface.
+    The surface is kept in the surface cache and shared by calls with the same lines, font and colours so
+    it must not be drawn on
+    lines: The lines of text to render, lines starting with <c> are centred.
+    font: The font to render in.
+    colour: The colour to render the font in, default is white.
+    bgd: The background colour, default is transparent.
+    """
+    surfaces = SurfaceCache.get_instance()
+    stats = cache_stats('paragraphs')
+    key = ('paragraph', tuple(lines), font, tuple(colour), tuple(bgd))
+    surface = surfaces.get(key)
+    if surface is not None:
+        stats.hits += 1
+        return surface
+    stats.misses += 1
+    surface = surfaces.put(key, render_lines(lines, font, colour, bgd), 'paragraph')
+    surfaces.trim_owner('paragraph', defs.PARAGRAPH_BUDGET)
+    stats.bytes = surfaces.owner_bytes('paragraph')
     return surface
 
 def test():
@@ -0,0 +1,148 @@
+'''
+Pages module for the Bell 47 demonstrator rig
+Lays out and renders the pages of the description documents ahead of time so that paging through them is instant
+'''
+import hashlib
+import logging
+import mmap
+import struct
+from collections import OrderedDict
+from pathlib import Path
+
+import pygame
+
+import defs
+import i18n
+import mmi
+from cache import SurfaceCache
+from telemetry import cache_stats
+
+MAGIC = b'FCDP'
+HEADER = struct.Struct('<4sHH')
+FORMAT = 'BGRA'
+
+class PageCache(object):
+    """Rendered pages of text, one surface per page, language, font, width and colours.
+
+        The pages of a document are queued when it is opened and rendered one at a time between frames
+        by step(). A page that is needed before it has been rendered is rendered at once. Pages are held
+        in the surface cache and, when a page directory is configured, saved so later runs can map them
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton page cache
+        """
+        if PageCache.__instance == None:
+            PageCache.__instance = PageCache(defs.PAGE_DIR)
+        return PageCache.__instance
+
+    def __init__(self, directory: str):
+        self._directory = Path(directory) if directory else None
+        self._pending = OrderedDict()
+        self._stats = cache_stats('pages')
+
+    def request(self, filenames: list, font: pygame.font.Font, fgd, bgd, width: int):
+        """Queue the pages of a document to be rendered
+
+        filenames: the language specific text files, one per page
+        font: the font to use
+        fgd: the foreground colour
+        bgd: the background colour
+        width: the width to wrap the text to
+        """
+        surfaces = SurfaceCache.get_instance()
+        for filename in filenames:
+            key = self._key(filename, font, fgd, bgd, width)
+            if key not in surfaces:
+                self._pending[key] = (filename, font, fgd, bgd, width)
+
+    def get(self, filename: str, font: pygame.font.Font, fgd, bgd, width: int) -> pygame.Surface:
+        """Get a page, rendering it now if it is not ready
+
+        filename: the language specific text file
+        font: the font to use
+        fgd: the foreground colour
+        bgd: the background colour
+        width: the width to wrap the text to
+        """
+        key = self._key(filename, font, fgd, bgd, width)
+        page = SurfaceCache.get_instance().get(key)
+        if page is None:
+            self._stats.misses += 1
+            self._pending.pop(key, None)
+            page = self._render(key, filename, font, fgd, bgd, width)
+        else:
+            self._stats.hits += 1
+        return page
+
+    def step(self) -> bool:
+        """Render the next queued page, if any
+
+        return: True if a page was rendered
+        """
+        surfaces = SurfaceCache.get_instance()
+        while self._pending:
+            key, args = self._pending.popitem(last = False)
+            if key not in surfaces and key[1] == i18n.current_language:
+                self._render(key, *args)
+                return True
+        return False
+
+    @staticmethod
+    def _key(filename: str, font: pygame.font.Font, fgd, bgd, width: int) -> tuple:
+        return ('page', i18n.current_language, filename, font, tuple(fgd), tuple(bgd), width)
+
+    def _render(self, key: tuple, filename: str, font: pygame.font.Font, fgd, bgd, width: int) -> pygame.Surface:
+        """Lay out and render a page, or map it from the page directory if it was saved by an earlier run
+        """
+        text = i18n.read_file(filename)
+        path = self._path(key, text, font) if self._directory is not None else None
+        page = self._load(path) if path is not None else None
+        if page is None:
+            page = mmi.render_lines(mmi.wrap_text(text, font, width), font, fgd, bgd)
+            if path is not None:
+                self._save(path, page)
+        surfaces = SurfaceCache.get_instance()
+        surfaces.put(key, page, 'pages')
+        self._stats.bytes = surfaces.owner_bytes('pages')
+        return page
+
+    def _path(self, key: tuple, text: str, font: pygame.font.Font) -> Path:
+        """Get the file a page is saved in, named by a digest of everything that affects its pixels
+        """
+        language, filename, fgd, bgd, width = key[1], key[2], key[4], key[5], key[6]
+        font_def = [mmi.font_defs[name] for name, f in mmi.fonts.items() if f is font]
+        digest = hashlib.sha1(repr((text, font_def, font.get_height(), font.get_bold(), font.get_italic(),
+                                    fgd, bgd, width)).encode()).hexdigest()[:16]
+        return self._directory / ("%s-%s-%s.raw" % (language, Path(filename).stem, digest))
+
+    @staticmethod
+    def _load(path: Path) -> pygame.Surface:
+        """Load a saved page
+
+        return: the page or None if it has not been saved
+        """
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+                magic, width, height = HEADER.unpack_from(data)
+                if magic != MAGIC:
+                    return None
+                page = pygame.image.frombuffer(data[HEADER.size:HEADER.size + width * height * 4], (width, height), FORMAT)
+                return page.convert_alpha()
+        except (OSError, ValueError, struct.error):
+            return None
+
+    @staticmethod
+    def _save(path: Path, page: pygame.Surface):
+        """Save a page, if the page directory is writable
+        """
+        try:
+            path.parent.mkdir(parents = True, exist_ok = True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, page.get_width(), page.get_height()))
+                f.write(pygame.image.tobytes(page, FORMAT))
+            tmp.replace(path)
+        except OSError as e:
+            logging.info("Page not saved: %s", e)
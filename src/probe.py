@@ -0,0 +1,178 @@
+'''
+Probe module for the Bell 47 demonstrator rig
+Benchmarks the drawing primitives on the machine at startup and chooses the quality and frame rates to suit it
+'''
+import json
+import logging
+import os
+import platform
+import time
+from pathlib import Path
+
+import pygame
+
+import defs
+from telemetry import runtime_file
+
+ITERATIONS = 9
+
+# Rough number of times each primitive is used to draw a simulator frame
+FRAME = {'rotozoom': 3, 'scale': 6, 'font': 1, 'update': 1}
+
+class Preset(object):
+    """The quality and frame rates for machines that draw a simulator frame within a given time
+    """
+    def __init__(self, name: str, frame_ms: float, quality: str, max_quality: str, sim_fps: int,
+                 advanced_fps: int, controls_fps: int):
+        """
+        name: the preset name used in the log
+        frame_ms: the estimated simulator frame time below which the preset is used
+        quality: the quality level the simulator starts at
+        max_quality: the best quality level the governor may step up to
+        sim_fps: the frame rate of the simple simulator
+        advanced_fps: the frame rate of the advanced simulator
+        controls_fps: the frame rate of the flight controls screen
+        """
+        self.name = name
+        self.frame_ms = frame_ms
+        self.quality = quality
+        self.max_quality = max_quality
+        self.sim_fps = sim_fps
+        self.advanced_fps = advanced_fps
+        self.controls_fps = controls_fps
+
+# Presets from the fastest machines to the slowest, the last is used by any machine slower than the others
+PRESETS = (
+    Preset('fast', 2.0, 'high', 'ultra', 60, 30, 60),
+    Preset('standard', 8.0, 'high', 'high', 40, 20, 60),
+    Preset('reduced', 20.0, 'medium', 'high', 30, 15, 30),
+    Preset('minimal', None, 'low', 'medium', 20, 10, 20),
+    )
+
+def hardware_key(screen: pygame.Surface) -> str:
+    """Identify the hardware and display mode the benchmark results apply to
+    """
+    model = None
+    try:
+        with open('/proc/device-tree/model') as f:
+            model = f.read().strip('\0\n ')
+    except OSError:
+        try:
+            with open('/proc/cpuinfo') as f:
+                model = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), None)
+        except OSError:
+            pass
+    return "%s/%s/%d cpus/%s/%dx%d" % (model or platform.processor() or "unknown", platform.machine(), os.cpu_count() or 1,
+                                       pygame.display.get_driver(), screen.get_width(), screen.get_height())
+
+def _time(function, iterations: int = ITERATIONS) -> float:
+    """Get the median time of a function in microseconds
+    """
+    times = []
+    for i in range(iterations):
+        t = time.perf_counter_ns()
+        function(i)
+        times.append(time.perf_counter_ns() - t)
+    return sorted(times)[iterations // 2] / 1000
+
+def benchmark(screen: pygame.Surface) -> dict:
+    """Time the primitives used to draw the simulator
+
+    screen: the display surface, which is updated with what it already shows
+    return: the median time of each primitive in microseconds
+    """
+    sprite = pygame.image.load("images/Bell47Helicopter.png").convert_alpha()
+    item = pygame.image.load("images/Landscape/Tree.png").convert_alpha()
+    font = pygame.font.Font(None, 32)
+    rect = screen.get_rect()
+    rect.width //= 2
+    rect.height //= 2
+    return {
+        'rotozoom': _time(lambda i: pygame.transform.rotozoom(sprite, i * 37.0, 1.0)),
+        'scale': _time(lambda i: pygame.transform.scale(item, (80 - i, 80 - i))),
+        'font': _time(lambda i: font.render("Landed OK %d" % (i), True, defs.WHITE)),
+        'update': _time(lambda i: pygame.display.update(rect)),
+        }
+
+def choose(results: dict) -> (Preset, float):
+    """Choose the preset for the estimated time to draw a simulator frame
+
+    results: the benchmark results in microseconds
+    return: the preset and the estimated frame time in milliseconds
+    """
+    frame_ms = sum(results[name] * count for name, count in FRAME.items()) / 1000
+    for preset in PRESETS:
+        if preset.frame_ms is None or frame_ms < preset.frame_ms:
+            return preset, frame_ms
+
+def _paths() -> list:
+    """Get the files the results may be kept in, the configured one first and then the runtime directory
+    """
+    paths = [Path(defs.PROBE_FILE)]
+    runtime = runtime_file(Path(defs.PROBE_FILE).name)
+    if runtime is not None:
+        paths.append(runtime)
+    return paths
+
+def load(key: str) -> dict:
+    """Get the saved results for the hardware
+
+    return: the results or None if the hardware has not been probed
+    """
+    for path in _paths():
+        try:
+            with open(path) as f:
+                results = json.load(f).get(key)
+            if results is not None:
+                return results
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning("Unable to read probe results %s: %s", path, e)
+    return None
+
+def save(key: str, results: dict) -> Path:
+    """Save the results for the hardware, in the first file that is writable
+
+    return: the file saved to or None if none were writable
+    """
+    for path in _paths():
+        try:
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+            saved[key] = results
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, 'w') as f:
+                json.dump(saved, f, indent = 1)
+            tmp.replace(path)
+            return path
+        except OSError as e:
+            logging.info("Probe results not saved in %s: %s", path, e)
+    return None
+
+def probe(screen: pygame.Surface, force: bool = False) -> Preset:
+    """Choose the quality and frame rates for the machine, benchmarking it the first time it is used.
+    The chosen preset replaces the frame rates and quality levels in FCD.ini
+
+    screen: the display surface
+    force: benchmark the machine even if it has been probed before
+    """
+    key = hardware_key(screen)
+    results = None if force else load(key)
+    if results is None:
+        start = time.perf_counter()
+        results = benchmark(screen)
+        logging.info("Probed %s in %.0f ms: %s", key, (time.perf_counter() - start) * 1000,
+                     ", ".join("%s %.0f us" % (name, t) for name, t in results.items()))
+        save(key, results)
+    preset, frame_ms = choose(results)
+    logging.info("Using the %s preset for a simulator frame of about %.1f ms", preset.name, frame_ms)
+    defs.QUALITY = preset.quality
+    defs.QUALITY_MAX = preset.max_quality
+    defs.SIM_FPS = preset.sim_fps
+    defs.SIM_ADVANCED_FPS = preset.advanced_fps
+    defs.CONTROLS_FPS = preset.controls_fps
+    return preset
@@ -0,0 +1,167 @@
+'''
+Profiler module for the Bell 47 demonstrator rig
+Profiles each program state handler with cProfile or a sampling profiler and writes per-state
+profiles and collapsed-stack files for flamegraph tools
+'''
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import defs
+from telemetry import runtime_file
+
+PROFILE_MODES = ('off', 'cprofile', 'sample')
+
+def _frame_name(code) -> str:
+    """Get the name used for a function in collapsed stacks
+    """
+    return "%s (%s:%d)" % (code.co_name, Path(code.co_filename).name, code.co_firstlineno)
+
+def _func_name(func: tuple) -> str:
+    """Get the collapsed stack name of a pstats function tuple (file, line, name)
+    """
+    return "%s (%s:%d)" % (func[2], Path(func[0]).name, func[1])
+
+def collapse_pstats(stats: pstats.Stats) -> Counter:
+    """Approximate collapsed stacks from a cProfile call graph.
+
+        cProfile does not record full stacks so the self time of each function is attributed
+        to the path through its most expensive callers
+
+    stats: the profile statistics
+    return: the self time in microseconds for each stack
+    """
+    stacks = Counter()
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if tt <= 0:
+            continue
+        path = [func]
+        seen = {func}
+        current = callers
+        while current and len(path) < 64:
+            caller = max(current, key = lambda c: current[c][3])
+            if caller in seen:
+                break
+            path.append(caller)
+            seen.add(caller)
+            current = stats.stats[caller][4] if caller in stats.stats else None
+        stacks[";".join(_func_name(f) for f in reversed(path))] += int(tt * 1e6)
+    return stacks
+
+class StateProfiler(object):
+    """Profile the program state handlers called from FCD.main.
+
+        In cprofile mode each state has its own cProfile.Profile that is enabled while its handler runs.
+        In sample mode a thread samples the main thread stack every defs.PROFILE_INTERVAL seconds
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton profiler object
+        """
+        if StateProfiler.__instance == None:
+            StateProfiler.__instance = StateProfiler(defs.PROFILE_MODE)
+        return StateProfiler.__instance
+
+    def __init__(self, mode: str):
+        if mode not in PROFILE_MODES:
+            mode = 'off'
+        self.mode = mode
+        self._profiles = {}
+        self._samples = {}
+        self._state = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._main_thread = threading.main_thread().ident
+
+    def run(self, state, handler, *args):
+        """Run a state handler, profiling it when enabled
+
+        state: the ProgramState being handled
+        handler: the state handler function
+        args: the arguments to the handler
+        return: the result of the handler
+        """
+        if self.mode == 'cprofile':
+            if state not in self._profiles:
+                self._profiles[state] = cProfile.Profile()
+            profile = self._profiles[state]
+            profile.enable()
+            try:
+                return handler(*args)
+            finally:
+                profile.disable()
+        elif self.mode == 'sample':
+            if self._thread is None:
+                self._thread = threading.Thread(target = self._sample, daemon = True)
+                self._thread.start()
+            if state not in self._samples:
+                self._samples[state] = Counter()
+            self._state = state
+            try:
+                return handler(*args)
+            finally:
+                self._state = None
+        else:
+            return handler(*args)
+
+    def _sample(self):
+        """Sampling thread, records the main thread stack against the current state
+        """
+        while True:
+            time.sleep(defs.PROFILE_INTERVAL)
+            state = self._state
+            if state is None:
+                continue
+            frame = sys._current_frames().get(self._main_thread)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            with self._lock:
+                self._samples[state][";".join(reversed(stack))] += 1
+
+    def write(self, state = None):
+        """Write the profiles to the runtime directory.
+
+            cprofile mode writes profile-<state>.prof for pstats/snakeviz and a text summary,
+            both modes write profile-<state>.folded collapsed stacks for flamegraph.pl or speedscope
+
+        state: the ProgramState whose profile to write, all of them when None
+        """
+        try:
+            for profile_state, profile in list(self._profiles.items()):
+                if state is not None and profile_state != state:
+                    continue
+                path = runtime_file("profile-%s.prof" % (profile_state.name.lower()))
+                if path is None:
+                    return
+                stats = pstats.Stats(profile)
+                stats.dump_stats(str(path))
+                self._write_folded(path.with_suffix(".folded"), collapse_pstats(stats))
+                summary = io.StringIO()
+                pstats.Stats(profile, stream = summary).sort_stats('cumulative').print_stats(30)
+                path.with_suffix(".txt").write_text(summary.getvalue())
+            for sample_state, samples in list(self._samples.items()):
+                if state is not None and sample_state != state:
+                    continue
+                path = runtime_file("profile-%s.folded" % (sample_state.name.lower()))
+                if path is None:
+                    return
+                # The sampling thread adds to the counts while they are copied
+                with self._lock:
+                    samples = samples.copy()
+                self._write_folded(path, samples)
+        except OSError as e:
+            logging.warning("Unable to write profiles: %s", e)
+
+    def _write_folded(self, path: Path, stacks: Counter):
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write("%s %d\n" % (stack, count))
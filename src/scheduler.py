@@ -0,0 +1,107 @@
+'''
+Scheduler module for the Bell 47 demonstrator rig
+Owns the deadlines of the main loop: the seat and inactivity timeouts, the pause after landing, the motor
+shutdown and the cache warm-up
+'''
+import heapq
+import itertools
+import time
+
+class Timer(object):
+    """A named deadline and the function called when it passes
+    """
+    def __init__(self, name: str, when: float, callback):
+        self.name = name
+        self.when = when
+        self.callback = callback
+        self.queued = None
+        self.active = True
+
+class Scheduler(object):
+    """Run functions when their deadlines pass, checked each time the input is read.
+
+        Timers are held in a heap by deadline so checking them costs one comparison when none are due.
+        Restarting a timer that is already queued for an earlier time only records the new deadline, the
+        timer is requeued when it reaches the top of the heap, so timers restarted on every input event
+        e.g. the inactivity timeout do not grow the heap
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton scheduler
+        """
+        if Scheduler.__instance == None:
+            Scheduler.__instance = Scheduler()
+        return Scheduler.__instance
+
+    def __init__(self):
+        self._heap = []
+        self._timers = {}
+        self._count = itertools.count()
+
+    def start(self, name: str, delay: float, callback):
+        """Start a timer, replacing any timer of the same name
+
+        name: the timer name e.g. seat
+        delay: the time until the deadline in seconds
+        callback: the function to call, with no arguments, when the deadline passes
+        """
+        when = time.monotonic() + delay
+        timer = self._timers.get(name)
+        if timer is None or timer.callback != callback:
+            self.cancel(name)
+            timer = self._timers[name] = Timer(name, when, callback)
+        timer.when = when
+        if timer.queued is None or when < timer.queued:
+            self._push(timer, when)
+
+    def cancel(self, name: str):
+        """Stop a timer if it is running
+        """
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            timer.active = False
+
+    def pending(self, name: str) -> bool:
+        """Check if a timer is running
+        """
+        return name in self._timers
+
+    def remaining(self, name: str) -> float:
+        """Get the time left before a timer's deadline
+
+        return: the time in seconds or None if the timer is not running
+        """
+        timer = self._timers.get(name)
+        if timer is None:
+            return None
+        return max(0.0, timer.when - time.monotonic())
+
+    def next_deadline(self) -> float:
+        """Get the time until the next deadline, which may be earlier than any timer's if one has been restarted
+
+        return: the time in seconds or None if no timers are running
+        """
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def run(self):
+        """Call the functions of the timers whose deadlines have passed.
+        A timer is stopped before its function is called, so the function may restart it or raise an exception
+        """
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            when, _, timer = heapq.heappop(self._heap)
+            if not timer.active or timer.queued != when:
+                continue
+            timer.queued = None
+            if timer.when > now:
+                self._push(timer, timer.when)
+            else:
+                self.cancel(timer.name)
+                timer.callback()
+
+    def _push(self, timer: Timer, when: float):
+        timer.queued = when
+        heapq.heappush(self._heap, (when, next(self._count), timer))
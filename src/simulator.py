@@ -3,14 +3,18 @@ Simulator module for the Bell 47 demonstrator rig
 '''
 import pygame
 #import logging
-import time
 import math
 
 import defs
 from defs import ProgramState, CRASH_LANDING_SPEED, HEANY_LANDING_SPEED, LANDING_PAD_OFFSET
 from graphics import Altimeter, ArtificialHorizon, Helicopter, DirectionIndicator, LandingPad, HelicopterState, Landscape, write
 from mmi import InputManager, get_font, INFO_FONT, render_text_list,\
-    wrap_text
+    wrap_text, update_display
+import telemetry
+from telemetry import Telemetry
+from assets import AssetManager
+from scheduler import Scheduler
+from governor import QualityGovernor
 
 class FlightControls(object) :
     """Structure for the flight controls
@@ -125,35 +129,24 @@ def simulator(screen : pygame.surface, basic : bool = False) -> ProgramState:
     landed = False
     
     # Initialize the display objects
-    helicopter = Helicopter(pivot)
-    landing_pad = LandingPad(pivot)
-    direction_indicator = DirectionIndicator()
-    altimeter = Altimeter()
+    assets = AssetManager.get_instance()
+    helicopter = assets.widget(Helicopter, pivot)
+    landing_pad = assets.widget(LandingPad, pivot)
+    direction_indicator = assets.widget(DirectionIndicator)
+    altimeter = assets.widget(Altimeter)
+    artificial_horizon = None
     if sim_properties.show_artificial_horizon:
-        artificial_horizon = ArtificialHorizon()
-    landscape = Landscape(pivot,
+        artificial_horizon = assets.widget(ArtificialHorizon)
+    landscape = assets.widget(Landscape, pivot,
         int((X_MAX + window_width / 2) / (1 - SCALE_FACTOR)),
         int((Y_MAX + window_height / 2)/ (1 - SCALE_FACTOR))
         )
         
     helicopter_state = _("On the ground")
      
-    if __debug__:
-        # Set up performance data
-        count = 0
-        timings = {
-        'events': 0,
-        'startup': 0,
-        'calcs': 0,
-        'text': 0,
-        'landingpad': 0,
-        'landscape': 0,
-        'direction': 0,
-        'helicopter': 0,
-        'altimeter': 0,
-        'artificialhorizon': 0,
-        'update': 0
-        }
+    # Performance data is recorded per frame by the telemetry
+    tm = Telemetry.get_instance()
+    first_frame = tm.head
     
     # Initialize screen areas
     main_rect = screen.get_rect()
@@ -164,13 +157,15 @@ def simulator(screen : pygame.surface, basic : bool = False) -> ProgramState:
     dash_text = _('Centre the cyclic stick, lower the collective and put your feet on the anti-torque pedals.\n'
                   'Then press the button to start the engine.\n'
                   'Try to take off, fly around and land back on the pad.')
-    max_fps = 40
+    max_fps = defs.SIM_FPS
     if basic:
         dash_text_left = 10
     else:
-        max_fps = 20
+        max_fps = defs.SIM_ADVANCED_FPS
         dash_text_left = 250
         dash_text += _('\nThe direction arrow at the top of the screen indicates where to find the landing pad.')
+    # Step the quality down if the frames can't be drawn at max_fps
+    governor = QualityGovernor(max_fps, helicopter, landscape, artificial_horizon)
     screen.fill(defs.DASH_BACKGROUND_COLOUR, dash_rect)
     screen.fill(defs.SIM_BACKGROUND_COLOUR, main_rect)
     dash_text_rect = pygame.Rect(dash_text_left, dash_rect.top + 30 , screen.get_width() - 500, defs.DASH_HEIGHT - 60)
@@ -178,217 +173,204 @@ def simulator(screen : pygame.surface, basic : bool = False) -> ProgramState:
         
     # -------- Main Loop -----------
     done = False
+    def finish():
+        nonlocal done
+        done = True
+    scheduler = Scheduler.get_instance()
+    scheduler.cancel('landed')
     fps = 30
     clock = pygame.time.Clock()
     first_pass = True
-    while not done:
-        if __debug__:
-            count += 1
-        rects = []
+    try:
+        while not done:
+            rects = []
                                    
-        # Process events
-        if __debug__:t = time.time()
-        for event in im.get_events():
-            got = im.get_input(event)
-            if not im._seat_occupied:
-                done = True
-            if got:
-                flight_controls.set(im)
-            if im.char != None:
-                sim_properties.set(im.char)
-        if __debug__:timings['events'] += time.time() - t
-        # print("%3.3f %3.3f %3.3f %3.3f %5s %5s" % (im.x, im.y, im.z, im.r, im._button_pressed, im._seat_occupied), end='\r')
+            # Process events
+            tm.start()
+            for event in im.get_events():
+                got = im.get_input(event)
+                if not im._seat_occupied:
+                    done = True
+                if got:
+                    flight_controls.set(im)
+                if im.char != None:
+                    sim_properties.set(im.char)
+            tm.mark(telemetry.EVENTS)
+            # print("%3.3f %3.3f %3.3f %3.3f %5s %5s" % (im.x, im.y, im.z, im.r, im._button_pressed, im._seat_occupied), end='\r')
         
-        # Start up the helicopter
-        if __debug__:t = time.time()
-        if (flight_controls.startup) :
-            if not running :
-                running = True
-                heading = 0.0
-                x = 0.0
-                y = 0.0
-                helicopter.set_state(HelicopterState.WINDING_UP)
-                helicopter_state = _("Starting up")
-        if __debug__:timings['startup'] += time.time() - t
+            # Start up the helicopter, unless it has landed and is about to return to the menu
+            if (flight_controls.startup and not scheduler.pending('landed')) :
+                if not running :
+                    running = True
+                    heading = 0.0
+                    x = 0.0
+                    y = 0.0
+                    helicopter.set_state(HelicopterState.WINDING_UP)
+                    helicopter_state = _("Starting up")
+            tm.mark(telemetry.STARTUP)
         
-        # Calculate the flight parameters
-        if __debug__:t = time.time()
-        st = helicopter.get_state()
-        if st == HelicopterState.RUNNING:
-            # Don't allow the helicopter to move until its running
-            helicopter_state = _("Running")
-            if altitude > 0.0 :
-                if basic:
-                    pitch = flight_controls.cyclic_pitch * defs.PITCH_MAX
-                    roll = flight_controls.cyclic_roll * defs.ROLL_MAX
-                else:
-                    pitch = min(pitch + flight_controls.cyclic_pitch * PITCH_INC, defs.PITCH_MAX)
-                    roll = min(roll + flight_controls.cyclic_roll * ROLL_INC, defs.ROLL_MAX)
-            else :
-                pitch = roll = 0.0
-            thrust = flight_controls.collective * defs.THRUST_FACTOR
-            if (flight_controls.collective > 0.01) :
-                thrust2 = thrust
-            else : # windmilling
-                thrust2 = defs.WINDMILL_THRUST
-            lift = thrust2 * abs(math.cos(math.radians(pitch))) * abs(math.cos(math.radians(roll)))
-            forward_thrust = thrust2 * math.sin(math.radians(pitch))
-            side_thrust = thrust2 * math.sin(math.radians(roll))
-            if (not basic and abs(forward_thrust) > 0.1 and abs(side_thrust) > 0.01) :
-                heading_change = math.degrees(math.atan2(side_thrust, forward_thrust)) / defs.BANKING_FACTOR
-            else :
-                heading_change = 0.0
-            altitude = max(0.0, min(defs.ALTITUDE_MAX, altitude + (ALTITUDE_INC * (lift - defs.TAKEOFF_LIFT))))
-            vertical_speed = (prev_altitude - altitude) * fps
-            pad_scale = 1.0 - (altitude / defs.ALTITUDE_MAX) * SCALE_FACTOR
-            if (altitude > 1.0):
-                # We're off the ground
-                helicopter_state = _("Flying")
-                heading = (heading + HEADING_INC * flight_controls.anti_torque) % 360 + heading_change
-                xmax = X_MAX / pad_scale
-                ymax = Y_MAX / pad_scale
-                x = max(-xmax, min(xmax, x - (forward_thrust * math.sin(math.radians(heading)) 
-                                 + side_thrust * math.sin(math.radians(heading + 90.0)))))
-                y = max(-ymax, min(ymax, y + (forward_thrust * math.cos(math.radians(heading)) 
-                                 + side_thrust * math.cos(math.radians(heading + 90.0)))))
-                pad_offset.x = x * pad_scale
-                pad_offset.y = y * pad_scale
-            elif (altitude < 1.0 and prev_altitude > 1.0) :
-                # We've landed
-                landed = True
-                helicopter_state = _("Landed OK")
-                running = False
-                helicopter.set_state(HelicopterState.WINDING_DOWN)
-                flight_controls.reset()
-                pitch = roll = lift = thrust = 0.0
-                if vertical_speed > CRASH_LANDING_SPEED:
-                    msg = _("Oh dear, I'm afraid you crash landed!")
-                elif (pad_offset.length() > LANDING_PAD_OFFSET) :
-                    helicopter_state = _("Missed the landing pad")
-                    if vertical_speed < HEANY_LANDING_SPEED:
-                        msg = _('You landed OK but you missed the landing pad')
+            # Calculate the flight parameters
+            st = helicopter.get_state()
+            if st == HelicopterState.RUNNING:
+                # Don't allow the helicopter to move until its running
+                helicopter_state = _("Running")
+                if altitude > 0.0 :
+                    if basic:
+                        pitch = flight_controls.cyclic_pitch * defs.PITCH_MAX
+                        roll = flight_controls.cyclic_roll * defs.ROLL_MAX
                     else:
-                        msg = _("That was a heavy landing,\nand you missed the landing pad!")
-                else:
-                    if vertical_speed < HEANY_LANDING_SPEED:
-                        msg = _('Well done!\nYou landed safely back on the landing pad')
+                        pitch = min(pitch + flight_controls.cyclic_pitch * PITCH_INC, defs.PITCH_MAX)
+                        roll = min(roll + flight_controls.cyclic_roll * ROLL_INC, defs.ROLL_MAX)
+                else :
+                    pitch = roll = 0.0
+                thrust = flight_controls.collective * defs.THRUST_FACTOR
+                if (flight_controls.collective > 0.01) :
+                    thrust2 = thrust
+                else : # windmilling
+                    thrust2 = defs.WINDMILL_THRUST
+                lift = thrust2 * abs(math.cos(math.radians(pitch))) * abs(math.cos(math.radians(roll)))
+                forward_thrust = thrust2 * math.sin(math.radians(pitch))
+                side_thrust = thrust2 * math.sin(math.radians(roll))
+                if (not basic and abs(forward_thrust) > 0.1 and abs(side_thrust) > 0.01) :
+                    heading_change = math.degrees(math.atan2(side_thrust, forward_thrust)) / defs.BANKING_FACTOR
+                else :
+                    heading_change = 0.0
+                altitude = max(0.0, min(defs.ALTITUDE_MAX, altitude + (ALTITUDE_INC * (lift - defs.TAKEOFF_LIFT))))
+                vertical_speed = (prev_altitude - altitude) * fps
+                pad_scale = 1.0 - (altitude / defs.ALTITUDE_MAX) * SCALE_FACTOR
+                if (altitude > 1.0):
+                    # We're off the ground
+                    helicopter_state = _("Flying")
+                    heading = (heading + HEADING_INC * flight_controls.anti_torque) % 360 + heading_change
+                    xmax = X_MAX / pad_scale
+                    ymax = Y_MAX / pad_scale
+                    x = max(-xmax, min(xmax, x - (forward_thrust * math.sin(math.radians(heading)) 
+                                     + side_thrust * math.sin(math.radians(heading + 90.0)))))
+                    y = max(-ymax, min(ymax, y + (forward_thrust * math.cos(math.radians(heading)) 
+                                     + side_thrust * math.cos(math.radians(heading + 90.0)))))
+                    pad_offset.x = x * pad_scale
+                    pad_offset.y = y * pad_scale
+                elif (altitude < 1.0 and prev_altitude > 1.0) :
+                    # We've landed
+                    landed = True
+                    helicopter_state = _("Landed OK")
+                    running = False
+                    helicopter.set_state(HelicopterState.WINDING_DOWN)
+                    flight_controls.reset()
+                    pitch = roll = lift = thrust = 0.0
+                    if vertical_speed > CRASH_LANDING_SPEED:
+                        msg = _("Oh dear, I'm afraid you crash landed!")
+                    elif (pad_offset.length() > LANDING_PAD_OFFSET) :
+                        helicopter_state = _("Missed the landing pad")
+                        if vertical_speed < HEANY_LANDING_SPEED:
+                            msg = _('You landed OK but you missed the landing pad')
+                        else:
+                            msg = _("That was a heavy landing,\nand you missed the landing pad!")
                     else:
-                        msg = _("You landed back on the pad\nbut it was quite a heavy landing")
-                write_dash_text(screen, msg, get_font(INFO_FONT), defs.DASH_FOREGROUND_COLOUR, defs.DASH_BACKGROUND_COLOUR, dash_text_rect)
-                rects.append(dash_text_rect)
-            helicopter_rotation = heading
-            ground_rotation = 0.0
-# TODO            if not basic:
-#                 helicopter_rotation = 0.0
-#                 ground_rotation = heading
-        if __debug__:timings['calcs'] += time.time() - t
+                        if vertical_speed < HEANY_LANDING_SPEED:
+                            msg = _('Well done!\nYou landed safely back on the landing pad')
+                        else:
+                            msg = _("You landed back on the pad\nbut it was quite a heavy landing")
+                    write_dash_text(screen, msg, get_font(INFO_FONT), defs.DASH_FOREGROUND_COLOUR, defs.DASH_BACKGROUND_COLOUR, dash_text_rect)
+                    rects.append(dash_text_rect)
+                helicopter_rotation = heading
+                ground_rotation = 0.0
+    # TODO            if not basic:
+    #                 helicopter_rotation = 0.0
+    #                 ground_rotation = heading
+            tm.mark(telemetry.CALCS)
 
-        # Display debug text
-        if __debug__:
-            t = time.time()
-            if sim_properties.show_text:
-                display_text = [
-                    ["Cyclic (pitch):", flight_controls.cyclic_pitch],
-                    ["Cyclic (roll):", flight_controls.cyclic_roll],
-                    ["Collective:", flight_controls.collective],
-                    ["Anti-Torque:", flight_controls.anti_torque],
-                    ["Pitch:", pitch],
-                    ["Roll:", roll],
-                    ["Forward Thrust:", forward_thrust],
-                    ["Sideways Thrust:", side_thrust],
-                    ["Lift:", lift],
-                    ["Yaw:", yaw],
-                    ["Heading:", heading],
-                    ["Altitude:", altitude],
-                    ["Pad x:", pad_offset.x],
-                    ["Pad y:", pad_offset.y],
-                    ["HelicopterState:", helicopter_state],
-                    ["Vertical Speed:", vertical_speed],
-                    ["fps", fps]
-                    ]
-            else:
-                display_text = [
-                    ["fps", fps]
-                    ]
+            # Display debug text, frame rates are shown by the performance HUD
+            if __debug__:
+                if sim_properties.show_text:
+                    display_text = [
+                        ["Cyclic (pitch):", flight_controls.cyclic_pitch],
+                        ["Cyclic (roll):", flight_controls.cyclic_roll],
+                        ["Collective:", flight_controls.collective],
+                        ["Anti-Torque:", flight_controls.anti_torque],
+                        ["Pitch:", pitch],
+                        ["Roll:", roll],
+                        ["Forward Thrust:", forward_thrust],
+                        ["Sideways Thrust:", side_thrust],
+                        ["Lift:", lift],
+                        ["Yaw:", yaw],
+                        ["Heading:", heading],
+                        ["Altitude:", altitude],
+                        ["Pad x:", pad_offset.x],
+                        ["Pad y:", pad_offset.y],
+                        ["HelicopterState:", helicopter_state],
+                        ["Vertical Speed:", vertical_speed],
+                        ]
+                    for i, item in enumerate(display_text):
+                        text_rect = write(screen, item[0],  item[1], i, bgd=defs.SIM_BACKGROUND_COLOUR)
+                        if i == 0:
+                            total_rect = text_rect
+                        else :
+                            total_rect.union_ip(text_rect)
+                    rects.append(total_rect)
+                tm.mark(telemetry.TEXT)
             
-            for i, item in enumerate(display_text):
-                text_rect = write(screen, item[0],  item[1], i, bgd=defs.SIM_BACKGROUND_COLOUR)
-                if i == 0:
-                    total_rect = text_rect
-                else :
-                    total_rect.union_ip(text_rect)
-            rects.append(total_rect)
-            timings['text'] += time.time() - t
-            
-        # Draw objects clipped to the main area
-        if __debug__:t = time.time()
-        screen.set_clip(main_rect)
+            # Draw objects clipped to the main area
+            screen.set_clip(main_rect)
         
-        # Clear static objects before drawing the pad which could move under them
-        if sim_properties.show_direction:
-            direction_indicator.clear(screen, defs.SIM_BACKGROUND_COLOUR, pad_offset)
-        helicopter.clear(screen, defs.SIM_BACKGROUND_COLOUR, helicopter_rotation)
+            # Clear static objects before drawing the pad which could move under them
+            if sim_properties.show_direction:
+                direction_indicator.clear(screen, defs.SIM_BACKGROUND_COLOUR, pad_offset)
+            helicopter.clear(screen, defs.SIM_BACKGROUND_COLOUR, helicopter_rotation)
         
-        if sim_properties.show_pad :
-            landing_pad.clear(screen, defs.SIM_BACKGROUND_COLOUR, ground_rotation)
-            rects += landing_pad.blit(screen, pad_scale, pad_offset, ground_rotation)
-        if __debug__:timings['landingpad'] += time.time() - t
+            if sim_properties.show_pad :
+                landing_pad.clear(screen, defs.SIM_BACKGROUND_COLOUR, ground_rotation)
+                rects += landing_pad.blit(screen, pad_scale, pad_offset, ground_rotation)
+            tm.mark(telemetry.LANDINGPAD)
         
-        if __debug__:t = time.time()
-        if sim_properties.show_landscape:
-            landscape.clear(screen, defs.SIM_BACKGROUND_COLOUR, ground_rotation)
-            rects += landscape.blit(screen, pad_scale, pad_offset, ground_rotation)
-        if __debug__:timings['landscape'] += time.time() - t
+            if sim_properties.show_landscape:
+                landscape.clear(screen, defs.SIM_BACKGROUND_COLOUR, ground_rotation)
+                rects += landscape.blit(screen, pad_scale, pad_offset, ground_rotation)
+            tm.mark(telemetry.LANDSCAPE)
         
-        if __debug__:t = time.time()
-        if sim_properties.show_direction :
-            rects.append(direction_indicator.blit(screen, pad_offset, [screen.get_width() / 2, 30]))
-        if __debug__:timings['direction'] += time.time() - t
+            if sim_properties.show_direction :
+                rects.append(direction_indicator.blit(screen, pad_offset, [screen.get_width() / 2, 30]))
+            tm.mark(telemetry.DIRECTION)
         
-        if __debug__:t = time.time()
-        rects += helicopter.blit(screen, helicopter_rotation, altitude)
-        if __debug__:timings['helicopter'] += time.time() - t
+            rects += helicopter.blit(screen, helicopter_rotation, altitude)
+            tm.mark(telemetry.HELICOPTER)
         
-        if __debug__:t = time.time()
-        screen.set_clip()
-        if sim_properties.show_altimeter :
-            rects += altimeter.blit(screen, altitude, [-10, -10])
-        if __debug__:timings['altimeter'] += time.time() - t
+            screen.set_clip()
+            if sim_properties.show_altimeter :
+                rects += altimeter.blit(screen, altitude, [-10, -10])
+            tm.mark(telemetry.ALTIMETER)
         
-        if __debug__:t = time.time()
-        if sim_properties.show_artificial_horizon :
-            rects.append(artificial_horizon.blit(screen, pitch, roll, [10, -10]))
-        if __debug__:timings['artificialhorizon'] += time.time() - t
+            if sim_properties.show_artificial_horizon :
+                rects.append(artificial_horizon.blit(screen, pitch, roll, [10, -10]))
+            tm.mark(telemetry.ARTIFICIAL_HORIZON)
      
-        # Go ahead and update the screen with what we've drawn.
-        if __debug__:t = time.time()
-        if first_pass:
-            pygame.display.update()
-        else:
-            pygame.display.update(rects)
-        if __debug__: timings['update'] += time.time() - t
+            # Go ahead and update the screen with what we've drawn, the telemetry times the update itself
+            if first_pass:
+                update_display()
+            else:
+                update_display(rects)
      
-        prev_altitude = altitude
+            prev_altitude = altitude
+            governor.update()
         
-        clock.tick(max_fps)
-        fps = clock.get_fps()
-        first_pass = False
+            clock.tick(max_fps)
+            fps = clock.get_fps()
+            first_pass = False
         
-        # If we've landed, wait for a short period before returning to the menu
-        st = helicopter.get_state()
-        if landed and st == HelicopterState.STOPPED:
-            done = True
-            time.sleep(5)
+            # If we've landed, show the result for a short period before returning to the menu
+            st = helicopter.get_state()
+            if landed and st == HelicopterState.STOPPED and not scheduler.pending('landed'):
+                scheduler.start('landed', defs.LANDED_DELAY, finish)
+    finally:
+        # Also when a reset leaves the simulator part way through a flight
+        scheduler.cancel('landed')
+        governor.stop()
+    # The helicopter is shared so stop its sound here
+    pygame.mixer.music.stop()
 
     if __debug__:
-        print("Performance Stats")
-        total = 0
-        for key in timings:
-            total += timings[key]
-        for name, value in timings.items() :
-            print("%s:\t%f ms \t%f%%" % (name, value / count * 1000, value/total*100))
-        print("average %f ms per frame" % (total / count * 1000)) 
-        print("fps: %f" % fps)
+        title = "Basic" if basic else "Advanced"
+        print(telemetry.summarise(title, telemetry.STAGES, tm.frames(tm.head - first_frame)))
         
     return ProgramState.MENU
 
@@ -0,0 +1,93 @@
+'''
+Splash module for the Bell 47 demonstrator rig
+Shows a snapshot of the last welcome screen as soon as the display is available at boot and times the boot phases.
+Only the standard library, pygame and defs are imported so that it can run before the rest of the application is loaded
+'''
+import logging
+import mmap
+import struct
+import time
+from pathlib import Path
+
+import pygame
+
+import defs
+
+MAGIC = b'FCDS'
+HEADER = struct.Struct('<4sHH')
+FORMAT = 'BGRA'
+
+_start = time.perf_counter()
+_phases = []
+_booted = False
+_saved = set()
+
+def phase(name: str):
+    """Record the end of a boot phase
+
+    name: the phase name
+    """
+    if not _booted:
+        _phases.append((name, time.perf_counter()))
+
+def report():
+    """Log the time taken by each boot phase, once
+    """
+    global _booted
+    if _booted:
+        return
+    _booted = True
+    t = _start
+    times = []
+    for name, end in _phases:
+        times.append("%s %.0f ms" % (name, (end - t) * 1000))
+        t = end
+    logging.info("Boot to welcome in %.0f ms: %s", (t - _start) * 1000, ", ".join(times))
+
+def snapshot_file(language: str, size) -> Path:
+    """Get the path of the welcome screen snapshot for a language and resolution
+    """
+    return Path(defs.SNAPSHOT_DIR) / ("welcome-%s-%dx%d.raw" % (language, size[0], size[1]))
+
+def show(language: str = 'en') -> pygame.Surface:
+    """Set the display mode and show the welcome screen snapshot if there is one
+
+    language: the language the welcome screen starts in
+    return: the display surface
+    """
+    pygame.display.init()
+    screen = pygame.display.set_mode((defs.SCREEN_WIDTH, defs.SCREEN_HEIGHT))
+    pygame.mouse.set_visible(False)
+    phase("display")
+    path = snapshot_file(language, screen.get_size())
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            magic, width, height = HEADER.unpack_from(data)
+            if magic == MAGIC and (width, height) == screen.get_size():
+                screen.blit(pygame.image.frombuffer(data[HEADER.size:HEADER.size + width * height * 4], (width, height), FORMAT), (0, 0))
+                pygame.display.flip()
+    except (OSError, ValueError, struct.error):
+        pass
+    phase("splash")
+    return screen
+
+def save(screen: pygame.Surface, language: str):
+    """Save a snapshot of the welcome screen for the next boot, once per language.
+    Nothing is saved if the snapshot directory is not writable e.g. on the read-only root filesystem
+
+    screen: the display surface showing the welcome screen
+    language: the language the welcome screen is in
+    """
+    if language in _saved:
+        return
+    _saved.add(language)
+    path = snapshot_file(language, screen.get_size())
+    try:
+        path.parent.mkdir(parents = True, exist_ok = True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, screen.get_width(), screen.get_height()))
+            f.write(pygame.image.tobytes(screen, FORMAT))
+        tmp.replace(path)
+    except OSError as e:
+        logging.info("Welcome screen snapshot not saved: %s", e)
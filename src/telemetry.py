@@ -0,0 +1,387 @@
+'''
+Telemetry module for the Bell 47 demonstrator rig
+Records per-frame timings in a preallocated ring buffer and flushes them to session files on tmpfs
+'''
+import array
+import logging
+import math
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import defs
+
+# Stages of a frame that can be individually timed
+STAGES = ('events', 'startup', 'calcs', 'text', 'landingpad', 'landscape',
+          'direction', 'helicopter', 'altimeter', 'artificialhorizon', 'update')
+(EVENTS, STARTUP, CALCS, TEXT, LANDINGPAD, LANDSCAPE,
+ DIRECTION, HELICOPTER, ALTIMETER, ARTIFICIAL_HORIZON, UPDATE) = range(len(STAGES))
+
+# Session file layout, all values in native byte order which is recorded in the header
+MAGIC = b'FCDT'
+VERSION = 1
+HEADER = struct.Struct('=4sBcHd')   # magic, version, byte order, number of stages, start time
+CHUNK = struct.Struct('=cI')        # chunk marker, number of frames
+U32 = 'I' if array.array('I').itemsize == 4 else 'L'
+U32_MAX = 0xFFFFFFFF
+U16_MAX = 0xFFFF
+LATENCIES = 256  # Number of input latencies held
+
+# Columns written for each chunk in this order, the stage column holds one value per stage per frame
+COLUMNS = (('frame', U32), ('cpu', U32), ('stages', U32), ('fps', 'f'),
+           ('dirty', U32), ('events', 'H'), ('state', 'b'))
+
+def runtime_file(name: str) -> Path:
+    """Get the path of a file in the runtime directory, creating the directory if necessary.
+    The runtime directory should be on tmpfs as the root filesystem of the rig is read-only.
+
+    name: the file name
+    return: the path or None if the runtime directory can't be used
+    """
+    directory = Path(defs.RUNTIME_DIR)
+    try:
+        directory.mkdir(parents = True, exist_ok = True)
+    except OSError as e:
+        logging.warning("Runtime directory %s is not available: %s", directory, e)
+        return None
+    return directory / name
+
+def percentile(values: list, p: float) -> float:
+    """Get a percentile from a sorted list of values using the nearest rank
+
+    values: the sorted values
+    p: the percentile (0-100)
+    """
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(p / 100.0 * len(values)) - 1))
+    return values[rank]
+
+def memory_usage() -> int:
+    """Get the resident memory of the process in bytes, or 0 if it is unknown
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            return 0
+
+class CacheStats(object):
+    """Hit and miss counts for a cache along with its current size
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.entries = 0
+        self.bytes = 0
+
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups() if self.lookups() else 0.0
+
+caches = {}
+
+def cache_stats(name: str = None):
+    """Get the statistics for a named cache, creating them on first use
+
+    name: the cache name
+    return: the CacheStats for the name or a dictionary of all of them when name is None
+    """
+    if name is None:
+        return caches
+    if name not in caches:
+        caches[name] = CacheStats()
+    return caches[name]
+
+class Telemetry(object):
+    """Always-on per-frame instrumentation.
+
+        Stage durations are measured with perf_counter_ns and stored in microseconds in a ring buffer
+        of preallocated arrays so that recording a frame does not allocate
+    """
+    __instance = None
+    @staticmethod
+    def get_instance():
+        """Get the singleton telemetry object
+        """
+        if Telemetry.__instance == None:
+            Telemetry.__instance = Telemetry(defs.TELEMETRY_FRAMES)
+        return Telemetry.__instance
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        n = len(STAGES)
+        self._frame = array.array(U32, bytes(4 * capacity))
+        self._cpu = array.array(U32, bytes(4 * capacity))
+        self._stages = array.array(U32, bytes(4 * capacity * n))
+        self._fps = array.array('f', bytes(4 * capacity))
+        self._dirty = array.array(U32, bytes(4 * capacity))
+        self._events = array.array('H', bytes(2 * capacity))
+        self._state = array.array('b', bytes(capacity))
+        self._zeros = array.array(U32, bytes(4 * n))
+        self._latency = array.array(U32, bytes(4 * LATENCIES))
+        self.latency_head = 0
+        self.head = 0  # Total number of frames recorded
+        self.state = None
+        self.first_frame = {}  # ProgramState: ns from entering the state to its first frame
+        self._entered = None
+        self._base = 0
+        self._flushed = 0
+        self._dropped = 0
+        self._frame_start = time.perf_counter_ns()
+        self._cpu_start = time.process_time_ns()
+        self._t = self._frame_start
+        self.last_beat = self._frame_start
+        self._path = None
+        self._session_bytes = 0
+        self._enabled = defs.TELEMETRY_ENABLED
+
+    def set_state(self, state):
+        """Set the program state recorded against subsequent frames
+
+        state: the ProgramState
+        """
+        if state != self.state:
+            self._entered = time.perf_counter_ns()
+        self.state = state
+
+    def heartbeat(self):
+        """Note that the main loop is still processing input
+        """
+        self.last_beat = time.perf_counter_ns()
+
+    def start(self):
+        """Start timing the stages of the current frame
+        """
+        self._t = time.perf_counter_ns()
+
+    def mark(self, stage: int):
+        """Add the time since the previous mark to a stage of the current frame
+
+        stage: the stage index
+        """
+        now = time.perf_counter_ns()
+        self._stages[self._base + stage] += (now - self._t) // 1000
+        self._t = now
+
+    def add_events(self, count: int):
+        """Add to the number of events processed in the current frame
+        """
+        slot = self.head % self.capacity
+        self._events[slot] = min(self._events[slot] + count, U16_MAX)
+
+    def add_latency(self, latency_ns: int):
+        """Record the time between an input being read and its event being processed
+        """
+        self._latency[self.latency_head % LATENCIES] = min(latency_ns // 1000, U32_MAX)
+        self.latency_head += 1
+
+    def latencies(self) -> list:
+        """Get a copy of the recent input latencies in microseconds
+        """
+        return self._latency[:min(self.latency_head, LATENCIES)].tolist()
+
+    def present(self, pixels: int, update_ns: int):
+        """Complete the current frame when the display has been updated
+
+        pixels: the number of pixels updated
+        update_ns: the time taken to update the display
+        """
+        now = time.perf_counter_ns()
+        cpu = time.process_time_ns()
+        slot = self.head % self.capacity
+        frame_ns = now - self._frame_start
+        self._frame[slot] = min(frame_ns // 1000, U32_MAX)
+        self._cpu[slot] = min((cpu - self._cpu_start) // 1000, U32_MAX)
+        self._stages[self._base + UPDATE] += update_ns // 1000
+        self._fps[slot] = 1e9 / frame_ns if frame_ns > 0 else 0.0
+        self._dirty[slot] = min(pixels, U32_MAX)
+        self._state[slot] = -1 if self.state is None else self.state.value
+        self._frame_start = self._t = now
+        self._cpu_start = cpu
+        self.last_beat = now
+        if self._entered is not None and self.state is not None:
+            # Time from the menu selection to the first frame of the new screen
+            self.first_frame[self.state] = now - self._entered
+            logging.info("First frame of %s after %.1f ms", self.state.name, (now - self._entered) / 1e6)
+        self._entered = None
+
+        # Start the next frame
+        self.head += 1
+        slot = self.head % self.capacity
+        self._base = slot * len(STAGES)
+        self._stages[self._base:self._base + len(STAGES)] = self._zeros
+        self._events[slot] = 0
+        if self.head - self._flushed >= self.capacity // 2:
+            self.flush()
+
+    def frames(self, count: int = None) -> dict:
+        """Get a copy of the most recent frames in chronological order
+
+        count: the number of frames, all of those held when None
+        return: a dictionary of lists keyed by column name with the stages as a list of lists
+        """
+        n = min(self.head, self.capacity)
+        if count is not None:
+            n = min(n, count)
+        return self._columns(self.head - n, self.head)
+
+    def _slices(self, start: int, end: int) -> list:
+        """Get the ring buffer slot ranges holding frames start to end (exclusive)
+        """
+        first = start % self.capacity
+        last = end % self.capacity
+        if end - start == 0:
+            return []
+        elif first < last:
+            return [(first, last)]
+        else:
+            return [(first, self.capacity), (0, last)]
+
+    def _columns(self, start: int, end: int) -> dict:
+        n = len(STAGES)
+        columns = {name: [] for name, _ in COLUMNS}
+        for s0, s1 in self._slices(start, end):
+            columns['frame'] += self._frame[s0:s1]
+            columns['cpu'] += self._cpu[s0:s1]
+            columns['fps'] += self._fps[s0:s1]
+            columns['dirty'] += self._dirty[s0:s1]
+            columns['events'] += self._events[s0:s1]
+            columns['state'] += self._state[s0:s1]
+            stages = self._stages[s0 * n:s1 * n]
+            columns['stages'] += [stages[i:i + n] for i in range(0, len(stages), n)]
+        return columns
+
+    def _open_session(self):
+        """Start a new session file in the runtime directory, removing the oldest ones beyond the limit
+        """
+        name = "session-%s-%d.fcdt" % (datetime.now().strftime("%Y%m%d-%H%M%S"), os.getpid())
+        path = runtime_file(name)
+        if path is None:
+            self._enabled = False
+            return
+        try:
+            sessions = sorted(path.parent.glob('session-*.fcdt'), key = lambda p: p.stat().st_mtime)
+            for old in sessions[:max(0, len(sessions) - defs.TELEMETRY_SESSIONS + 1)]:
+                old.unlink()
+            names = b''.join(struct.pack('=B', len(s)) + s.encode() for s in STAGES)
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, sys.byteorder[0].encode(), len(STAGES), time.time()))
+                f.write(names)
+            self._path = path
+            self._session_bytes = HEADER.size + len(names)
+        except OSError as e:
+            logging.warning("Unable to write telemetry session %s: %s", path, e)
+            self._enabled = False
+
+    def flush(self):
+        """Append the frames recorded since the last flush to the session file.
+
+            Frames overwritten before they could be flushed are counted as dropped
+        """
+        pending = self.head - self._flushed
+        if not self._enabled or pending == 0:
+            self._flushed = self.head
+            return
+        if pending > self.capacity:
+            self._dropped += pending - self.capacity
+            pending = self.capacity
+        if self._path is None or self._session_bytes > defs.TELEMETRY_SESSION_BYTES:
+            self._open_session()
+            if not self._enabled:
+                return
+        n = len(STAGES)
+        data = [CHUNK.pack(b'C', pending)]
+        for name, _ in COLUMNS:
+            column = getattr(self, '_' + name)
+            for s0, s1 in self._slices(self.head - pending, self.head):
+                if name == 'stages':
+                    data.append(column[s0 * n:s1 * n].tobytes())
+                else:
+                    data.append(column[s0:s1].tobytes())
+        data = b''.join(data)
+        try:
+            with open(self._path, 'ab') as f:
+                f.write(data)
+            self._session_bytes += len(data)
+        except OSError as e:
+            logging.warning("Unable to write telemetry session %s: %s", self._path, e)
+            self._enabled = False
+        self._flushed = self.head
+
+def read_session(path) -> dict:
+    """Read a telemetry session file
+
+    path: the session file path
+    return: a dictionary with the start time, stage names and a list of frames for each column
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, order, nstages, started = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s is not a telemetry session file" % (path))
+    swap = order.decode() != sys.byteorder[0]
+    offset = HEADER.size
+    stages = []
+    for _ in range(nstages):
+        length = data[offset]
+        stages.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    columns = {name: [] for name, _ in COLUMNS}
+    while offset + CHUNK.size <= len(data):
+        marker, count = CHUNK.unpack_from(data, offset)
+        offset += CHUNK.size
+        for name, typecode in COLUMNS:
+            column = array.array(typecode)
+            size = count * column.itemsize * (nstages if name == 'stages' else 1)
+            column.frombytes(data[offset:offset + size])
+            if swap:
+                column.byteswap()
+            offset += size
+            if name == 'stages':
+                columns[name] += [column[i:i + nstages] for i in range(0, len(column), nstages)]
+            else:
+                columns[name] += column
+    return {'started': started, 'stages': stages, 'columns': columns}
+
+def summarise(title: str, stages: tuple, columns: dict) -> str:
+    """Format a summary of stage timings and frame time percentiles
+
+    title: the summary title
+    stages: the stage names
+    columns: the frame columns as returned by read_session or Telemetry.frames
+    """
+    count = len(columns['frame'])
+    lines = ["Performance Stats - %s" % (title)]
+    if count == 0:
+        return "\n".join(lines + ["no frames"])
+    # Stages that were never timed in these frames are left out
+    totals = [sum(s[i] for s in columns['stages']) for i in range(len(stages))]
+    timed = [i for i, value in enumerate(totals) if value > 0]
+    total = sum(totals) or 1
+    for i in timed:
+        lines.append("%s:\t%f ms \t%f%%" % (stages[i], totals[i] / count / 1000, totals[i] / total * 100))
+    lines.append("average %f ms per frame" % (total / count / 1000))
+    lines.append("fps: %f" % (count * 1e6 / (sum(columns['frame']) or 1)))
+    lines.append("")
+    lines.append("%-18s %9s %9s %9s %9s %9s" % ("ms", "mean", "p50", "p90", "p99", "max"))
+    rows = [(stages[i], sorted(s[i] for s in columns['stages'])) for i in timed]
+    rows.append(('frame', sorted(columns['frame'])))
+    rows.append(('cpu', sorted(columns['cpu'])))
+    for name, values in rows:
+        lines.append("%-18s %9.3f %9.3f %9.3f %9.3f %9.3f" % (
+            name, sum(values) / count / 1000, percentile(values, 50) / 1000, percentile(values, 90) / 1000,
+            percentile(values, 99) / 1000, values[-1] / 1000))
+    dirty = sorted(columns['dirty'])
+    lines.append("dirty pixels p50 %d p99 %d, events per frame %.2f" % (
+        percentile(dirty, 50), percentile(dirty, 99), sum(columns['events']) / count))
+    return "\n".join(lines)
@@ -0,0 +1,85 @@
+'''
+Watchdog module for the Bell 47 demonstrator rig
+Detects when the main loop stalls and records the stacks of all threads to a bounded stall log
+'''
+import logging
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import defs
+import telemetry
+from telemetry import Telemetry, runtime_file
+
+class Watchdog(threading.Thread):
+    """Monitor the main loop heartbeat recorded by the telemetry.
+
+        When no input has been processed or frame presented within the frame budget the stacks of all
+        threads, the current ProgramState and the most recent frame timings are appended to the stall log
+    """
+    def __init__(self, budget: float):
+        super().__init__(name = "Watchdog")
+        self.daemon = True
+        self._budget_ns = int(budget * 1e9)
+        self._interval = budget / 4
+        self._run = True
+        self._stalled_beat = None
+
+    def run(self):
+        """Daemon process for the thread to check the heartbeat.
+        """
+        tm = Telemetry.get_instance()
+        while self._run:
+            time.sleep(self._interval)
+            beat = tm.last_beat
+            stalled_ns = time.perf_counter_ns() - beat
+            if self._stalled_beat is not None and beat != self._stalled_beat:
+                # The main loop has recovered
+                self._write("Stall ended after %.2f s\n\n" % ((beat - self._stalled_beat) / 1e9))
+                self._stalled_beat = None
+            elif self._stalled_beat is None and stalled_ns > self._budget_ns:
+                self._stalled_beat = beat
+                self._report(tm, stalled_ns)
+
+    def stop(self):
+        """Stop the daemon process, terminating the thread.
+        """
+        self._run = False
+
+    def _report(self, tm: Telemetry, stalled_ns: int):
+        """Record the current state of all threads
+        """
+        state = tm.state.name if tm.state is not None else "STARTUP"
+        lines = ["Stall at %s: no frame for %.2f s in state %s" % (
+            datetime.now().strftime("%d/%b/%Y %H:%M:%S"), stalled_ns / 1e9, state)]
+        frames = tm.frames(defs.WATCHDOG_FRAMES)
+        if frames['frame']:
+            lines.append("Recent frames (ms): " + " ".join("%.1f" % (f / 1000) for f in frames['frame']))
+            lines.append("Recent stages (ms): " + ", ".join(
+                "%s %.2f" % (name, sum(s[i] for s in frames['stages']) / len(frames['stages']) / 1000)
+                for i, name in enumerate(telemetry.STAGES)))
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            lines.append("Thread %s (%d):" % (names.get(ident, "unknown"), ident))
+            lines.append("".join(traceback.format_stack(frame)).rstrip())
+        report = "\n".join(lines) + "\n"
+        logging.warning("Main loop stalled for %.2f s in state %s", stalled_ns / 1e9, state)
+        self._write(report)
+
+    def _write(self, text: str):
+        """Append to the stall log, keeping the previous log when it exceeds the size limit
+        """
+        path = runtime_file("stalls.log")
+        if path is None:
+            return
+        try:
+            if path.exists() and path.stat().st_size + len(text) > defs.WATCHDOG_LOG_BYTES:
+                path.replace(path.with_suffix(".log.1"))
+            with open(path, 'a') as f:
+                f.write(text)
+        except OSError as e:
+            logging.warning("Unable to write stall log %s: %s", path, e)